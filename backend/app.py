@@ -1,7 +1,9 @@
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
 from config import Config
 from models import db
+from services import report_cache, events, cart_store, principals, demand, prescription_storage
+from chatbot import kb_cache
 import os
 
 def create_app():
@@ -11,14 +13,25 @@ def create_app():
     # Disable strict slashes to prevent redirects
     app.url_map.strict_slashes = False
     
+    # Refuse oversized bodies (prescription uploads) before werkzeug reads them
+    if not app.config.get('MAX_CONTENT_LENGTH'):
+        app.config['MAX_CONTENT_LENGTH'] = prescription_storage.MAX_REQUEST_BYTES
+    
     # Initialize extensions
     db.init_app(app)
+    report_cache.init_app(app)
+    events.init_app(app)
+    cart_store.init_app(app)
+    principals.init_app(app)
+    kb_cache.init_app(app)
+    demand.init_app(app)
     # Configure CORS properly
     CORS(app, resources={
         r"/api/*": {
             "origins": ["http://localhost:3000"],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
+            "expose_headers": ["Idempotent-Replayed"],
             "supports_credentials": True
         }
     })
@@ -59,6 +72,11 @@ def create_app():
     app.register_blueprint(customer_cart_bp, url_prefix='/api/customer')
     app.register_blueprint(customer_order_bp, url_prefix='/api/customer')
     
+    @app.errorhandler(413)
+    def request_too_large(e):
+        limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+        return jsonify({'message': f'Request too large (max {limit_mb} MB)'}), 413
+    
     @app.route('/')
     def index():
         return {'message': 'Medi-Flow Systems API - Smart Management. Better Health.'}
@@ -71,6 +89,17 @@ def create_app():
     
     return app
 
+def create_worker_app():
+    """
+    Database-only app for background worker processes (report jobs)
+    Skips the blueprints, the cart-store flusher and the cache/session hooks that
+    create_app sets up for the web process.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    return app
+
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Benchmark: authentication overhead per request
+Compares the previous path (jwt.decode, User.query.get, lazy role load) with the
+principal cache, cold and warm, for a staff token behind role_required. Reports
+queries and mean time per authenticated request.
+Inserts its user inside a transaction that is rolled back at the end.
+Usage (from backend/): python -m benchmarks.bench_auth --requests 2000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+import jwt
+from sqlalchemy import event
+from app import create_app
+from config import Config
+from models import db
+from models.user import User, Role
+from services import principals
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+def legacy_auth(token):
+    data = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+    user = User.query.get(data['user_id'])
+    return user.role.role_name
+
+def cached_auth(token):
+    data = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+    return principals.user(data).role_name
+
+def measure(label, fn, token, requests, reset=None):
+    elapsed = 0.0
+    with QueryCounter(db.engine) as counter:
+        for _ in range(requests):
+            if reset:
+                reset()
+            db.session.expunge_all()  # Cold identity map, as in a fresh request
+            start = time.perf_counter()
+            fn(token)
+            elapsed += time.perf_counter() - start
+    print(f"  {label:22} {counter.count / requests:6.2f} queries/request {elapsed / requests * 1e6:10.1f} µs/request")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            role = Role.query.filter_by(role_name='Admin').first() or Role.query.first()
+            user = User(username=f'bench-auth-{int(time.time())}', role_id=role.role_id, password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            token = jwt.encode({
+                'user_id': user.user_id,
+                'username': user.username,
+                'role': role.role_name,
+                'iat': datetime.utcnow(),
+                'exp': datetime.utcnow() + timedelta(hours=1)
+            }, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+            print(f"{args.requests} authenticated requests:")
+            measure('legacy', legacy_auth, token, args.requests)
+            measure('principal cache, cold', cached_auth, token, args.requests,
+                    reset=lambda: principals.invalidate('user', user.user_id))
+            measure('principal cache, warm', cached_auth, token, args.requests)
+        finally:
+            db.session.rollback()
+
+if __name__ == '__main__':
+    main()
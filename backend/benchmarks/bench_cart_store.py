@@ -0,0 +1,119 @@
+"""
+Benchmark: cart quantity edits, commit-per-edit vs the write-behind cart store
+T threads each hammer their own customer's cart with random quantity changes.
+Reports edits/s and p99 edit latency for each path, plus how long the final flush
+of the buffered paths takes.
+Creates its own company, medicines and customers and deletes them afterwards.
+Usage (from backend/): python -m benchmarks.bench_cart_store --threads 8 --edits 500 --lines 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from app import create_app
+from models import db
+from models.customer import Customer, CartItem
+from models.medicine import Medicine, Company
+from services import cart_store
+
+def setup(args, tag):
+    company = Company(name=f'bench-{tag}')
+    db.session.add(company)
+    db.session.flush()
+    medicines = [Medicine(
+        name=f'bench-{tag}-{i}', company_id=company.company_id, batch_no='BENCH',
+        mfg_date=datetime.now().date() - timedelta(days=30), exp_date=datetime.now().date() + timedelta(days=365),
+        quantity=1000, price=10, product_type='OTC'
+    ) for i in range(args.lines)]
+    db.session.add_all(medicines)
+    customers = [Customer(
+        name=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.com', phone='0', password_hash='x'
+    ) for i in range(args.threads)]
+    db.session.add_all(customers)
+    db.session.flush()
+    items = [CartItem(customer_id=c.customer_id, medicine_id=m.medicine_id, quantity=1)
+             for c in customers for m in medicines]
+    db.session.add_all(items)
+    db.session.commit()
+    carts = {c.customer_id: [i.cart_item_id for i in items if i.customer_id == c.customer_id] for c in customers}
+    return company.company_id, [m.medicine_id for m in medicines], carts
+
+def teardown(company_id, medicine_ids, customer_ids):
+    CartItem.query.filter(CartItem.customer_id.in_(customer_ids)).delete(synchronize_session=False)
+    Customer.query.filter(Customer.customer_id.in_(customer_ids)).delete(synchronize_session=False)
+    Medicine.query.filter(Medicine.medicine_id.in_(medicine_ids)).delete(synchronize_session=False)
+    Company.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+    db.session.commit()
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def hammer(app, args, carts):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(carts))
+
+    def editor(customer_id, cart_item_ids):
+        rng = random.Random(customer_id)
+        local = []
+        with app.app_context():
+            barrier.wait()
+            for _ in range(args.edits):
+                start = time.perf_counter()
+                cart_store.set_quantity(customer_id, rng.choice(cart_item_ids), rng.randint(1, 10))
+                local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=editor, args=item) for item in carts.items()]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, latencies
+
+def run(app, args, name, backend):
+    cart_store.backend = backend
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        company_id, medicine_ids, carts = setup(args, tag)
+    try:
+        elapsed, latencies = hammer(app, args, carts)
+        with app.app_context():
+            start = time.perf_counter()
+            flushed = cart_store.flush()
+            flush_time = time.perf_counter() - start
+
+        print(f"\n{name}:")
+        print(f"  edits/s           {len(latencies) / elapsed:,.0f}")
+        print(f"  p99 edit latency  {percentile(latencies, 99) * 1000:.3f} ms")
+        if backend is not None:
+            print(f"  final flush       {flushed} lines in {flush_time * 1000:.1f} ms")
+    finally:
+        with app.app_context():
+            teardown(company_id, medicine_ids, list(carts))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent customers editing')
+    parser.add_argument('--edits', type=int, default=500, help='Edits per customer')
+    parser.add_argument('--lines', type=int, default=5, help='Cart lines per customer')
+    args = parser.parse_args()
+
+    app = create_app()
+    print(f"{args.threads} customers x {args.edits} edits over {args.lines} cart lines")
+    with tempfile.TemporaryDirectory() as tmp:
+        run(app, args, 'Commit per edit (CART_STORE=postgres)', None)
+        run(app, args, 'Write-behind, memory', cart_store.MemoryBackend())
+        run(app, args, 'Write-behind, sqlite', cart_store.SQLiteBackend(os.path.join(tmp, 'cart_store.sqlite3')))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: cart reads, per-line lazy loading vs the single-query cart view
+Counts SQL statements and times both for carts of increasing size; the cart view
+must stay at one statement regardless of the number of lines (exits non-zero if not).
+Inserts its data inside a transaction that is rolled back at the end.
+Usage (from backend/): python -m benchmarks.bench_cart_view --lines 1 10 50
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app
+from models import db
+from models.customer import Customer, CartItem
+from models.medicine import Medicine, Company
+from services import cart_view
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+def legacy_cart(customer_id):
+    """The previous read: CartItem query, then item.medicine and medicine.company per line"""
+    total = 0
+    lines = []
+    for item in CartItem.query.filter_by(customer_id=customer_id).all():
+        medicine = item.medicine
+        total += float(medicine.price) * item.quantity
+        lines.append((medicine.name, medicine.company.name))
+    return lines, total
+
+def measure(label, fn, repeat=5):
+    best = float('inf')
+    statements = 0
+    for _ in range(repeat):
+        db.session.expunge_all()  # Cold identity map, as in a fresh request
+        with QueryCounter(db.engine) as counter:
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        statements = counter.count
+    print(f"  {label:20} {statements:6d} queries {best * 1000:10.2f} ms")
+    return statements
+
+def setup(lines):
+    customer = Customer(name='bench-cart', email=f'bench-cart-{lines}@example.com', phone='0', password_hash='x')
+    db.session.add(customer)
+    db.session.flush()
+    for i in range(lines):
+        # One company per medicine, the worst case for lazy loading
+        company = Company(name=f'bench-cart-{lines}-{i}')
+        db.session.add(company)
+        db.session.flush()
+        medicine = Medicine(
+            name=f'bench-cart-{lines}-{i}', company_id=company.company_id, batch_no='BENCH',
+            mfg_date=datetime.now().date() - timedelta(days=30), exp_date=datetime.now().date() + timedelta(days=365),
+            quantity=100, price=10, product_type='Rx' if i % 5 == 0 else 'OTC'
+        )
+        db.session.add(medicine)
+        db.session.flush()
+        db.session.add(CartItem(customer_id=customer.customer_id, medicine_id=medicine.medicine_id, quantity=2))
+    db.session.flush()
+    return customer.customer_id
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 50])
+    args = parser.parse_args()
+
+    app = create_app()
+    regressions = []
+    with app.app_context():
+        try:
+            for lines in args.lines:
+                customer_id = setup(lines)
+                print(f"\n{lines} cart lines:")
+                measure('legacy lazy loads', lambda: legacy_cart(customer_id))
+                statements = measure('cart view', lambda: cart_view.serialize(cart_view.load(customer_id)))
+                if statements != 1:
+                    regressions.append(lines)
+        finally:
+            db.session.rollback()
+
+    if regressions:
+        print(f"\n❌ Cart view issued more than one query for carts of {regressions} lines")
+        sys.exit(1)
+    print("\n✅ Cart view is a single query for every cart size")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark: concurrent checkouts racing for scarce SKUs
+N customers each hold the same few medicines in their cart and check out at once.
+Reports p50/p99 latency, orders placed and oversold units, for the locked pipeline
+and (with --legacy) the previous read-modify-write flow.
+Creates its own company, medicines and customers and deletes them afterwards.
+Usage (from backend/): python -m benchmarks.bench_checkout --customers 200 --skus 3 --stock 50
+"""
+import argparse
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from app import create_app
+from models import db
+from models.customer import Customer, CartItem
+from models.medicine import Medicine, Company
+from models.order import Order, OrderItem, OrderStatusHistory
+from services import checkout
+
+SHIPPING = {'address': '1 Bench Street', 'city': 'Bench', 'state': 'Bench', 'pincode': '000000'}
+
+def locked_checkout(customer_id):
+    cart = checkout.lock_cart(customer_id)
+    checkout.place_order(customer_id, cart, SHIPPING)
+    db.session.commit()
+
+def legacy_checkout(customer_id):
+    """The pre-pipeline flow: unlocked read, per-line inserts, stock decremented in Python"""
+    cart_items = CartItem.query.filter_by(customer_id=customer_id).all()
+    if not cart_items:
+        raise checkout.CheckoutError('Cart is empty')
+    for item in cart_items:
+        if item.medicine.quantity < item.quantity:
+            raise checkout.CheckoutError(f'Insufficient stock for {item.medicine.name}')
+    order = Order(customer_id=customer_id, total_amount=0, status='Processing',
+                  shipping_address=SHIPPING['address'])
+    db.session.add(order)
+    db.session.flush()
+    for item in cart_items:
+        db.session.add(OrderItem(order_id=order.order_id, medicine_id=item.medicine_id, quantity=item.quantity,
+                                 unit_price=item.medicine.price, subtotal=0, product_type='OTC'))
+        item.medicine.quantity -= item.quantity
+    CartItem.query.filter_by(customer_id=customer_id).delete()
+    db.session.commit()
+
+def setup(args, tag):
+    company = Company(name=f'bench-{tag}')
+    db.session.add(company)
+    db.session.flush()
+    medicines = [Medicine(
+        name=f'bench-{tag}-{i}', company_id=company.company_id, batch_no='BENCH',
+        mfg_date=datetime.now().date() - timedelta(days=30), exp_date=datetime.now().date() + timedelta(days=365),
+        quantity=args.stock, price=10, product_type='OTC'
+    ) for i in range(args.skus)]
+    db.session.add_all(medicines)
+    customers = [Customer(
+        name=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.com', phone='0', password_hash='x'
+    ) for i in range(args.customers)]
+    db.session.add_all(customers)
+    db.session.flush()
+    db.session.add_all([
+        CartItem(customer_id=c.customer_id, medicine_id=m.medicine_id, quantity=args.units)
+        for c in customers for m in medicines
+    ])
+    db.session.commit()
+    return company.company_id, [m.medicine_id for m in medicines], [c.customer_id for c in customers]
+
+def teardown(company_id, medicine_ids, customer_ids):
+    order_ids = [o.order_id for o in Order.query.filter(Order.customer_id.in_(customer_ids))]
+    OrderStatusHistory.query.filter(OrderStatusHistory.order_id.in_(order_ids)).delete(synchronize_session=False)
+    OrderItem.query.filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+    Order.query.filter(Order.order_id.in_(order_ids)).delete(synchronize_session=False)
+    CartItem.query.filter(CartItem.customer_id.in_(customer_ids)).delete(synchronize_session=False)
+    Customer.query.filter(Customer.customer_id.in_(customer_ids)).delete(synchronize_session=False)
+    Medicine.query.filter(Medicine.medicine_id.in_(medicine_ids)).delete(synchronize_session=False)
+    Company.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+    db.session.commit()
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def race(app, fn, customer_ids):
+    latencies, failures = [], []
+    barrier = threading.Barrier(len(customer_ids))
+    lock = threading.Lock()
+
+    def worker(customer_id):
+        with app.app_context():
+            barrier.wait()
+            start = time.perf_counter()
+            try:
+                fn(customer_id)
+                ok = True
+            except Exception as e:
+                db.session.rollback()
+                ok = False
+                with lock:
+                    failures.append(type(e).__name__)
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in customer_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, failures
+
+def run(app, args, name, fn):
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        company_id, medicine_ids, customer_ids = setup(args, tag)
+    try:
+        start = time.perf_counter()
+        latencies, failures = race(app, fn, customer_ids)
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            sold = db.session.query(OrderItem.medicine_id, db.func.sum(OrderItem.quantity))\
+                .join(Order, Order.order_id == OrderItem.order_id)\
+                .filter(Order.customer_id.in_(customer_ids))\
+                .group_by(OrderItem.medicine_id).all()
+            oversold = sum(max(0, int(units) - args.stock) for _, units in sold)
+
+        print(f"\n{name}:")
+        print(f"  orders placed     {len(latencies)} / {len(customer_ids)} in {elapsed:.2f}s")
+        print(f"  rejected          {len(failures)}")
+        print(f"  p50 latency       {percentile(latencies, 50) * 1000:.1f} ms")
+        print(f"  p99 latency       {percentile(latencies, 99) * 1000:.1f} ms")
+        print(f"  oversold units    {oversold}")
+    finally:
+        with app.app_context():
+            teardown(company_id, medicine_ids, customer_ids)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--skus', type=int, default=3)
+    parser.add_argument('--stock', type=int, default=50, help='Initial units per SKU')
+    parser.add_argument('--units', type=int, default=1, help='Units of each SKU per cart')
+    parser.add_argument('--legacy', action='store_true', help='Also race the previous unlocked flow')
+    args = parser.parse_args()
+
+    app = create_app()
+    print(f"{args.customers} customers racing for {args.skus} SKUs x {args.stock} units")
+    run(app, args, 'Locked pipeline', locked_checkout)
+    if args.legacy:
+        run(app, args, 'Legacy read-modify-write', legacy_checkout)
+
+if __name__ == '__main__':
+    main()
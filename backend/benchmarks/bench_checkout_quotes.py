@@ -0,0 +1,132 @@
+"""
+Benchmark: checkout quote redemption and invalidation
+Times redeeming a stored quote against re-pricing the locked cart, then checks
+every way a quote must be refused: the cart's quantities or lines changed (with
+the quote in this worker's store or only on another worker), a quoted medicine
+expired after quoting, and the quote token presented as a customer login token.
+Exits non-zero if any of them is accepted.
+Inserts its data inside a transaction that is rolled back at the end.
+Usage (from backend/): python -m benchmarks.bench_checkout_quotes --lines 5 --repeat 200
+"""
+import argparse
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from app import create_app
+from models import db
+from models.customer import Customer, CartItem
+from models.medicine import Medicine, Company
+from routes.customer_auth_routes import _authenticate_customer
+from services import checkout, checkout_quotes
+
+def setup(lines, tag):
+    company = Company(name=f'bench-quote-{tag}')
+    db.session.add(company)
+    db.session.flush()
+    medicines = [Medicine(
+        name=f'bench-quote-{tag}-{i}', company_id=company.company_id, batch_no='BENCH',
+        mfg_date=datetime.now().date() - timedelta(days=30), exp_date=datetime.now().date() + timedelta(days=365),
+        quantity=1000, price=10, product_type='OTC'
+    ) for i in range(lines + 1)]
+    customer = Customer(name=f'bench-quote-{tag}', email=f'bench-quote-{tag}@example.com', phone='0', password_hash='x')
+    db.session.add_all(medicines + [customer])
+    db.session.flush()
+    db.session.add_all([
+        CartItem(customer_id=customer.customer_id, medicine_id=medicine.medicine_id, quantity=1)
+        for medicine in medicines[:lines]
+    ])
+    db.session.flush()
+    # The extra medicine is for the "line added" case
+    return customer.customer_id, medicines
+
+def quote_for(customer_id):
+    return checkout_quotes.issue(customer_id, checkout.read_cart(customer_id)).token()
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:24} {elapsed * 1000:8.2f} ms")
+
+def refused(customer_id, token, mutate, evict=False):
+    """Whether redeeming `token` fails after `mutate()` changes the cart or its medicines"""
+    savepoint = db.session.begin_nested()
+    try:
+        mutate()
+        db.session.flush()
+        if evict:
+            claims = checkout_quotes._decode(customer_id, token)
+            checkout_quotes._store.pop(claims['quote_id'])
+        checkout_quotes.redeem(customer_id, token, lambda: checkout.lock_cart(customer_id))
+        return False
+    except checkout.CheckoutError:
+        return True
+    finally:
+        savepoint.rollback()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=5, help='Cart lines')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app()
+    failures = []
+    with app.app_context():
+        try:
+            customer_id, medicines = setup(args.lines, uuid.uuid4().hex[:8])
+            token = quote_for(customer_id)
+
+            print(f"\n{args.lines} cart lines:")
+            timed('redeem stored quote', lambda: checkout_quotes.redeem(customer_id, token, None), args.repeat)
+            timed('re-price locked cart', lambda: checkout.lock_cart(customer_id), args.repeat)
+
+            def first_line():
+                return CartItem.query.filter_by(customer_id=customer_id).order_by(CartItem.cart_item_id).first()
+
+            def change_quantity():
+                first_line().quantity += 1
+
+            def add_line():
+                db.session.add(CartItem(customer_id=customer_id, medicine_id=medicines[-1].medicine_id, quantity=1))
+
+            def remove_line():
+                db.session.delete(first_line())
+
+            def expire_medicine():
+                medicines[0].exp_date = datetime.now().date()
+
+            cases = [
+                ('quantity changed', change_quantity, False),
+                ('line added', add_line, False),
+                ('line removed', remove_line, False),
+                ('quantity changed (other worker)', change_quantity, True),
+                ('line added (other worker)', add_line, True),
+                ('medicine expired', expire_medicine, False),
+                ('medicine expired (other worker)', expire_medicine, True),
+            ]
+            print("\nInvalidation:")
+            for label, mutate, evict in cases:
+                token = quote_for(customer_id)
+                ok = refused(customer_id, token, mutate, evict)
+                print(f"  {label:34} {'refused' if ok else 'ACCEPTED'}")
+                if not ok:
+                    failures.append(label)
+
+            with app.test_request_context():
+                _, error = _authenticate_customer(f'Bearer {quote_for(customer_id)}')
+            print(f"  {'quote used as login token':34} {'refused' if error else 'ACCEPTED'}")
+            if not error:
+                failures.append('quote used as login token')
+        finally:
+            db.session.rollback()
+
+    if failures:
+        print(f"\n❌ Quotes accepted after: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ Every changed cart, expired medicine and misused token was refused")
+
+if __name__ == '__main__':
+    main()
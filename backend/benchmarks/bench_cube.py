@@ -0,0 +1,73 @@
+"""
+Benchmark: sales cube memory footprint and query latency on synthetic facts
+Builds the cube directly from generated columns, so no database is needed.
+Usage (from backend/): python -m benchmarks.bench_cube --rows 10000000
+"""
+import argparse
+import time
+from datetime import date, timedelta
+import numpy as np
+from services.sales_cube import SalesCube
+
+def timed(label, fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:45} {best * 1000:10.2f} ms")
+
+def build_cube(rows, medicines, companies, days):
+    cube = SalesCube()
+    d = cube.dictionaries
+    for medicine_id in range(1, medicines + 1):
+        d['medicine'].encode(medicine_id)
+        cube.medicine_names[medicine_id] = f'Medicine {medicine_id}'
+    for company in range(companies):
+        d['company'].encode(f'Company {company}')
+    for product_type in ('OTC', 'Rx'):
+        d['product_type'].encode(product_type)
+
+    rng = np.random.default_rng(42)
+    first_day = (date.today() - timedelta(days=days)).toordinal() - date(1970, 1, 1).toordinal()
+    medicine = rng.integers(0, medicines, rows, dtype=np.int32)
+    quantity = rng.integers(1, 6, rows, dtype=np.int32)
+    cube.append_columns({
+        'medicine': medicine,
+        'company': (medicine % companies).astype(np.int32),
+        'product_type': (medicine % 5 == 0).astype(np.int8),
+        'day': rng.integers(first_day, first_day + days, rows, dtype=np.int32),
+        'channel': (rng.random(rows) < 0.3).astype(np.int8),
+        'quantity': quantity,
+        'revenue': quantity * rng.uniform(5, 500, rows)
+    })
+    return cube
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--medicines', type=int, default=2000)
+    parser.add_argument('--companies', type=int, default=150)
+    parser.add_argument('--days', type=int, default=730)
+    args = parser.parse_args()
+
+    print(f"Building cube with {args.rows:,} facts...")
+    start = time.perf_counter()
+    cube = build_cube(args.rows, args.medicines, args.companies, args.days)
+    print(f"  built in {time.perf_counter() - start:.2f}s, {cube.nbytes() / 2**20:.1f} MiB "
+          f"({cube.nbytes() / max(cube.size, 1):.0f} bytes/fact)")
+
+    last_30 = date.today() - timedelta(days=30)
+    print("\nQueries:")
+    timed('grand total', lambda: cube.query([]))
+    timed('by channel', lambda: cube.query(['channel']))
+    timed('top 10 medicines', lambda: cube.query(['medicine'], limit=10))
+    timed('company x product_type', lambda: cube.query(['company', 'product_type']))
+    timed('day x channel, last 30 days', lambda: cube.query(['day', 'channel'], start=last_30, limit=None))
+    timed('medicine x day (sparse), online only', lambda: cube.query(
+        ['medicine', 'day'], filters={'channel': ['online']}, limit=50))
+    timed('medicine x company x type x day x channel', lambda: cube.query(
+        ['medicine', 'company', 'product_type', 'day', 'channel'], limit=50))
+
+if __name__ == '__main__':
+    main()
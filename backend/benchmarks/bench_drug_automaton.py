@@ -0,0 +1,140 @@
+"""
+Benchmark: multi-drug mention detection, per-pattern scan vs the DrugAutomaton
+Builds the automaton the KB cache would (drugs.json names and substitutes plus the
+inference engine's interaction rule drugs) over a vocabulary padded with synthetic
+names, then finds every mention in a labelled query set and in generated queries
+naming one to three drugs. The reference searches the query for each pattern in
+turn with the same word-boundary and leftmost-longest rules. Reports ms/query for
+both, checks the labelled drugs and the interaction rules they trigger, and exits
+non-zero if any result differs. Needs no database.
+Usage (from backend/): python -m benchmarks.bench_drug_automaton --vocab 100 5000 50000
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+from chatbot.drug_automaton import DrugAutomaton, Mention
+from chatbot.inference_engine import MedicalInferenceEngine
+
+DRUGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'drugs.json')
+
+# (query, drugs expected in order, interaction rules expected)
+LABELLED = [
+    ('can I take ibuprofen with warfarin', ['Ibuprofen', 'warfarin'], ['warfarin_nsaid']),
+    ('Aspirin and IBUPROFEN together?', ['Aspirin', 'Ibuprofen'], ['warfarin_nsaid']),
+    ('lisinopril with potassium supplements', ['Lisinopril', 'potassium'], ['ace_inhibitor_potassium']),
+    ('is crocin the same as paracetamol', ['Crocin', 'Paracetamol'], []),
+    ('insulin glargine or Insulin (Rapid-acting)?', ['Insulin glargine', 'Insulin (Rapid-acting)'], []),
+    ('metformin, atorvastatin and amlodipine at night', ['Metformin', 'Atorvastatin', 'Amlodipine'], []),
+    ('side effects of aspirinate', [], []),
+    ('when does my order arrive', [], []),
+]
+SYLLABLES = ['am', 'ox', 'ci', 'lin', 'pra', 'zol', 'met', 'for', 'min', 'ato', 'va', 'sta', 'tin', 'ce',
+             'ti', 'ri', 'zine', 'dol', 'pam', 'ol', 'ide', 'dro', 'xy', 'bu', 'pro', 'fen', 'lo', 'sar']
+FILLER = ['can', 'i', 'take', 'with', 'and', 'or', 'the', 'dose', 'of', 'together', 'is', 'safe', 'after']
+
+class Record:
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+def records(size, rng):
+    with open(DRUGS_PATH) as f:
+        result = [Record(drug['name'], drug) for drug in json.load(f)]
+    synthetic = set()
+    while len(result) + len(synthetic) < size:
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))).capitalize()
+        synthetic.add(name + rng.choice(['', '', ' 500', '-XR', ' (Oral)']))
+    synthetic = sorted(synthetic)
+    for name in synthetic:
+        result.append(Record(name, {'substitutes': rng.sample(synthetic, 2)}))
+    return result
+
+def scan(patterns, query):
+    """Reference: every pattern searched separately, then the automaton's overlap rule"""
+    folded = query.lower()
+    found = []
+    for text, drug, source in patterns:
+        start = folded.find(text)
+        while start != -1:
+            end = start + len(text)
+            if not ((text[0].isalnum() and start > 0 and folded[start - 1].isalnum())
+                    or (text[-1].isalnum() and end < len(folded) and folded[end].isalnum())):
+                found.append((start, end, drug, source))
+            start = folded.find(text, start + 1)
+    mentions, covered = [], 0
+    for start, end, drug, source in sorted(found, key=lambda match: (match[0], match[0] - match[1])):
+        if start >= covered:
+            mentions.append(Mention(start, end, query[start:end], drug, source))
+            covered = end
+    return mentions
+
+def generated_queries(vocab, count, rng):
+    queries = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(3, 8))]
+        for drug in rng.sample(vocab, rng.randint(1, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice([drug, drug.lower(), drug.upper()]))
+        if rng.random() < 0.2:
+            words.append(''.join(rng.choice(string.ascii_lowercase) for _ in range(6)))
+        queries.append(' '.join(words))
+    return queries
+
+def run(queries, find):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append(find(query))
+    return results, (time.perf_counter() - start) / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vocab', type=int, nargs='+', default=[100, 5000, 50000], help='Vocabulary sizes')
+    parser.add_argument('--queries', type=int, default=300, help='Generated queries per size')
+    parser.add_argument('--scan-queries', type=int, default=60, help='Queries to time on the per-pattern scan')
+    args = parser.parse_args()
+
+    engine = MedicalInferenceEngine()
+    failures = 0
+    for size in args.vocab:
+        rng = random.Random(size)
+        kb = records(size, rng)
+
+        start = time.perf_counter()
+        automaton = DrugAutomaton.from_records(kb, engine.interaction_drugs())
+        build = time.perf_counter() - start
+
+        labelled = [query for query, _, _ in LABELLED]
+        queries = labelled + generated_queries([record.name for record in kb], args.queries, rng)
+
+        # The scan is slow on big vocabularies; compare on a prefix of the set
+        scan_set = queries[:len(labelled) + args.scan_queries]
+        scanned, scan_time = run(scan_set, lambda q: scan(automaton._patterns, q))
+        found, automaton_time = run(queries, automaton.find_all)
+        differing = sum(1 for a, b in zip(scanned, found) if a != b)
+
+        wrong = 0
+        for (query, drugs, rules), mentions in zip(LABELLED, found):
+            names = list(dict.fromkeys(mention.drug for mention in mentions))
+            triggered = [interaction['rule'] for interaction in engine.find_interactions(names)]
+            if names != drugs or triggered != rules:
+                wrong += 1
+                print(f"  {query!r}: found {names} {triggered}, expected {drugs} {rules}")
+        failures += differing + wrong
+
+        mentions = sum(len(result) for result in found)
+        print(f"\n{len(kb):,} drugs, {len(automaton):,} patterns (automaton built in {build * 1000:.0f} ms):")
+        print(f"  {'pattern scan':14} {scan_time * 1000:10.3f} ms/query  ({len(scan_set)} queries)")
+        print(f"  {'automaton':14} {automaton_time * 1000:10.3f} ms/query  ({len(queries)} queries, {mentions} mentions)")
+        print(f"  results differing from the scan: {differing}, labelled queries wrong: {wrong}")
+
+    if failures:
+        print(f"\n❌ {failures} queries gave unexpected mentions")
+        sys.exit(1)
+    print("\n✅ Automaton mentions identical to the per-pattern scan")
+
+if __name__ == '__main__':
+    main()
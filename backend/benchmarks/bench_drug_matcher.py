@@ -0,0 +1,146 @@
+"""
+Benchmark: drug-name extraction, linear fuzzy scan vs the indexed DrugMatcher
+Runs MedicalNLPEngine.extract_drug_name against the previous implementation (a
+substring scan plus process.extractOne per query word) on a labelled query set:
+hand-written queries over drugs.json plus generated ones (exact mentions, typos,
+no drug) over a vocabulary padded with synthetic names. Reports accuracy against
+the labels and ms/query for both, and exits non-zero if any result differs.
+Needs no database.
+Usage (from backend/): python -m benchmarks.bench_drug_matcher --vocab 100 5000 50000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+from fuzzywuzzy import fuzz, process
+from chatbot.drug_matcher import DrugMatcher
+from chatbot.nlp_engine import MedicalNLPEngine
+
+DRUGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'drugs.json')
+
+# (query, expected drug or None)
+LABELLED = [
+    ('What is the dosage of Paracetamol?', 'Paracetamol'),
+    ('side effects of ibuprofen', 'Ibuprofen'),
+    ('Can I take amoxicilin with food', 'Amoxicillin'),
+    ('tell me about metformn', 'Metformin'),
+    ('is atorvastatine safe in pregnancy', 'Atorvastatin'),
+    ('how should I store omeprazol', 'Omeprazole'),
+    ('interactions for azithromicin', 'Azithromycin'),
+    ('what is cetrizine used for', 'Cetirizine'),
+    ('hello there', None),
+    ('what are your opening hours', None),
+]
+SYLLABLES = ['am', 'ox', 'ci', 'lin', 'pra', 'zol', 'met', 'for', 'min', 'ato', 'va', 'sta', 'tin', 'ce',
+             'ti', 'ri', 'zine', 'dol', 'pam', 'ol', 'ide', 'dro', 'xy', 'bu', 'pro', 'fen', 'lo', 'sar']
+
+def legacy_extract(query, drug_list):
+    """The previous MedicalNLPEngine.extract_drug_name"""
+    query_lower = query.lower()
+    for drug in drug_list:
+        if drug.lower() in query_lower:
+            return (drug, 100)
+    potential_drugs = []
+    for pattern in [
+        r'(?:about|for|regarding|concerning|of)\s+([A-Za-z]+)',
+        r'(?:drug|medicine|medication|tablet)\s+([A-Za-z]+)',
+        r'\b([A-Z][a-z]+(?:in|ol|ide|ine|ate|one))\b'
+    ]:
+        potential_drugs.extend(re.findall(pattern, query))
+    potential_drugs.extend(re.findall(r'\b[A-Za-z]{4,}\b', query))
+    best_match, best_score = None, 0
+    for potential in potential_drugs:
+        match = process.extractOne(potential, drug_list, scorer=fuzz.ratio)
+        if match and match[1] > best_score and match[1] >= 70:
+            best_match, best_score = match[0], match[1]
+    return (best_match, best_score) if best_match else None
+
+def vocabulary(size, rng):
+    with open(DRUGS_PATH) as f:
+        names = [drug['name'] for drug in json.load(f)]
+    synthetic = set()
+    while len(names) + len(synthetic) < size:
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))).capitalize()
+        synthetic.add(name + rng.choice(['', '', ' 500', '-XR', ' (Oral)']))
+    return names + sorted(synthetic)
+
+def typo(word, rng):
+    chars = list(word)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        op = rng.random()
+        if op < 0.33:
+            chars[i] = rng.choice(string.ascii_lowercase)
+        elif op < 0.66:
+            chars.insert(i, rng.choice(string.ascii_lowercase))
+        elif len(chars) > 4:
+            del chars[i]
+    return ''.join(chars)
+
+def generated_queries(vocab, count, rng):
+    queries = []
+    for i in range(count):
+        drug = rng.choice(vocab)
+        kind = i % 3
+        if kind == 0:
+            queries.append((f'what is the dosage of {drug.lower()}', drug))
+        elif kind == 1:
+            queries.append((f'side effects of {typo(drug.split()[0], rng)} please', drug))
+        else:
+            queries.append(('when does my ' + ''.join(rng.choice(string.ascii_lowercase) for _ in range(6))
+                            + ' order arrive', None))
+    return queries
+
+def run(queries, extract):
+    results = []
+    start = time.perf_counter()
+    for query, _ in queries:
+        results.append(extract(query))
+    return results, (time.perf_counter() - start) / len(queries)
+
+def accuracy(queries, results):
+    hits = sum(1 for (_, expected), result in zip(queries, results) if (result[0] if result else None) == expected)
+    return hits / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vocab', type=int, nargs='+', default=[100, 5000, 50000], help='Vocabulary sizes')
+    parser.add_argument('--queries', type=int, default=300, help='Generated queries per size')
+    parser.add_argument('--legacy-queries', type=int, default=60, help='Queries to time on the legacy path')
+    args = parser.parse_args()
+
+    engine = MedicalNLPEngine()
+    mismatches = 0
+    for size in args.vocab:
+        rng = random.Random(size)
+        vocab = vocabulary(size, rng)
+        queries = LABELLED + generated_queries(vocab, args.queries, rng)
+
+        start = time.perf_counter()
+        matcher = DrugMatcher(vocab)
+        build = time.perf_counter() - start
+
+        # The legacy path is slow on big vocabularies; compare on a prefix of the set
+        legacy_set = queries[:len(LABELLED) + args.legacy_queries]
+        legacy, legacy_time = run(legacy_set, lambda q: legacy_extract(q, vocab))
+        indexed, indexed_time = run(queries, lambda q: engine.extract_drug_name(q, vocab, matcher))
+        differing = sum(1 for a, b in zip(legacy, indexed) if a != b)
+        mismatches += differing
+
+        print(f"\n{len(vocab):,} drugs ({len(legacy_set)} queries on both paths, index built in {build * 1000:.0f} ms):")
+        print(f"  {'linear scan':14} {legacy_time * 1000:10.2f} ms/query  accuracy {accuracy(legacy_set, legacy):.1%}")
+        print(f"  {'drug matcher':14} {indexed_time * 1000:10.2f} ms/query  "
+              f"accuracy {accuracy(legacy_set, indexed[:len(legacy_set)]):.1%} (all {len(queries)}: {accuracy(queries, indexed):.1%})")
+        print(f"  results differing from the linear scan: {differing}")
+
+    if mismatches:
+        print(f"\n❌ {mismatches} queries matched differently from the linear scan")
+        sys.exit(1)
+    print("\n✅ Drug matcher results identical to the linear scan")
+
+if __name__ == '__main__':
+    main()
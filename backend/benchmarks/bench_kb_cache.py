@@ -0,0 +1,69 @@
+"""
+Benchmark: drug knowledge base reads per chatbot message
+Compares loading every chatbot_kb row per message (the previous behaviour) with the
+KB cache: a cold load, a warm read (no query), and a warm read that checks the
+table version. Run with 100 and 100k drugs by default.
+Inserts its rows inside a transaction that is rolled back at the end.
+Usage (from backend/): python -m benchmarks.bench_kb_cache --drugs 100 100000
+"""
+import argparse
+import time
+from sqlalchemy import insert
+from app import create_app
+from models import db
+from models.chatbot_kb import ChatbotKB
+from chatbot.kb_cache import KBCache
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def setup(drugs, tag):
+    rows = [{
+        'drug_id': f'bench-{tag}-{i}',
+        'name': f'Benchdrug{tag}{i}',
+        'data': {'class': 'benchmark', 'dosage': {'adult': '10 mg'}, 'side_effects': ['none'] * 5}
+    } for i in range(drugs)]
+    for start in range(0, drugs, 10000):
+        db.session.execute(insert(ChatbotKB), rows[start:start + 10000])
+    db.session.flush()
+
+def legacy_read():
+    return [drug.name for drug in ChatbotKB.query.all()]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drugs', type=int, nargs='+', default=[100, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            for drugs in args.drugs:
+                setup(drugs, drugs)
+                total = db.session.query(ChatbotKB).count()
+                print(f"\n{total:,} drugs in chatbot_kb:")
+
+                legacy = timed(lambda: (legacy_read(), db.session.expunge_all()), args.repeat)
+                cold = timed(lambda: KBCache().names(), args.repeat)
+                warm_cache = KBCache(check_seconds=3600)
+                warm_cache.names()
+                warm = timed(warm_cache.names, args.repeat * 100)
+                checking = KBCache(check_seconds=0)
+                checking.names()
+                version_check = timed(checking.names, args.repeat)
+
+                print(f"  {'query all per message':28} {legacy * 1000:10.2f} ms")
+                print(f"  {'cache, cold load':28} {cold * 1000:10.2f} ms")
+                print(f"  {'cache, version check':28} {version_check * 1000:10.2f} ms")
+                print(f"  {'cache, warm':28} {warm * 1e6:10.2f} µs")
+        finally:
+            db.session.rollback()
+
+if __name__ == '__main__':
+    main()
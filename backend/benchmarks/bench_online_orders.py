@@ -0,0 +1,112 @@
+"""
+Benchmark: staff online-orders page, per-row lookups vs the single joined query
+Calls the get_online_orders view (authentication skipped) for increasing page sizes
+and counts SQL statements and time, next to the previous implementation (page
+query plus Customer.query.get and an order_items lazy load per order). The view
+must stay at one statement per page whatever per_page is (exits non-zero if not).
+Inserts its data inside a transaction that is rolled back at the end.
+Usage (from backend/): python -m benchmarks.bench_online_orders --orders 1 20 100
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app
+from models import db
+from models.customer import Customer
+from models.medicine import Medicine
+from models.order import Order, OrderItem
+from routes.staff_order_routes import get_online_orders
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+def legacy_page(per_page):
+    """The previous page build: paginate, then a customer lookup and item lazy load per order"""
+    pagination = Order.query.order_by(Order.order_date.desc()).paginate(page=1, per_page=per_page, error_out=False)
+    result = []
+    for order in pagination.items:
+        customer = Customer.query.get(order.customer_id)
+        result.append((customer.name if customer else 'Unknown', len(order.order_items)))
+    return result
+
+def view_page(app, per_page):
+    # token_required keeps the undecorated view as __wrapped__; the user argument is unused
+    with app.test_request_context(f'/api/staff/online-orders?per_page={per_page}'):
+        response, status = get_online_orders.__wrapped__(None)
+    if status != 200:
+        raise RuntimeError(response.get_json())
+    return response.get_json()
+
+def measure(label, fn, repeat=5):
+    best = float('inf')
+    statements = 0
+    for _ in range(repeat):
+        db.session.expunge_all()  # Cold identity map, as in a fresh request
+        with QueryCounter(db.engine) as counter:
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        statements = counter.count
+    print(f"  {label:20} {statements:6d} queries {best * 1000:10.2f} ms")
+    return statements
+
+def setup(orders):
+    medicine = Medicine.query.first()
+    if medicine is None:
+        raise RuntimeError('Needs at least one medicine (run init_db.py)')
+    now = datetime.utcnow()
+    for i in range(orders):
+        # One customer per order, the worst case for per-row lookups; newest, so they fill the page
+        customer = Customer(name=f'bench-orders-{orders}-{i}', email=f'bench-orders-{orders}-{i}@example.com',
+                            phone='0', password_hash='x')
+        db.session.add(customer)
+        db.session.flush()
+        order = Order(customer_id=customer.customer_id, total_amount=20, status='Pending',
+                      shipping_address='1 Bench Street', order_date=now + timedelta(days=1, seconds=i))
+        db.session.add(order)
+        db.session.flush()
+        for _ in range(2):
+            db.session.add(OrderItem(order_id=order.order_id, medicine_id=medicine.medicine_id,
+                                     quantity=1, unit_price=10, subtotal=10))
+    db.session.flush()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, nargs='+', default=[1, 20, 100], help='Page sizes')
+    args = parser.parse_args()
+
+    app = create_app()
+    regressions = []
+    with app.app_context():
+        try:
+            for orders in args.orders:
+                setup(orders)
+                print(f"\n{orders} orders per page:")
+                measure('legacy lookups', lambda: legacy_page(orders))
+                statements = measure('joined query', lambda: view_page(app, orders))
+                if statements != 1:
+                    regressions.append(orders)
+        finally:
+            db.session.rollback()
+
+    if regressions:
+        print(f"\n❌ Online-orders page issued more than one query for pages of {regressions} orders")
+        sys.exit(1)
+    print("\n✅ Online-orders page is a single query for every page size")
+
+if __name__ == '__main__':
+    main()
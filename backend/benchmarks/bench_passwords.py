@@ -0,0 +1,80 @@
+"""
+Benchmark: login throughput and collateral latency with the password service
+C client threads log in concurrently (bcrypt verify at PASSWORD_BCRYPT_ROUNDS) while
+one more thread serves cheap requests. Compares verifying inline on every request
+thread with the bounded pool in services.passwords, reporting logins/s, rejected
+(503) logins, and the p99 latency of the cheap requests during the burst.
+Needs no database.
+Usage (from backend/): python -m benchmarks.bench_passwords --clients 32 --logins 4
+"""
+import argparse
+import threading
+import time
+import bcrypt
+from services import passwords
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def cheap_request():
+    # Stand-in for a catalogue read: a little pure-Python work
+    return sum(i * i for i in range(2000))
+
+def run(label, verify, args, stored):
+    done = threading.Event()
+    cheap_latencies = []
+    counts = {'ok': 0, 'busy': 0}
+    lock = threading.Lock()
+
+    def other_traffic():
+        while not done.is_set():
+            start = time.perf_counter()
+            cheap_request()
+            cheap_latencies.append(time.perf_counter() - start)
+            time.sleep(0.001)
+
+    def client():
+        for _ in range(args.logins):
+            try:
+                verify('correct horse', stored)
+                outcome = 'ok'
+            except passwords.PasswordServiceBusy:
+                outcome = 'busy'
+            with lock:
+                counts[outcome] += 1
+
+    background = threading.Thread(target=other_traffic)
+    background.start()
+    clients = [threading.Thread(target=client) for _ in range(args.clients)]
+    start = time.perf_counter()
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    background.join()
+
+    print(f"\n{label}:")
+    print(f"  logins/s               {counts['ok'] / elapsed:,.1f}")
+    print(f"  rejected (503)         {counts['busy']}")
+    print(f"  cheap request p99      {percentile(cheap_latencies, 99) * 1000:.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent login clients')
+    parser.add_argument('--logins', type=int, default=4, help='Logins per client')
+    args = parser.parse_args()
+
+    stored = bcrypt.hashpw(b'correct horse', bcrypt.gensalt(passwords.PASSWORD_BCRYPT_ROUNDS)).decode('utf-8')
+    print(f"{args.clients} clients x {args.logins} logins, bcrypt cost {passwords.PASSWORD_BCRYPT_ROUNDS}, "
+          f"{passwords.PASSWORD_HASH_WORKERS} pool workers, {passwords.PASSWORD_MAX_PENDING} max pending")
+
+    run('Inline on request threads', lambda pw, h: bcrypt.checkpw(pw.encode('utf-8'), h.encode('utf-8')), args, stored)
+    run('Password service pool', passwords.verify, args, stored)
+
+if __name__ == '__main__':
+    main()
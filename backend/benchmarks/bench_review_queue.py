@@ -0,0 +1,123 @@
+"""
+Benchmark: concurrent pharmacists draining the prescription review queue
+R reviewers repeatedly claim a batch, "review" each order and remove it from the
+queue, until it is empty. Reports throughput, claim latency percentiles, and the
+number of orders handed to more than one reviewer (must be 0).
+Creates its own customer and orders and deletes them afterwards.
+Usage (from backend/): python -m benchmarks.bench_review_queue --reviewers 10 --orders 2000 --batch 5
+"""
+import argparse
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from app import create_app
+from models import db
+from models.customer import Customer
+from models.order import Order
+from models.review_queue import PrescriptionReview
+from models.user import User
+from services import review_queue
+
+def setup(args, tag):
+    customer = Customer(name=f'bench-{tag}', email=f'bench-{tag}@example.com', phone='0', password_hash='x')
+    db.session.add(customer)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    orders = [Order(
+        customer_id=customer.customer_id, total_amount=10, status='Pending Review',
+        shipping_address='1 Bench Street', requires_prescription=True, prescription_uploaded=True,
+        prescription_status='Pending', order_date=now - timedelta(minutes=random.randint(0, 240))
+    ) for _ in range(args.orders)]
+    db.session.add_all(orders)
+    db.session.flush()
+    for order in orders:
+        review_queue.enqueue(order.order_id, priority=random.choice((0, 0, 0, 1)), placed_at=order.order_date)
+    db.session.commit()
+    return customer.customer_id
+
+def teardown(customer_id):
+    # Queue rows go with their orders (ON DELETE CASCADE)
+    Order.query.filter_by(customer_id=customer_id).delete(synchronize_session=False)
+    Customer.query.filter_by(customer_id=customer_id).delete(synchronize_session=False)
+    db.session.commit()
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def drain(app, args, reviewer_ids):
+    handed_out = Counter()
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(reviewer_ids))
+
+    def reviewer(user_id):
+        with app.app_context():
+            barrier.wait()
+            while True:
+                start = time.perf_counter()
+                claimed = review_queue.claim(user_id, args.batch)
+                elapsed = time.perf_counter() - start
+                if not claimed:
+                    return
+                order_ids = [item.order_id for item in claimed]
+                with lock:
+                    latencies.append(elapsed)
+                    handed_out.update(order_ids)
+                if args.review_ms:
+                    time.sleep(args.review_ms / 1000 * len(order_ids))
+                review_queue.dequeue(order_ids)
+                db.session.commit()
+
+    threads = [threading.Thread(target=reviewer, args=(user_id,)) for user_id in reviewer_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return handed_out, latencies
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reviewers', type=int, default=10)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=5, help='Items claimed per call')
+    parser.add_argument('--review-ms', type=float, default=0, help='Simulated review time per order')
+    args = parser.parse_args()
+
+    app = create_app()
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        PrescriptionReview.__table__.create(db.engine, checkfirst=True)
+        # Claims only record the reviewer's id; any existing users will do
+        user_ids = [user_id for user_id, in db.session.query(User.user_id).limit(args.reviewers)]
+        if not user_ids:
+            print("❌ Needs at least one staff user (run init_db.py)")
+            return
+        reviewer_ids = [user_ids[i % len(user_ids)] for i in range(args.reviewers)]
+        customer_id = setup(args, tag)
+        print(f"Queue before: {review_queue.stats()}")
+
+    try:
+        start = time.perf_counter()
+        handed_out, latencies = drain(app, args, reviewer_ids)
+        elapsed = time.perf_counter() - start
+
+        duplicates = sum(1 for count in handed_out.values() if count > 1)
+        print(f"\n{args.reviewers} reviewers, {args.orders} orders, batch {args.batch}:")
+        print(f"  reviewed          {len(handed_out)} in {elapsed:.2f}s ({len(handed_out) / elapsed:.0f} orders/s)")
+        print(f"  claims            {len(latencies)}")
+        print(f"  p50 claim latency {percentile(latencies, 50) * 1000:.1f} ms")
+        print(f"  p99 claim latency {percentile(latencies, 99) * 1000:.1f} ms")
+        print(f"  double-claimed    {duplicates}")
+    finally:
+        with app.app_context():
+            teardown(customer_id)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark: revocation filter lookups at scale
+Fills the Bloom filter used by services.auth_tokens with N revoked token ids, then
+times membership checks for ids that were never revoked (the common case: an
+active token) and measures the false positive rate, i.e. how often a check would
+fall back to the revoked_tokens primary key lookup.
+Needs no database.
+Usage (from backend/): python -m benchmarks.bench_revocations --revoked 1000000 --checks 200000
+"""
+import argparse
+import sys
+import time
+import uuid
+from services.auth_tokens import BloomFilter, REVOCATION_FILTER_CAPACITY, REVOCATION_FILTER_ERROR_RATE
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--revoked', type=int, default=REVOCATION_FILTER_CAPACITY, help='Revoked ids in the filter')
+    parser.add_argument('--checks', type=int, default=200000, help='Lookups of never-revoked ids')
+    parser.add_argument('--capacity', type=int, default=REVOCATION_FILTER_CAPACITY)
+    parser.add_argument('--error-rate', type=float, default=REVOCATION_FILTER_ERROR_RATE)
+    args = parser.parse_args()
+
+    bloom = BloomFilter(args.capacity, args.error_rate)
+    print(f"Filter: {bloom.size:,} bits ({len(bloom.bits) / 1024 / 1024:.1f} MiB), {bloom.hashes} hashes")
+
+    start = time.perf_counter()
+    for _ in range(args.revoked):
+        bloom.add(uuid.uuid4().hex)
+    build = time.perf_counter() - start
+    print(f"Added {args.revoked:,} revoked ids in {build:.1f} s ({args.revoked / build:,.0f}/s)")
+
+    probes = [uuid.uuid4().hex for _ in range(args.checks)]
+    start = time.perf_counter()
+    false_positives = sum(1 for token_id in probes if token_id in bloom)
+    elapsed = time.perf_counter() - start
+
+    rate = false_positives / args.checks
+    print(f"Checked {args.checks:,} active ids: {elapsed / args.checks * 1e6:.2f} µs/check")
+    print(f"False positives: {false_positives:,} ({rate:.4%}, target {args.error_rate:.4%})")
+
+    if args.revoked <= args.capacity and rate > args.error_rate * 2:
+        print("❌ False positive rate is well above the configured target")
+        sys.exit(1)
+    print("✅ False positive rate within target")
+
+if __name__ == '__main__':
+    main()
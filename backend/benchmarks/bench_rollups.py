@@ -0,0 +1,77 @@
+"""
+Benchmark: sales-summary and dashboard totals, raw tables vs daily rollups
+Inserts synthetic sales inside a transaction that is rolled back at the end.
+Usage (from backend/): python -m benchmarks.bench_rollups --rows 10000000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app import create_app
+from models import db
+from models.sale import Sale
+from models.medicine import Medicine
+from services import rollups
+
+def timed(label, fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:40} {best * 1000:10.2f} ms")
+
+def raw_summary(unit):
+    bucket = func.date_trunc(unit, Sale.date)
+    return db.session.query(
+        bucket, func.sum(Sale.total), func.count(Sale.sale_id)
+    ).group_by(bucket).order_by(bucket.desc()).limit(10).all()
+
+def raw_dashboard(start):
+    return db.session.query(func.sum(Sale.total)).filter(Sale.date >= start).scalar()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--days', type=int, default=730)
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        medicine_ids = [m.medicine_id for m in Medicine.query.with_entities(Medicine.medicine_id).all()]
+        if not medicine_ids:
+            print("No medicines found. Run add_sample_medicines.py first.")
+            return
+        
+        try:
+            print(f"Inserting {args.rows:,} synthetic sales over {args.days} days...")
+            start = time.perf_counter()
+            db.session.execute(db.text("""
+                INSERT INTO sales (medicine_id, quantity, price, total, customer_name, date)
+                SELECT (:ids)[1 + (g % array_length(:ids, 1))], 1 + g % 5, 10, 10 * (1 + g % 5),
+                       'bench', now() - (g % :days) * interval '1 day'
+                FROM generate_series(1, :rows) AS g
+            """), {'ids': medicine_ids, 'rows': args.rows, 'days': args.days})
+            print(f"  inserted in {time.perf_counter() - start:.1f}s")
+            
+            start = time.perf_counter()
+            rollups.backfill_sales()
+            print(f"  backfilled rollup in {time.perf_counter() - start:.1f}s")
+            db.session.execute(db.text('ANALYZE sales'))
+            db.session.execute(db.text('ANALYZE daily_sales_rollup'))
+            
+            since = datetime.utcnow() - timedelta(days=30)
+            print("\nRaw tables (O(transactions)):")
+            timed('sales-summary monthly', lambda: raw_summary('month'))
+            timed('sales-summary weekly', lambda: raw_summary('week'))
+            timed('dashboard 30-day sales total', lambda: raw_dashboard(since))
+            
+            print("\nDaily rollups (O(days x medicines)):")
+            timed('sales-summary monthly', lambda: rollups.sales_by_period('monthly', 10))
+            timed('sales-summary weekly', lambda: rollups.sales_by_period('weekly', 10))
+            timed('dashboard 30-day sales total', lambda: rollups.sales_total_since(since.date()))
+        finally:
+            db.session.rollback()
+
+if __name__ == '__main__':
+    main()
@@ -52,6 +52,11 @@ class ChatbotEngineV2:
                 r"(?:price of|cost of|how much is)\s+(.+)",
                 r"(?:show me|get me)\s+(.+)",
             ],
+            # Before ADD_TO_CART, whose "add (.+)" would swallow "add X and Y"
+            Intent.BULK_ADD: [
+                r"add\s+(.+?)\s+and\s+(.+)",
+                r"(?:i need|get me)\s+(.+?),\s*(.+)",
+            ],
             Intent.ADD_TO_CART: [
                 r"add\s+(.+?)\s+to\s+(?:my\s+)?cart",
                 r"(?:i want to buy|buy|purchase)\s+(.+)",
@@ -139,10 +144,6 @@ class ChatbotEngineV2:
                 r"(?:similar to|like)\s+(.+)",
                 r"generic\s+(?:version of|for)\s+(.+)",
             ],
-            Intent.BULK_ADD: [
-                r"add\s+(.+?)\s+and\s+(.+)",
-                r"(?:i need|get me)\s+(.+?),\s*(.+)",
-            ],
             Intent.CHECKOUT: [
                 r"(?:proceed to|go to|start)\s+checkout",
                 r"(?:i want to|ready to)\s+(?:checkout|pay|complete order)",
@@ -187,6 +188,18 @@ class ChatbotEngineV2:
         
         return None
     
+    def extract_bulk_items(self, query: str) -> List[str]:
+        """Split a BULK_ADD query into product names ("add a, b and c to my cart" -> [a, b, c])"""
+        query_lower = query.lower().strip()
+        for pattern in self.intent_patterns[Intent.BULK_ADD]:
+            match = re.search(pattern, query_lower)
+            if match:
+                text = ', '.join(match.groups())
+                text = re.sub(r'\s+to\s+(?:my\s+)?cart\s*$', '', text)
+                names = re.split(r'\s*,\s*|\s+and\s+', text)
+                return [name.strip() for name in names if name.strip()]
+        return []
+    
     def format_product_response(self, products: List[Dict]) -> str:
         """Format product search results into a conversational response"""
         if not products:
@@ -7,6 +7,7 @@ from typing import Dict, List, Optional, Any
 from flask import current_app
 from models import db, Medicine, Customer, CartItem, Order, OrderItem
 from sqlalchemy import or_
+from services import cart_ops, cart_store, cart_view, demand, order_workflow
 
 class ChatbotTools:
     """
@@ -136,7 +137,8 @@ class ChatbotTools:
                     'error': f'Only {medicine.quantity} units available'
                 }
             
-            # Check if item already in cart
+            # Check if item already in cart (with any buffered quantity edit applied)
+            cart_store.flush(customer_id)
             cart_item = CartItem.query.filter_by(
                 customer_id=customer_id,
                 medicine_id=medicine_id
@@ -173,49 +175,58 @@ class ChatbotTools:
             }
     
     @staticmethod
-    def get_cart(customer_id: int) -> Dict[str, Any]:
+    def bulk_add_to_cart(customer_id: int, items: List[Dict[str, int]]) -> Dict[str, Any]:
         """
-        Get customer's cart contents
+        Add several items to customer's cart in one transaction
         
         Args:
             customer_id: Customer ID
+            items: [{'medicine_id': ..., 'quantity': ...}]
             
         Returns:
-            Dict with cart items and totals
+            Dict with success status, skipped items and cart info
         """
         try:
-            cart_items = CartItem.query.filter_by(customer_id=customer_id).all()
-            
-            items = []
-            total = 0
-            requires_prescription = False
-            
-            for item in cart_items:
-                medicine = item.medicine
-                subtotal = float(medicine.price) * item.quantity
-                total += subtotal
-                
-                is_rx = medicine.product_type == 'Rx'
-                if is_rx:
-                    requires_prescription = True
-                
-                items.append({
-                    'cart_item_id': item.cart_item_id,
-                    'medicine_id': medicine.medicine_id,
-                    'medicine_name': medicine.name,
-                    'price': float(medicine.price),
-                    'quantity': item.quantity,
-                    'subtotal': subtotal,
-                    'requires_prescription': is_rx
-                })
+            applied, errors = cart_ops.apply(customer_id, [
+                {'op': 'add', 'medicine_id': item['medicine_id'], 'quantity': item.get('quantity', 1)}
+                for item in items
+            ])
+            db.session.commit()
             
             return {
-                'success': True,
-                'items': items,
-                'total': total,
-                'item_count': len(items),
-                'requires_prescription': requires_prescription
+                'success': bool(applied),
+                'message': f'Added {len(applied)} of {len(items)} items to cart',
+                'errors': [error['message'] for error in errors],
+                'error': '; '.join(error['message'] for error in errors) if not applied else None,
+                'cart': ChatbotTools.get_cart(customer_id)
+            }
+            
+        except cart_ops.CartBatchError as e:
+            db.session.rollback()
+            return {
+                'success': False,
+                'error': e.message
+            }
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'success': False,
+                'error': str(e)
             }
+    
+    @staticmethod
+    def get_cart(customer_id: int) -> Dict[str, Any]:
+        """
+        Get customer's cart contents
+        
+        Args:
+            customer_id: Customer ID
+            
+        Returns:
+            Dict with cart items and totals
+        """
+        try:
+            return dict(cart_view.serialize(cart_view.load(customer_id)), success=True)
             
         except Exception as e:
             return {
@@ -523,14 +534,16 @@ class ChatbotTools:
             Dict with recommended products
         """
         try:
-            # Get popular products (most in stock, good price)
-            query = Medicine.query.filter(Medicine.quantity > 0)
-            
+            criteria = [Medicine.quantity > 0]
             if category:
-                query = query.filter(Medicine.product_type == category)
+                criteria.append(Medicine.product_type == category)
+            
+            # Best sellers across POS and online orders
+            products = [p for p, _, _ in demand.top_medicines(5, criteria=tuple(criteria))]
             
-            # Order by quantity (popularity proxy) and limit to 5
-            products = query.order_by(Medicine.quantity.desc()).limit(5).all()
+            # No sales history yet: fall back to stock level as a popularity proxy
+            if not products:
+                products = Medicine.query.filter(*criteria).order_by(Medicine.quantity.desc()).limit(5).all()
             
             result = {
                 'success': True,
@@ -550,6 +563,7 @@ class ChatbotTools:
             return result
             
         except Exception as e:
+            db.session.rollback()
             return {
                 'success': False,
                 'error': str(e),
@@ -639,7 +653,8 @@ class ChatbotTools:
                     'error': f'Cannot cancel order with status: {order.status}'
                 }
             
-            order.status = 'Cancelled'
+            # Restores stock and records the history entry
+            order_workflow.transition(order.order_id, 'Cancelled', notes='Cancelled by customer via chatbot')
             db.session.commit()
             
             return {
@@ -648,6 +663,12 @@ class ChatbotTools:
                 'order_id': order_id
             }
             
+        except order_workflow.TransitionError as e:
+            db.session.rollback()
+            return {
+                'success': False,
+                'error': e.message
+            }
         except Exception as e:
             db.session.rollback()
             return {
@@ -681,31 +702,20 @@ class ChatbotTools:
             # Get order items
             order_items = OrderItem.query.filter_by(order_id=last_order.order_id).all()
             
-            added_items = []
-            for item in order_items:
-                # Check if medicine still exists and has stock
-                medicine = Medicine.query.get(item.medicine_id)
-                if medicine and medicine.quantity >= item.quantity:
-                    # Add to cart
-                    cart_item = CartItem.query.filter_by(
-                        customer_id=customer_id,
-                        medicine_id=item.medicine_id
-                    ).first()
-                    
-                    if cart_item:
-                        cart_item.quantity += item.quantity
-                    else:
-                        cart_item = CartItem(
-                            customer_id=customer_id,
-                            medicine_id=item.medicine_id,
-                            quantity=item.quantity
-                        )
-                        db.session.add(cart_item)
-                    
-                    added_items.append(medicine.name)
-            
+            # One batched write; lines without enough stock are skipped
+            applied, _ = cart_ops.apply(customer_id, [
+                {'op': 'add', 'medicine_id': item.medicine_id, 'quantity': item.quantity}
+                for item in order_items
+            ])
             db.session.commit()
             
+            names = dict(
+                db.session.query(Medicine.medicine_id, Medicine.name)
+                .filter(Medicine.medicine_id.in_([operation['medicine_id'] for operation in applied]))
+                .all()
+            ) if applied else {}
+            added_items = [names[operation['medicine_id']] for operation in applied]
+            
             return {
                 'success': True,
                 'message': f'Added {len(added_items)} items from your last order',
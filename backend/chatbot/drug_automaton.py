@@ -0,0 +1,157 @@
+"""
+Drug Automaton - Aho-Corasick matcher for every drug mentioned in a query
+Patterns are the KB drug names, any brand aliases an entry lists ('brand_names' or
+'aliases' in its data), the names in each entry's 'substitutes', and extra terms such
+as the drugs named by the inference engine's interaction rules. One pass over the
+query finds all of them, so the cost depends on the query length, not the KB size:
+
+    find_all(query) - Mention(start, end, text, drug, source) for each drug, in query order
+
+Matches must sit on word boundaries ('aspirin' does not match inside 'aspirinate').
+Overlapping matches keep the leftmost, then the longest ('Insulin glargine' rather
+than 'Insulin'). Each pattern resolves to a canonical drug: the KB name for names and
+aliases (and for substitutes that are themselves in the KB), otherwise the pattern's
+own spelling. `source` records which: 'name', 'alias', 'substitute' or 'term'.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+ALIAS_FIELDS = ('brand_names', 'aliases')
+
+# Mentions that resolve to a KB entry
+KB_SOURCES = ('name', 'alias')
+
+class Mention(NamedTuple):
+    start: int
+    end: int
+    text: str
+    drug: str
+    source: str
+
+def _fold(text: str) -> str:
+    """Lowercase without changing the length, so offsets map back to the original text"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+def _word_char(char: str) -> bool:
+    return char.isalnum()
+
+class DrugAutomaton:
+    def __init__(self, patterns: Iterable[Tuple[str, str, str]]):
+        """`patterns` is (text, drug, source); the first occurrence of a text wins"""
+        self._patterns: List[Tuple[str, str, str]] = []
+        seen = set()
+        for text, drug, source in patterns:
+            folded = _fold(text.strip())
+            if folded and folded not in seen:
+                seen.add(folded)
+                self._patterns.append((folded, drug, source))
+        self._build()
+
+    @classmethod
+    def from_records(cls, records, extra_terms: Iterable[str] = ()) -> 'DrugAutomaton':
+        """Build from KB records (anything with .name and .data), names first so they win over substitutes"""
+        records = list(records)
+        by_name = {_fold(record.name.strip()): record.name for record in records}
+
+        def canonical(text: str) -> Tuple[str, bool]:
+            name = by_name.get(_fold(text.strip()))
+            return (name, True) if name is not None else (text.strip(), False)
+
+        patterns = [(record.name, record.name, 'name') for record in records]
+        for record in records:
+            data = record.data or {}
+            for field in ALIAS_FIELDS:
+                for alias in data.get(field) or ():
+                    if isinstance(alias, str):
+                        patterns.append((alias, record.name, 'alias'))
+        for record in records:
+            for substitute in (record.data or {}).get('substitutes') or ():
+                if isinstance(substitute, str):
+                    drug, known = canonical(substitute)
+                    patterns.append((substitute, drug, 'name' if known else 'substitute'))
+        for term in extra_terms:
+            drug, known = canonical(term)
+            patterns.append((term, drug, 'name' if known else 'term'))
+        return cls(patterns)
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def _build(self):
+        # Trie: per-state transitions, failure links and the patterns ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for index, (text, _, _) in enumerate(self._patterns):
+            state = 0
+            for char in text:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(index)
+
+        # Breadth-first failure links; each state also reports its failure state's patterns
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def _matches(self, folded: str) -> List[Tuple[int, int, int]]:
+        """Every (start, end, pattern index) on word boundaries"""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self._patterns
+        length = len(folded)
+        found = []
+        state = 0
+        for position, char in enumerate(folded):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                text = patterns[index][0]
+                start = position + 1 - len(text)
+                end = position + 1
+                if _word_char(text[0]) and start > 0 and _word_char(folded[start - 1]):
+                    continue
+                if _word_char(text[-1]) and end < length and _word_char(folded[end]):
+                    continue
+                found.append((start, end, index))
+        return found
+
+    def find_all(self, query: str) -> List[Mention]:
+        """Non-overlapping mentions in query order (leftmost, then longest)"""
+        matches = sorted(self._matches(_fold(query)), key=lambda match: (match[0], match[0] - match[1]))
+        mentions = []
+        covered = 0
+        for start, end, index in matches:
+            if start < covered:
+                continue
+            _, drug, source = self._patterns[index]
+            mentions.append(Mention(start, end, query[start:end], drug, source))
+            covered = end
+        return mentions
+
+    def drugs(self, query: str) -> List[str]:
+        """Distinct canonical drugs mentioned, in order of first mention"""
+        return list(dict.fromkeys(mention.drug for mention in self.find_all(query)))
+
+    def first_known(self, query: str) -> Optional[Mention]:
+        """Earliest mention that resolves to a KB entry"""
+        for mention in self.find_all(query):
+            if mention.source in KB_SOURCES:
+                return mention
+        return None
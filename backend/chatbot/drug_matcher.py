@@ -0,0 +1,120 @@
+"""
+Drug Matcher - Indexed drug-name lookup for the NLP engine
+Answers the two questions MedicalNLPEngine.extract_drug_name asks, with the same
+results as the previous linear scans:
+
+    find_in(query)  - first drug (in list order) whose name appears in the query
+    best_fuzzy(word) - best fuzz.ratio match for a word, if it scores >= threshold
+
+Substring lookup indexes every name under its rarest character trigram, so a query
+only verifies names whose anchor trigram it contains. Fuzzy lookup keeps the names
+(as fuzzywuzzy's default processor sees them) sorted by length with a character
+count matrix. fuzz.ratio can only reach the threshold if the lengths are close
+enough and the shared character counts are high enough, so those two bounds are
+applied first (a slice and one vectorized pass over the remaining window) and the
+real fuzz.ratio only runs on the survivors. The bounds never discard a name that
+could score at or above the threshold, so results match extractOne exactly.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from fuzzywuzzy import fuzz, utils
+
+DEFAULT_THRESHOLD = 70
+
+def _trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class DrugMatcher:
+    def __init__(self, drug_list: List[str], lowered: Optional[List[str]] = None):
+        self.drug_list = list(drug_list)
+        lowered = lowered if lowered is not None else [drug.lower() for drug in self.drug_list]
+        self._build_substring_index(lowered)
+        self._build_fuzzy_index()
+
+    # Substring lookup
+
+    def _build_substring_index(self, lowered: List[str]):
+        self._lowered = lowered
+        self._short = []  # Names under 3 characters have no trigram; always checked
+        frequency = defaultdict(int)
+        grams = []
+        for lower in lowered:
+            trigrams = _trigrams(lower)
+            grams.append(trigrams)
+            for gram in trigrams:
+                frequency[gram] += 1
+
+        self._anchors = defaultdict(list)
+        for index, trigrams in enumerate(grams):
+            if not trigrams:
+                self._short.append(index)
+            else:
+                self._anchors[min(trigrams, key=lambda gram: (frequency[gram], gram))].append(index)
+
+    def find_in(self, query: str) -> Optional[str]:
+        """First drug in list order whose lowercase name is a substring of the query"""
+        query_lower = query.lower()
+        candidates = list(self._short)
+        for gram in _trigrams(query_lower):
+            candidates.extend(self._anchors.get(gram, ()))
+        for index in sorted(candidates):
+            if self._lowered[index] in query_lower:
+                return self.drug_list[index]
+        return None
+
+    # Fuzzy lookup
+
+    def _build_fuzzy_index(self):
+        processed = [utils.full_process(drug) for drug in self.drug_list]
+        alphabet = sorted({char for text in processed for char in text})
+        self._columns: Dict[str, int] = {char: column for column, char in enumerate(alphabet)}
+
+        order = sorted((index for index, text in enumerate(processed) if text), key=lambda i: len(processed[i]))
+        self._order = np.array(order, dtype=np.int64)
+        self._processed = [processed[i] for i in order]
+        self._lengths = np.array([len(text) for text in self._processed], dtype=np.int64)
+        self._counts = np.zeros((len(order), max(1, len(alphabet))), dtype=np.int16)
+        for row, text in enumerate(self._processed):
+            for char in text:
+                self._counts[row, self._columns[char]] += 1
+
+    def best_fuzzy(self, word: str, threshold: int = DEFAULT_THRESHOLD) -> Optional[Tuple[str, int]]:
+        """
+        (drug, score) for the highest fuzz.ratio against `word`, ties to the earliest drug,
+        as process.extractOne(word, drug_list, scorer=fuzz.ratio) would pick, or None if
+        that score is below `threshold`
+        """
+        query = utils.full_process(word)
+        if not query or not len(self._order):
+            return None
+        la = len(query)
+        # ratio rounds 100 * 2 * matches / (la + lb); matches <= min(la, lb) and <= shared characters
+        cutoff = (threshold - 0.5) / 200
+
+        # Length window: min(la, lb) / (la + lb) >= cutoff
+        low = int(np.ceil(la * cutoff / (1 - cutoff) - 1e-9))
+        high = int(np.floor(la * (1 - cutoff) / cutoff + 1e-9))
+        start = np.searchsorted(self._lengths, low, side='left')
+        stop = np.searchsorted(self._lengths, high, side='right')
+        if start >= stop:
+            return None
+
+        vector = np.zeros(self._counts.shape[1], dtype=np.int16)
+        for char in query:
+            column = self._columns.get(char)
+            if column is not None:
+                vector[column] += 1
+        shared = np.minimum(self._counts[start:stop], vector).sum(axis=1)
+        survivors = np.nonzero(shared >= cutoff * (la + self._lengths[start:stop]) - 1e-9)[0]
+
+        best = None
+        for row in survivors + start:
+            score = fuzz.ratio(query, self._processed[row])
+            index = int(self._order[row])
+            if best is None or score > best[1] or (score == best[1] and index < best[0]):
+                best = (index, score)
+        if best is None or best[1] < threshold:
+            return None
+        return self.drug_list[best[0]], best[1]
@@ -5,6 +5,7 @@ Implements rule-based reasoning with forward and backward chaining
 
 from typing import Dict, List, Optional, Tuple
 import json
+import re
 from datetime import datetime
 
 class MedicalInferenceEngine:
@@ -95,6 +96,46 @@ class MedicalInferenceEngine:
             }
         }
     
+    def interaction_drugs(self) -> List[str]:
+        """Every drug named by a drug-drug rule (registered with the mention matcher)"""
+        names = []
+        for rule in self.interaction_rules['drug_drug'].values():
+            names.extend(rule['drugs'])
+        return list(dict.fromkeys(names))
+    
+    def find_interactions(self, drug_names: List[str]) -> List[Dict]:
+        """
+        Drug-drug rules triggered by the mentioned drugs
+        A rule fires when two or more of its drugs are mentioned; names match a rule
+        drug by whole word ('Insulin (Rapid-acting)' -> insulin)
+        """
+        mentioned = set()
+        for name in drug_names or []:
+            mentioned.update(re.findall(r'[a-z]+', name.lower()))
+        
+        interactions = []
+        for rule_name, rule in self.interaction_rules['drug_drug'].items():
+            drugs = [drug for drug in rule['drugs'] if drug in mentioned]
+            if len(drugs) >= 2:
+                interactions.append({
+                    'rule': rule_name,
+                    'drugs': drugs,
+                    'severity': rule['severity'],
+                    'effect': rule['effect']
+                })
+        return interactions
+    
+    def format_interactions(self, interactions: List[Dict]) -> List[str]:
+        """Response lines warning about triggered interaction rules"""
+        if not interactions:
+            return []
+        lines = ["\n**⚠️ Interaction Warnings for the Medications Mentioned:**"]
+        for interaction in interactions:
+            drugs = ' + '.join(drug.title() for drug in interaction['drugs'])
+            lines.append(f"• {drugs}: {interaction['effect']} ({interaction['severity']} severity)")
+        lines.append("• Do not combine these without consulting your doctor or pharmacist")
+        return lines
+    
     def generate_response(self, intent: str, drug_data: Dict, entities: Dict = None) -> Dict:
         """
         Generate comprehensive response based on intent and drug data
@@ -123,7 +164,14 @@ class MedicalInferenceEngine:
         }
         
         generator = response_generators.get(intent, self._generate_general_response)
-        return generator(drug_name, data, entities)
+        result = generator(drug_name, data, entities)
+        
+        # Warn about interactions between the mentioned drugs whatever was asked
+        if 'interactions' not in result:
+            result['interactions'] = self.find_interactions([drug_name] + list((entities or {}).get('drugs', [])))
+            if result['interactions']:
+                result['response'] = '\n'.join([result['response']] + self.format_interactions(result['interactions']))
+        return result
     
     def _generate_dosage_response(self, drug_name: str, data: Dict, entities: Dict) -> Dict:
         """Generate detailed dosage information"""
@@ -330,10 +378,15 @@ class MedicalInferenceEngine:
                 "• Complete the full course as prescribed"
             ])
         
+        # Check the other drugs mentioned in the query against the interaction rules
+        interactions = self.find_interactions([drug_name] + list((entities or {}).get('drugs', [])))
+        response_parts.extend(self.format_interactions(interactions))
+        
         return {
             'response': '\n'.join(response_parts),
             'confidence': 0.85,
-            'category': 'interactions'
+            'category': 'interactions',
+            'interactions': interactions
         }
     
     def _generate_storage_response(self, drug_name: str, data: Dict, entities: Dict) -> Dict:
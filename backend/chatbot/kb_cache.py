@@ -0,0 +1,171 @@
+"""
+KB Cache - In-memory copy of the drug knowledge base (chatbot_kb)
+The table is loaded once into a dict of records keyed by normalized name, with the
+display names, their lowercase forms, a DrugMatcher index and a DrugAutomaton (every
+drug mentioned in a query) prepared for the NLP engine. It is reloaded only when the table's version changes: (row count,
+max(last_updated)) is checked at most every KB_CACHE_CHECK_SECONDS, and immediately
+after this process commits a ChatbotKB change. Each reload builds a fresh index and
+automaton, so new names, aliases and substitutes are matched straight away.
+Shared by the expert-system route, the NLP and inference engines, and the v2
+DRUG_INFO fallback.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from models import db
+from models.chatbot_kb import ChatbotKB
+from chatbot.drug_matcher import DrugMatcher
+from chatbot.drug_automaton import DrugAutomaton
+
+KB_CACHE_CHECK_SECONDS = float(os.environ.get('KB_CACHE_CHECK_SECONDS', 10))
+
+def normalize(name: str) -> str:
+    """Lowercase with punctuation and repeated spaces collapsed ('Co-Amoxiclav ' -> 'co amoxiclav')"""
+    return ' '.join(re.findall(r'[a-z0-9]+', name.lower()))
+
+class KBRecord:
+    __slots__ = ('drug_id', 'name', 'data', 'lower', 'key')
+
+    def __init__(self, drug_id: str, name: str, data: Dict):
+        self.drug_id = drug_id
+        self.name = name
+        self.data = data
+        self.lower = name.lower()
+        self.key = normalize(name)
+
+    def as_drug_data(self) -> Dict:
+        """The {'name', 'data'} shape the inference engine expects"""
+        return {'name': self.name, 'data': self.data}
+
+class KBSnapshot:
+    """One immutable load of the table; readers keep using it while a reload builds the next"""
+
+    def __init__(self, version: Tuple, records: List[KBRecord], terms: Tuple[str, ...] = ()):
+        self.version = version
+        self.records = records
+        self.terms = terms
+        self.by_key = {}
+        for record in records:
+            self.by_key.setdefault(record.key, record)
+        self.names = [record.name for record in records]
+        self.lowered_names = [record.lower for record in records]
+        self._matcher = None
+        self._automaton = None
+
+    @property
+    def matcher(self) -> DrugMatcher:
+        """Name index for the NLP engine, built on first use"""
+        if self._matcher is None:
+            self._matcher = DrugMatcher(self.names, self.lowered_names)
+        return self._matcher
+
+    @property
+    def automaton(self) -> DrugAutomaton:
+        """Mention matcher over names, aliases, substitutes and the registered terms, built on first use"""
+        if self._automaton is None:
+            self._automaton = DrugAutomaton.from_records(self.records, self.terms)
+        return self._automaton
+
+class KBCache:
+    def __init__(self, check_seconds: float = KB_CACHE_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._stale = False
+        self._terms: Tuple[str, ...] = ()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version() -> Tuple:
+        return tuple(db.session.query(func.count(ChatbotKB.id), func.max(ChatbotKB.last_updated)).one())
+
+    def _load(self, version: Tuple) -> KBSnapshot:
+        rows = db.session.query(ChatbotKB.drug_id, ChatbotKB.name, ChatbotKB.data).order_by(ChatbotKB.id).all()
+        return KBSnapshot(version, [KBRecord(*row) for row in rows], self._terms)
+
+    def snapshot(self) -> KBSnapshot:
+        """The current snapshot, reloading first if the table has changed"""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale and time.monotonic() - self._checked_at < self.check_seconds:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._stale or time.monotonic() - self._checked_at >= self.check_seconds:
+                self._stale = False
+                version = self._version()
+                if self._snapshot is None or self._snapshot.version != version:
+                    self._snapshot = self._load(version)
+                self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """Check the version on the next read"""
+        self._stale = True
+
+    def add_terms(self, terms: Iterable[str]):
+        """Extra drug names for the automaton that are not KB entries (e.g. interaction rule drugs)"""
+        with self._lock:
+            self._terms = tuple(dict.fromkeys(self._terms + tuple(terms)))
+            snapshot = self._snapshot
+            if snapshot is not None:
+                self._snapshot = KBSnapshot(snapshot.version, snapshot.records, self._terms)
+
+    def names(self) -> List[str]:
+        return self.snapshot().names
+
+    def get(self, name: str) -> Optional[KBRecord]:
+        """Record whose normalized name equals `name`'s"""
+        return self.snapshot().by_key.get(normalize(name))
+
+    def search(self, fragment: str) -> Optional[KBRecord]:
+        """Exact name match, else the first record whose name contains `fragment` (case-insensitive)"""
+        snapshot = self.snapshot()
+        record = snapshot.by_key.get(normalize(fragment))
+        if record is not None:
+            return record
+        fragment = fragment.lower()
+        for record in snapshot.records:
+            if fragment in record.lower:
+                return record
+        return None
+
+kb_cache = KBCache()
+
+# Invalidation: commits touching chatbot_kb in this process
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ChatbotKB):
+            session.info['kb_cache_stale'] = True
+            return
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk UPDATE/DELETE (e.g. the loader's ChatbotKB.query.delete()) bypass the unit of work
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is ChatbotKB:
+            orm_execute_state.session.info['kb_cache_stale'] = True
+
+def _after_commit(session):
+    if session.info.pop('kb_cache_stale', False):
+        kb_cache.invalidate()
+
+def _after_rollback(session):
+    session.info.pop('kb_cache_stale', None)
+
+_listeners_registered = False
+
+def init_app(app):
+    """Register the commit hooks that mark the cache stale"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'do_orm_execute', _do_orm_execute)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    _listeners_registered = True
@@ -4,8 +4,9 @@ Handles entity extraction, intent classification, and fuzzy matching
 """
 
 import re
-from fuzzywuzzy import fuzz, process
 from typing import Dict, List, Tuple, Optional
+from chatbot.drug_matcher import DrugMatcher
+from chatbot.drug_automaton import DrugAutomaton, KB_SOURCES
 import json
 
 class MedicalNLPEngine:
@@ -58,17 +59,20 @@ class MedicalNLPEngine:
         # Question words that indicate queries
         self.question_words = ['what', 'when', 'where', 'how', 'why', 'which', 'who', 'can', 'should', 'is', 'are']
         
-    def extract_drug_name(self, query: str, drug_list: List[str]) -> Optional[Tuple[str, int]]:
+    def extract_drug_name(self, query: str, drug_list: List[str],
+                          matcher: Optional[DrugMatcher] = None) -> Optional[Tuple[str, int]]:
         """
         Extract drug name from query using fuzzy matching
+        `matcher` is an index over drug_list (the KB cache keeps one); built here if omitted
         Returns: (drug_name, confidence_score) or None
         """
-        query_lower = query.lower()
+        if matcher is None:
+            matcher = DrugMatcher(drug_list)
         
         # Try exact match first
-        for drug in drug_list:
-            if drug.lower() in query_lower:
-                return (drug, 100)
+        exact = matcher.find_in(query)
+        if exact is not None:
+            return (exact, 100)
         
         # Extract potential drug names (capitalized words or words after "about", "for", etc.)
         potential_drugs = []
@@ -93,8 +97,8 @@ class MedicalNLPEngine:
         best_score = 0
         
         for potential in potential_drugs:
-            match = process.extractOne(potential, drug_list, scorer=fuzz.ratio)
-            if match and match[1] > best_score and match[1] >= 70:  # 70% threshold
+            match = matcher.best_fuzzy(potential, threshold=70)  # 70% threshold
+            if match and match[1] > best_score:
                 best_match = match[0]
                 best_score = match[1]
         
@@ -137,6 +141,13 @@ class MedicalNLPEngine:
         sorted_intents = sorted(intent_scores.items(), key=lambda x: x[1], reverse=True)
         return sorted_intents
     
+    def extract_drug_mentions(self, query: str, automaton: DrugAutomaton) -> List[Dict[str, any]]:
+        """
+        Every drug mentioned in the query, in order, with its character span
+        Returns: [{'start', 'end', 'text', 'drug', 'source'}, ...]
+        """
+        return [mention._asdict() for mention in automaton.find_all(query)]
+    
     def extract_entities(self, query: str) -> Dict[str, any]:
         """
         Extract entities like dosage, frequency, time, etc.
@@ -204,13 +215,22 @@ class MedicalNLPEngine:
         
         return round(confidence, 2)
     
-    def parse_query(self, query: str, drug_list: List[str]) -> Dict[str, any]:
+    def parse_query(self, query: str, drug_list: List[str], matcher: Optional[DrugMatcher] = None,
+                    automaton: Optional[DrugAutomaton] = None) -> Dict[str, any]:
         """
         Complete query parsing pipeline
         Returns comprehensive analysis of the query
+        With an `automaton` (the KB cache keeps one), all drug mentions are reported and
+        the primary drug is the first one mentioned that is in the knowledge base
         """
+        mentions = self.extract_drug_mentions(query, automaton) if automaton is not None else []
+        
         # Extract drug name
-        drug_match = self.extract_drug_name(query, drug_list)
+        primary = next((mention for mention in mentions if mention['source'] in KB_SOURCES), None)
+        if primary is not None:
+            drug_match = (primary['drug'], 100)
+        else:
+            drug_match = self.extract_drug_name(query, drug_list, matcher)
         
         # Classify intent
         intents = self.classify_intent(query)
@@ -235,6 +255,8 @@ class MedicalNLPEngine:
             'intent_confidence': primary_intent[1],
             'all_intents': intents,
             'entities': entities,
+            'drug_mentions': mentions,
+            'drug_names': list(dict.fromkeys(mention['drug'] for mention in mentions)),
             'overall_confidence': confidence,
             'query_length': len(query)
         }
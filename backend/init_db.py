@@ -4,6 +4,12 @@ from models.user import Role, User
 from models.medicine import Company, Medicine
 from models.customer import Customer, CartItem
 from models.order import Order, OrderItem, OrderStatusHistory
+from models.rollup import DailySalesRollup, DailyPurchaseRollup
+from models.report_job import ReportJob
+from models.idempotency import IdempotencyKey
+from models.review_queue import PrescriptionReview
+from models.auth_token import RefreshToken, RevokedToken
+from services import demand
 
 def init_database():
     """Initialize the database with default data"""
@@ -13,6 +19,9 @@ def init_database():
         # Create all tables
         db.create_all()
         
+        # Views over the tables above
+        demand.ensure_view()
+        
         # Check if roles already exist
         if Role.query.count() == 0:
             # Create default roles
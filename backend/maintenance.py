@@ -0,0 +1,215 @@
+"""
+Maintenance commands for Medi-Flow Systems
+Usage: python maintenance.py <command> [options]
+"""
+import argparse
+from datetime import datetime
+from app import create_app
+from models import db
+
+def backfill_rollups(args):
+    """Rebuild the daily sales/purchase rollups from the raw tables"""
+    from services import rollups
+    from models.rollup import DailySalesRollup, DailyPurchaseRollup
+    
+    # Create the rollup tables on databases initialised before they existed
+    DailySalesRollup.__table__.create(db.engine, checkfirst=True)
+    DailyPurchaseRollup.__table__.create(db.engine, checkfirst=True)
+    
+    since = datetime.strptime(args.since, '%Y-%m-%d').date() if args.since else None
+    
+    try:
+        sales_rows = rollups.backfill_sales(since)
+        purchase_rows = rollups.backfill_purchases(since)
+        db.session.commit()
+        print(f"✅ daily_sales_rollup: {sales_rows} rows")
+        print(f"✅ daily_purchase_rollup: {purchase_rows} rows")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error backfilling rollups: {e}")
+
+def refresh_demand(args):
+    """Create (if needed) and refresh the medicine_demand_daily materialized view"""
+    from services import demand
+    
+    try:
+        demand.ensure_view()
+        if demand.refresh(concurrently=not args.blocking):
+            print(f"✅ {demand.VIEW_NAME} refreshed")
+        else:
+            print(f"⏳ {demand.VIEW_NAME} is already being refreshed")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error refreshing demand view: {e}")
+
+def purge_idempotency_keys(args):
+    """Delete expired Idempotency-Key records"""
+    from services import idempotency
+    
+    try:
+        deleted = idempotency.purge_expired(batch_size=args.batch_size)
+        print(f"✅ Deleted {deleted} expired idempotency keys")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error purging idempotency keys: {e}")
+
+def purge_auth_tokens(args):
+    """Delete expired refresh tokens and token revocations"""
+    from services import auth_tokens
+    
+    try:
+        deleted = auth_tokens.purge_expired(batch_size=args.batch_size)
+        print(f"✅ Deleted {deleted} expired refresh tokens and revocations")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error purging auth tokens: {e}")
+
+def migrate_prescriptions(args):
+    """Move flat legacy prescription uploads into the content-addressed store"""
+    from services import prescription_storage
+    
+    try:
+        migrated, skipped = prescription_storage.migrate_legacy(batch_size=args.batch_size, dry_run=args.dry_run)
+        verb = 'Would migrate' if args.dry_run else 'Migrated'
+        print(f"✅ {verb} {migrated} order prescriptions")
+        if skipped:
+            print(f"❌ Skipped {skipped} orders whose prescription file is missing or invalid")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error migrating prescriptions: {e}")
+
+def purge_orphan_prescriptions(args):
+    """Remove stored prescriptions that no order references"""
+    from services import prescription_storage
+    
+    try:
+        grace_hours = args.grace_hours if args.grace_hours is not None else prescription_storage.PRESCRIPTION_ORPHAN_GRACE_HOURS
+        removed = prescription_storage.purge_orphans(grace_hours=grace_hours, dry_run=args.dry_run)
+        verb = 'Would remove' if args.dry_run else 'Removed'
+        print(f"✅ {verb} {removed} unreferenced prescription files")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error purging prescription files: {e}")
+
+def render_previews(args):
+    """Render missing prescription previews (pending reviews only, unless --all)"""
+    from concurrent.futures import wait
+    from services import prescription_previews
+    from models.order import Order
+    
+    query = db.session.query(Order.prescription_file_path).filter(Order.prescription_file_path.isnot(None))
+    if not args.all:
+        query = query.filter(Order.prescription_status == 'Pending')
+    stored_paths = {stored_path for stored_path, in query.distinct()}
+    
+    futures = [prescription_previews.schedule(stored_path) for stored_path in stored_paths]
+    futures = [future for future in futures if future is not None]
+    wait(futures)
+    failed = sum(1 for future in futures if future.exception() is not None)
+    print(f"✅ Rendered previews for {len(futures) - failed} prescriptions")
+    if failed:
+        print(f"❌ {failed} prescriptions could not be rendered")
+
+def backfill_review_queue(args):
+    """Queue orders placed before the prescription review queue existed"""
+    from services import review_queue
+    from models.review_queue import PrescriptionReview
+    
+    PrescriptionReview.__table__.create(db.engine, checkfirst=True)
+    
+    try:
+        added = review_queue.backfill()
+        released = review_queue.release_expired()
+        print(f"✅ Queued {added} orders awaiting prescription review")
+        print(f"✅ Released {released} expired claims")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error backfilling review queue: {e}")
+
+def add_cart_unique_constraint(args):
+    """Merge duplicate cart lines and add the (customer_id, medicine_id) unique constraint"""
+    try:
+        exists = db.session.execute(db.text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'uq_cart_items_customer_medicine'"
+        )).first()
+        if exists:
+            print("✅ uq_cart_items_customer_medicine already exists")
+            return
+        
+        # Keep the oldest line per medicine with the quantities summed
+        merged = db.session.execute(db.text("""
+            WITH totals AS (
+                SELECT MIN(cart_item_id) AS keep_id, SUM(quantity) AS quantity
+                FROM cart_items
+                GROUP BY customer_id, medicine_id
+                HAVING COUNT(*) > 1
+            )
+            UPDATE cart_items c SET quantity = t.quantity
+            FROM totals t WHERE c.cart_item_id = t.keep_id
+        """)).rowcount
+        removed = db.session.execute(db.text("""
+            DELETE FROM cart_items c
+            USING cart_items keep
+            WHERE keep.customer_id = c.customer_id
+              AND keep.medicine_id = c.medicine_id
+              AND keep.cart_item_id < c.cart_item_id
+        """)).rowcount
+        db.session.execute(db.text("""
+            ALTER TABLE cart_items
+            ADD CONSTRAINT uq_cart_items_customer_medicine UNIQUE (customer_id, medicine_id)
+        """))
+        db.session.commit()
+        print(f"✅ Merged {merged} duplicated cart lines ({removed} rows removed)")
+        print("✅ Added uq_cart_items_customer_medicine")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error adding cart unique constraint: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Medi-Flow Systems maintenance commands')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    backfill = subparsers.add_parser('backfill-rollups', help='Rebuild daily sales/purchase rollups')
+    backfill.add_argument('--since', help='Only rebuild days from this date (YYYY-MM-DD)')
+    backfill.set_defaults(func=backfill_rollups)
+    
+    demand_parser = subparsers.add_parser('refresh-demand', help='Refresh the unified POS/online demand view')
+    demand_parser.add_argument('--blocking', action='store_true', help='Plain (non-concurrent) refresh')
+    demand_parser.set_defaults(func=refresh_demand)
+    
+    purge = subparsers.add_parser('purge-idempotency-keys', help='Delete expired idempotency keys')
+    purge.add_argument('--batch-size', type=int, default=10000)
+    purge.set_defaults(func=purge_idempotency_keys)
+    
+    purge_tokens = subparsers.add_parser('purge-auth-tokens', help='Delete expired refresh tokens and revocations')
+    purge_tokens.add_argument('--batch-size', type=int, default=10000)
+    purge_tokens.set_defaults(func=purge_auth_tokens)
+    
+    migrate = subparsers.add_parser('migrate-prescriptions', help='Move legacy prescription uploads to content-addressed storage')
+    migrate.add_argument('--batch-size', type=int, default=500)
+    migrate.add_argument('--dry-run', action='store_true', help='Only report what would be migrated')
+    migrate.set_defaults(func=migrate_prescriptions)
+    
+    orphans = subparsers.add_parser('purge-orphan-prescriptions', help='Remove stored prescriptions no order references')
+    orphans.add_argument('--grace-hours', type=float, default=None, help='Keep files stored more recently than this')
+    orphans.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+    orphans.set_defaults(func=purge_orphan_prescriptions)
+    
+    previews = subparsers.add_parser('render-previews', help='Render missing prescription previews and thumbnails')
+    previews.add_argument('--all', action='store_true', help='Include orders that are no longer pending review')
+    previews.set_defaults(func=render_previews)
+    
+    review = subparsers.add_parser('backfill-review-queue', help='Queue existing orders awaiting prescription review')
+    review.set_defaults(func=backfill_review_queue)
+    
+    cart_unique = subparsers.add_parser('add-cart-unique-constraint', help='Merge duplicate cart lines and enforce one line per medicine')
+    cart_unique.set_defaults(func=add_cart_unique_constraint)
+    
+    args = parser.parse_args()
+    
+    app = create_app()
+    with app.app_context():
+        args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,9 @@ db = SQLAlchemy()
 from .user import User, Role
 from .medicine import Medicine, Company
 from .customer import Customer, CartItem
-from .order import Order, OrderItem, OrderStatusHistory
\ No newline at end of file
+from .order import Order, OrderItem, OrderStatusHistory
+from .rollup import DailySalesRollup, DailyPurchaseRollup
+from .report_job import ReportJob
+from .idempotency import IdempotencyKey
+from .review_queue import PrescriptionReview
+from .auth_token import RefreshToken, RevokedToken
\ No newline at end of file
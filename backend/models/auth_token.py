@@ -0,0 +1,35 @@
+from . import db
+from datetime import datetime
+
+class RefreshToken(db.Model):
+    """One issued refresh token; each refresh replaces it with the next one in its family"""
+    __tablename__ = 'refresh_tokens'
+
+    token_id = db.Column(db.String(32), primary_key=True)  # jti of the refresh JWT
+    family_id = db.Column(db.String(32), nullable=False, index=True)  # Shared by every rotation of one login
+    subject_type = db.Column(db.String(10), nullable=False)  # 'user' or 'customer'
+    subject_id = db.Column(db.Integer, nullable=False)
+    issued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    replaced_by = db.Column(db.String(32))  # Set once rotated; presenting it again is reuse
+    revoked_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<RefreshToken {self.subject_type}:{self.subject_id} {self.token_id}>'
+
+class RevokedToken(db.Model):
+    """
+    Access tokens revoked before they expire (logout, refresh token reuse)
+    token_id is an access token's jti, or a family id revoking every access token
+    issued from that login.
+    """
+    __tablename__ = 'revoked_tokens'
+
+    token_id = db.Column(db.String(32), primary_key=True)
+    subject_type = db.Column(db.String(10), nullable=False)
+    subject_id = db.Column(db.Integer, nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Row can be purged after this
+
+    def __repr__(self):
+        return f'<RevokedToken {self.token_id}>'
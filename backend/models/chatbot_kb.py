@@ -9,7 +9,8 @@ class ChatbotKB(db.Model):
     drug_id = db.Column(db.Text, unique=True, nullable=False)
     name = db.Column(db.Text, nullable=False)
     data = db.Column(JSONB, nullable=False)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Bumped on every update; the chatbot KB cache reloads when max(last_updated) moves
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     def __repr__(self):
         return f'<ChatbotKB {self.drug_id}>'
@@ -1,6 +1,6 @@
 from . import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from services import passwords
 
 class Customer(db.Model):
     __tablename__ = 'customers'
@@ -22,10 +22,10 @@ class Customer(db.Model):
     cart_items = db.relationship('CartItem', backref='customer', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify(password, self.password_hash)
     
     def __repr__(self):
         return f'<Customer {self.email}>'
@@ -42,5 +42,10 @@ class CartItem(db.Model):
     # Relationship
     medicine = db.relationship('Medicine', backref='cart_items')
     
+    # One line per medicine; batch cart writes upsert on it
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'medicine_id', name='uq_cart_items_customer_medicine'),
+    )
+    
     def __repr__(self):
         return f'<CartItem {self.cart_item_id}>'
@@ -0,0 +1,27 @@
+from . import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(50), nullable=False)  # e.g. 'orders.place'
+    owner = db.Column(db.String(50), nullable=False)  # e.g. 'customer:12', 'user:3'
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_progress')
+    # Status options: 'in_progress', 'completed'
+    
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(JSONB)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'owner', 'key', name='uq_idempotency_keys_scope_owner_key'),
+    )
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.scope} {self.key} {self.status}>'
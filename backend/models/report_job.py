@@ -0,0 +1,30 @@
+from . import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_jobs'
+    
+    job_id = db.Column(db.String(32), primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    params = db.Column(JSONB, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    # Status options: 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+    
+    progress = db.Column(db.Float, nullable=False, default=0.0)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    result_path = db.Column(db.String(255))
+    result_rows = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    
+    created_by = db.Column(db.Integer, db.ForeignKey('users.user_id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_report_jobs_status_type_created', 'status', 'job_type', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<ReportJob {self.job_id} {self.status}>'
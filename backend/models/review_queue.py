@@ -0,0 +1,26 @@
+from . import db
+from datetime import datetime
+
+class PrescriptionReview(db.Model):
+    """An order waiting for its prescription to be reviewed"""
+    __tablename__ = 'prescription_review_queue'
+    
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id', ondelete='CASCADE'), primary_key=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # Higher is reviewed first
+    enqueued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    due_at = db.Column(db.DateTime, nullable=False)  # Review SLA deadline
+    
+    # Claim held by a pharmacist; expired claims are up for grabs again
+    claimed_by = db.Column(db.Integer, db.ForeignKey('users.user_id'))
+    claimed_at = db.Column(db.DateTime)
+    claim_expires_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_prescription_review_queue_claimed_by', 'claimed_by'),
+    )
+    
+    def __repr__(self):
+        return f'<PrescriptionReview order={self.order_id} due={self.due_at}>'
+
+# Matches the claim ordering (priority DESC, due_at)
+db.Index('ix_prescription_review_queue_priority_due', PrescriptionReview.priority.desc(), PrescriptionReview.due_at)
@@ -0,0 +1,28 @@
+from . import db
+from datetime import datetime
+
+class DailySalesRollup(db.Model):
+    __tablename__ = 'daily_sales_rollup'
+    
+    day = db.Column(db.Date, primary_key=True)
+    medicine_id = db.Column(db.Integer, db.ForeignKey('medicines.medicine_id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailySalesRollup {self.day} {self.medicine_id}>'
+
+class DailyPurchaseRollup(db.Model):
+    __tablename__ = 'daily_purchase_rollup'
+    
+    day = db.Column(db.Date, primary_key=True)
+    medicine_id = db.Column(db.Integer, db.ForeignKey('medicines.medicine_id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    cost = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    purchase_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DailyPurchaseRollup {self.day} {self.medicine_id}>'
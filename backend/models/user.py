@@ -1,6 +1,6 @@
 from . import db
 from datetime import datetime
-import bcrypt
+from services import passwords
 
 class Role(db.Model):
     __tablename__ = 'roles'
@@ -25,11 +25,11 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = passwords.hash_password(password)
     
     def check_password(self, password):
         """Check if provided password matches the hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return passwords.verify(password, self.password_hash)
     
     def __repr__(self):
         return f'<User {self.username}>'
\ No newline at end of file
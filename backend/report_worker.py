@@ -0,0 +1,18 @@
+"""
+Dedicated report job worker
+Runs the report job dispatcher in the foreground; use with REPORT_JOBS_EMBEDDED=0
+so the web workers only enqueue.
+"""
+from app import create_worker_app
+from services.report_jobs import Dispatcher
+
+if __name__ == '__main__':
+    app = create_worker_app()
+    dispatcher = Dispatcher(app)
+    print("Report worker started. Press Ctrl+C to stop.")
+    try:
+        dispatcher.run_forever()
+    except KeyboardInterrupt:
+        print("Stopping report worker...")
+    finally:
+        dispatcher.stop()
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from models.user import User, Role, db
 from models.medicine import Company
 from routes.auth_routes import token_required, role_required
+from services import usernames
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -120,6 +121,7 @@ def update_user(current_user, id):
             user.set_password(data['password'])
         
         db.session.commit()
+        usernames.invalidate(id)
         
         return jsonify({'message': 'User updated successfully'}), 200
     except Exception as e:
@@ -142,6 +144,7 @@ def delete_user(current_user, id):
         
         db.session.delete(user)
         db.session.commit()
+        usernames.invalidate(id)
         
         return jsonify({'message': 'User deleted successfully'}), 200
     except Exception as e:
@@ -4,29 +4,57 @@ import jwt
 from datetime import datetime, timedelta
 from config import Config
 from functools import wraps
+import os
+from services import auth_tokens, passwords, principals
 
 auth_bp = Blueprint('auth', __name__)
 
+STAFF_REFRESH_TOKEN_HOURS = int(os.environ.get('STAFF_REFRESH_TOKEN_HOURS', 24))
+
+def _authenticate(token):
+    """Resolve a raw token to (current_user, None) or (None, error response)"""
+    if not token:
+        return None, (jsonify({'message': 'Token is missing!'}), 401)
+    
+    try:
+        # Remove 'Bearer ' prefix if present
+        if token.startswith('Bearer '):
+            token = token[7:]
+        
+        data = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+        if data.get('typ') == auth_tokens.REFRESH:
+            return None, (jsonify({'message': 'Token is invalid!'}), 401)
+        if auth_tokens.is_revoked(data):
+            return None, (jsonify({'message': 'Token has been revoked!'}), 401)
+        current_user = principals.user(data)
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({'message': 'Token has expired!'}), 401)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({'message': 'Token is invalid!'}), 401)
+    
+    if current_user is None:
+        return None, (jsonify({'message': 'Token is invalid!'}), 401)
+    return current_user, None
+
 def token_required(f):
     """Decorator to require valid JWT token"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            return jsonify({'message': 'Token is missing!'}), 401
+        current_user, error = _authenticate(request.headers.get('Authorization'))
+        if error:
+            return error
         
-        try:
-            # Remove 'Bearer ' prefix if present
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
-            data = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired!'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Token is invalid!'}), 401
+        return f(current_user, *args, **kwargs)
+    
+    return decorated
+
+def stream_token_required(f):
+    """Like token_required, but also accepts ?token= since EventSource cannot send headers"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        current_user, error = _authenticate(request.headers.get('Authorization') or request.args.get('token'))
+        if error:
+            return error
         
         return f(current_user, *args, **kwargs)
     
@@ -37,12 +65,15 @@ def role_required(required_role):
     def wrapper(f):
         @wraps(f)
         def decorated(current_user, *args, **kwargs):
-            if current_user.role.role_name != required_role:
+            if current_user.role_name != required_role:
                 return jsonify({'message': 'Insufficient permissions!'}), 403
             return f(current_user, *args, **kwargs)
         return decorated
     return wrapper
 
+def _staff_claims(user):
+    return {'user_id': user.user_id, 'username': user.username, 'role': user.role.role_name}
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """User login endpoint"""
@@ -53,19 +84,20 @@ def login():
     
     user = User.query.filter_by(username=data['username']).first()
     
-    if not user or not user.check_password(data['password']):
-        return jsonify({'message': 'Invalid credentials!'}), 401
+    try:
+        if not passwords.verify_and_upgrade(user, data['password']):
+            return jsonify({'message': 'Invalid credentials!'}), 401
+    except passwords.PasswordServiceBusy:
+        return jsonify({'message': 'Too many requests right now, please retry'}), 503, \
+            {'Retry-After': str(passwords.RETRY_AFTER_SECONDS)}
     
-    # Generate token
-    token = jwt.encode({
-        'user_id': user.user_id,
-        'username': user.username,
-        'role': user.role.role_name,
-        'exp': datetime.utcnow() + timedelta(hours=24)
-    }, Config.JWT_SECRET_KEY, algorithm='HS256')
+    # Short-lived access token plus a rotating refresh token; also persists an upgraded hash
+    tokens = auth_tokens.issue('user', user.user_id, _staff_claims(user),
+                               timedelta(hours=STAFF_REFRESH_TOKEN_HOURS), Config.JWT_SECRET_KEY)
+    db.session.commit()
     
     return jsonify({
-        'token': token,
+        **tokens,
         'user': {
             'user_id': user.user_id,
             'username': user.username,
@@ -73,6 +105,41 @@ def login():
         }
     }), 200
 
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Exchange a refresh token for a new access/refresh pair"""
+    data = request.get_json(silent=True) or {}
+    
+    def claims_for(user_id):
+        user = User.query.get(user_id)
+        return _staff_claims(user) if user else None
+    
+    try:
+        tokens = auth_tokens.rotate(data.get('refresh_token'), 'user', claims_for,
+                                    timedelta(hours=STAFF_REFRESH_TOKEN_HOURS), Config.JWT_SECRET_KEY)
+    except auth_tokens.TokenError as e:
+        db.session.rollback()
+        return jsonify({'message': e.message}), 401
+    
+    return jsonify(tokens), 200
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    """Revoke the current login (its refresh token and every access token issued from it)"""
+    data = request.get_json(silent=True) or {}
+    access_claims = None
+    token = request.headers.get('Authorization', '')
+    if token.startswith('Bearer '):
+        try:
+            # An expired access token still identifies the login to revoke
+            access_claims = jwt.decode(token[7:], Config.JWT_SECRET_KEY, algorithms=['HS256'],
+                                       options={'verify_exp': False})
+        except jwt.InvalidTokenError:
+            pass
+    
+    auth_tokens.logout('user', access_claims, data.get('refresh_token'), Config.JWT_SECRET_KEY)
+    return jsonify({'message': 'Logged out'}), 200
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """User registration endpoint (admin only)"""
@@ -104,6 +171,6 @@ def profile(current_user):
     return jsonify({
         'user_id': current_user.user_id,
         'username': current_user.username,
-        'role': current_user.role.role_name,
+        'role': current_user.role_name,
         'created_at': current_user.created_at
     }), 200
\ No newline at end of file
@@ -8,6 +8,7 @@ import json
 from chatbot.nlp_engine import MedicalNLPEngine
 from chatbot.inference_engine import MedicalInferenceEngine
 from chatbot.training_system import ChatbotTrainingSystem, ConversationContext
+from chatbot.kb_cache import kb_cache
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
@@ -16,6 +17,9 @@ nlp_engine = MedicalNLPEngine()
 inference_engine = MedicalInferenceEngine()
 training_system = ChatbotTrainingSystem()
 
+# Interaction rule drugs (e.g. warfarin) may not be KB entries but still need to be recognised in queries
+kb_cache.add_terms(inference_engine.interaction_drugs())
+
 # Store conversation contexts (in production, use Redis or database)
 conversation_contexts = {}
 
@@ -40,12 +44,12 @@ def chatbot_query():
         # Get conversation context
         context = get_or_create_context(user_id)
         
-        # Get all available drugs for NLP processing
-        all_drugs = ChatbotKB.query.all()
-        drug_names = [drug.name for drug in all_drugs]
+        # Drug names for NLP processing, from the in-memory knowledge base
+        kb = kb_cache.snapshot()
+        drug_names = kb.names
         
         # Parse query using advanced NLP engine
-        query_analysis = nlp_engine.parse_query(query, drug_names)
+        query_analysis = nlp_engine.parse_query(query, drug_names, kb.matcher, kb.automaton)
         
         # Check if we should use context from previous conversation
         drug_name = query_analysis['drug_name']
@@ -59,6 +63,10 @@ def chatbot_query():
         entities = query_analysis['entities']
         confidence = query_analysis['overall_confidence']
         
+        # Several drugs mentioned: pass them all on so interactions between them can be checked
+        if len(query_analysis['drug_names']) > 1:
+            entities['drugs'] = query_analysis['drug_names']
+        
         # Log the query
         chat_log = ChatbotLog(
             user_id=user_id if user_id > 0 else None,
@@ -91,18 +99,14 @@ def chatbot_query():
             }), 200
         
         # Find drug in knowledge base using fuzzy matching
-        drug_entry = ChatbotKB.query.filter(
-            ChatbotKB.name.ilike(f'%{drug_name}%')
-        ).first()
+        drug_entry = kb_cache.search(drug_name)
         
         if not drug_entry:
             # Try fuzzy matching with all drugs
             from fuzzywuzzy import process
             best_match = process.extractOne(drug_name, drug_names)
             if best_match and best_match[1] >= 70:
-                drug_entry = ChatbotKB.query.filter(
-                    ChatbotKB.name == best_match[0]
-                ).first()
+                drug_entry = kb_cache.get(best_match[0])
                 response_note = f"(Showing results for '{best_match[0]}')"
             else:
                 response = f"I don't have information about '{drug_name}' in my knowledge base. Please check the spelling or try the generic name."
@@ -119,7 +123,7 @@ def chatbot_query():
         # Generate response using inference engine
         response_data = inference_engine.generate_response(
             intent,
-            {'name': drug_entry.name, 'data': drug_entry.data},
+            drug_entry.as_drug_data(),
             entities
         )
         
@@ -145,6 +149,7 @@ def chatbot_query():
             'query_analysis': query_analysis,
             'log_id': chat_log.id,
             'category': response_data.get('category'),
+            'interactions': response_data.get('interactions', []),
             'context': context.get_context()
         }), 200
     except Exception as e:
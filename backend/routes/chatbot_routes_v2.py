@@ -12,6 +12,8 @@ import json
 # Import new chatbot components
 from chatbot.chatbot_engine_v2 import chatbot_engine, Intent
 from chatbot.chatbot_tools import chatbot_tools
+from chatbot.kb_cache import kb_cache
+from routes.chatbot_routes import nlp_engine, inference_engine
 
 chatbot_v2_bp = Blueprint('chatbot_v2', __name__)
 
@@ -114,6 +116,41 @@ def chatbot_query_v2():
                     else:
                         response_data['answer'] = chatbot_engine.format_error_response(cart_result['error'])
         
+        elif intent == Intent.BULK_ADD:
+            # Check authentication
+            if not customer_id:
+                response_data['answer'] = chatbot_engine.format_auth_required_response('add items to your cart')
+                response_data['requires_auth'] = True
+            else:
+                items, not_found = [], []
+                for name in chatbot_engine.extract_bulk_items(query):
+                    search_result = chatbot_tools.search_products(name, customer_id)
+                    if search_result['success'] and search_result['products']:
+                        items.append({'medicine_id': search_result['products'][0]['medicine_id'], 'quantity': 1})
+                    else:
+                        not_found.append(name)
+                
+                cart_result = chatbot_tools.bulk_add_to_cart(customer_id, items) if items else {
+                    'success': False,
+                    'error': 'None of those products were found'
+                }
+                
+                if cart_result['success']:
+                    response_text = cart_result['message']
+                    for error in cart_result['errors']:
+                        response_text += f"\n• {error}"
+                    if not_found:
+                        response_text += f"\n\nI couldn't find: {', '.join(not_found)}."
+                    response_text += f"\n\nYour cart total is now ₹{cart_result['cart']['total']:.2f}."
+                    response_data['answer'] = response_text
+                    response_data['cart'] = cart_result['cart']
+                    response_data['interactive_components'] = [{
+                        'type': 'cart_actions',
+                        'actions': ['view_cart', 'continue_shopping', 'checkout']
+                    }]
+                else:
+                    response_data['answer'] = chatbot_engine.format_error_response(cart_result['error'])
+        
         elif intent == Intent.VIEW_CART:
             # Check authentication
             if not customer_id:
@@ -384,9 +421,20 @@ def chatbot_query_v2():
                     response_data['answer'] = "Your cart is empty. Would you like to browse our products?"
         
         elif intent == Intent.DRUG_INFO:
-            # Fallback to old expert system for drug information
-            # This can be kept for medical information queries
-            response_data['answer'] = "For detailed medical information about medicines (dosage, side effects, interactions), please consult our pharmacist or refer to the product information leaflet.\n\n⚠️ **Important**: I cannot provide medical advice. Always consult a healthcare professional."
+            # Fallback to old expert system for drug information, answered from the cached knowledge base
+            disclaimer = "⚠️ **Important**: I cannot provide medical advice. Always consult a healthcare professional."
+            kb = kb_cache.snapshot()
+            analysis = nlp_engine.parse_query(query, kb.names, kb.matcher, kb.automaton)
+            record = kb_cache.get(analysis['drug_name']) if analysis['drug_name'] else None
+            if record:
+                drug_response = inference_engine.generate_response(
+                    analysis['primary_intent'], record.as_drug_data(),
+                    dict(analysis['entities'], drugs=analysis['drug_names'])
+                )
+                response_data['answer'] = f"{drug_response['response']}\n\n{disclaimer}"
+                response_data['drug_name'] = record.name
+            else:
+                response_data['answer'] = f"For detailed medical information about medicines (dosage, side effects, interactions), please consult our pharmacist or refer to the product information leaflet.\n\n{disclaimer}"
             response_data['fallback'] = True
         
         else:  # Intent.UNKNOWN
@@ -4,33 +4,60 @@ from datetime import datetime, timedelta
 import jwt
 from functools import wraps
 import os
+from services import auth_tokens, passwords, principals
 
 customer_auth_bp = Blueprint('customer_auth', __name__)
 
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+CUSTOMER_REFRESH_TOKEN_DAYS = int(os.environ.get('CUSTOMER_REFRESH_TOKEN_DAYS', 7))
+
+def _authenticate_customer(token):
+    """Resolve a raw token to (current_customer, None) or (None, error response)"""
+    if not token:
+        return None, (jsonify({'message': 'Token is missing'}), 401)
+    
+    try:
+        if token.startswith('Bearer '):
+            token = token.split(' ')[1]
+        
+        data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        # Refresh, password reset and checkout quote tokens share the key but are not access tokens
+        if data.get('typ') == auth_tokens.REFRESH or data.get('purpose'):
+            return None, (jsonify({'message': 'Invalid token'}), 401)
+        if auth_tokens.is_revoked(data):
+            return None, (jsonify({'message': 'Token has been revoked'}), 401)
+        current_customer = principals.customer(data)
+        
+        if not current_customer or not current_customer.is_active:
+            return None, (jsonify({'message': 'Invalid or inactive customer'}), 401)
+            
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({'message': 'Token has expired'}), 401)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({'message': 'Invalid token'}), 401)
+    
+    return current_customer, None
 
 def customer_token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
+        current_customer, error = _authenticate_customer(request.headers.get('Authorization'))
+        if error:
+            return error
         
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        
-        try:
-            if token.startswith('Bearer '):
-                token = token.split(' ')[1]
-            
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_customer = Customer.query.get(data['customer_id'])
-            
-            if not current_customer or not current_customer.is_active:
-                return jsonify({'message': 'Invalid or inactive customer'}), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Invalid token'}), 401
+        return f(current_customer, *args, **kwargs)
+    
+    return decorated
+
+def customer_stream_token_required(f):
+    """Like customer_token_required, but also accepts ?token= since EventSource cannot send headers"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        current_customer, error = _authenticate_customer(
+            request.headers.get('Authorization') or request.args.get('token')
+        )
+        if error:
+            return error
         
         return f(current_customer, *args, **kwargs)
     
@@ -72,10 +99,17 @@ def register():
             'customer_id': new_customer.customer_id
         }), 201
         
+    except passwords.PasswordServiceBusy:
+        db.session.rollback()
+        return jsonify({'message': 'Too many requests right now, please retry'}), 503, \
+            {'Retry-After': str(passwords.RETRY_AFTER_SECONDS)}
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Registration failed', 'error': str(e)}), 500
 
+def _customer_claims(customer):
+    return {'customer_id': customer.customer_id, 'email': customer.email}
+
 @customer_auth_bp.route('/login', methods=['POST'])
 def login():
     """Customer login"""
@@ -87,22 +121,20 @@ def login():
         
         customer = Customer.query.filter_by(email=data['email'].lower()).first()
         
-        if not customer or not customer.check_password(data['password']):
+        if not passwords.verify_and_upgrade(customer, data['password']):
             return jsonify({'message': 'Invalid email or password'}), 401
         
         if not customer.is_active:
             return jsonify({'message': 'Account is inactive'}), 401
         
-        # Generate JWT token
-        token = jwt.encode({
-            'customer_id': customer.customer_id,
-            'email': customer.email,
-            'exp': datetime.utcnow() + timedelta(days=7)
-        }, SECRET_KEY, algorithm='HS256')
+        # Short-lived access token plus a rotating refresh token; also persists an upgraded hash
+        tokens = auth_tokens.issue('customer', customer.customer_id, _customer_claims(customer),
+                                   timedelta(days=CUSTOMER_REFRESH_TOKEN_DAYS), SECRET_KEY)
+        db.session.commit()
         
         return jsonify({
             'message': 'Login successful',
-            'token': token,
+            **tokens,
             'customer': {
                 'customer_id': customer.customer_id,
                 'name': customer.name,
@@ -115,9 +147,56 @@ def login():
             }
         }), 200
         
+    except passwords.PasswordServiceBusy:
+        return jsonify({'message': 'Too many requests right now, please retry'}), 503, \
+            {'Retry-After': str(passwords.RETRY_AFTER_SECONDS)}
     except Exception as e:
+        db.session.rollback()
         return jsonify({'message': 'Login failed', 'error': str(e)}), 500
 
+@customer_auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Exchange a refresh token for a new access/refresh pair"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        def claims_for(customer_id):
+            customer = Customer.query.get(customer_id)
+            return _customer_claims(customer) if customer and customer.is_active else None
+        
+        tokens = auth_tokens.rotate(data.get('refresh_token'), 'customer', claims_for,
+                                    timedelta(days=CUSTOMER_REFRESH_TOKEN_DAYS), SECRET_KEY)
+        return jsonify(tokens), 200
+        
+    except auth_tokens.TokenError as e:
+        db.session.rollback()
+        return jsonify({'message': e.message}), 401
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Token refresh failed', 'error': str(e)}), 500
+
+@customer_auth_bp.route('/logout', methods=['POST'])
+def logout():
+    """Revoke the current login (its refresh token and every access token issued from it)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        access_claims = None
+        token = request.headers.get('Authorization', '')
+        if token.startswith('Bearer '):
+            try:
+                # An expired access token still identifies the login to revoke
+                access_claims = jwt.decode(token.split(' ')[1], SECRET_KEY, algorithms=['HS256'],
+                                           options={'verify_exp': False})
+            except jwt.InvalidTokenError:
+                pass
+        
+        auth_tokens.logout('customer', access_claims, data.get('refresh_token'), SECRET_KEY)
+        return jsonify({'message': 'Logged out'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Logout failed', 'error': str(e)}), 500
+
 @customer_auth_bp.route('/profile', methods=['GET'])
 @customer_token_required
 def get_profile(current_customer):
@@ -240,6 +319,8 @@ def reset_password():
                 return jsonify({'message': 'Customer not found'}), 404
             
             customer.set_password(data['new_password'])
+            # Sign out every existing session
+            auth_tokens.revoke_all('customer', customer.customer_id)
             db.session.commit()
             
             return jsonify({'message': 'Password reset successful'}), 200
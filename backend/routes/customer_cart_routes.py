@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from models.customer import Customer, CartItem, db
 from models.medicine import Medicine
 from routes.customer_auth_routes import customer_token_required
+from services import cart_ops, cart_store, cart_view
 from datetime import datetime
 
 customer_cart_bp = Blueprint('customer_cart', __name__)
@@ -11,48 +12,13 @@ customer_cart_bp = Blueprint('customer_cart', __name__)
 def get_cart(current_customer):
     """Get customer's shopping cart"""
     try:
-        cart_items = CartItem.query.filter_by(customer_id=current_customer.customer_id).all()
-        
-        result = []
-        total = 0
-        has_rx_items = False
-        
-        for item in cart_items:
-            medicine = item.medicine
-            
-            # Check if medicine is still available
-            is_available = (
-                medicine.quantity >= item.quantity and
-                medicine.exp_date > datetime.now().date()
-            )
-            
-            subtotal = float(medicine.price) * item.quantity
-            total += subtotal
-            
-            if medicine.product_type == 'Rx':
-                has_rx_items = True
-            
-            result.append({
-                'cart_item_id': item.cart_item_id,
-                'medicine_id': medicine.medicine_id,
-                'name': medicine.name,
-                'company': medicine.company.name,
-                'price': float(medicine.price),
-                'quantity': item.quantity,
-                'subtotal': subtotal,
-                'product_type': medicine.product_type,
-                'requires_prescription': medicine.product_type == 'Rx',
-                'image_url': medicine.image_url or '/static/images/medicine-placeholder.png',
-                'in_stock': is_available,
-                'available_quantity': medicine.quantity,
-                'added_at': item.added_at.isoformat()
-            })
+        cart = cart_view.serialize(cart_view.load(current_customer.customer_id))
         
         return jsonify({
-            'cart_items': result,
-            'total': round(total, 2),
-            'item_count': len(result),
-            'requires_prescription': has_rx_items
+            'cart_items': cart['items'],
+            'total': cart['total'],
+            'item_count': cart['item_count'],
+            'requires_prescription': cart['requires_prescription']
         }), 200
         
     except Exception as e:
@@ -85,7 +51,8 @@ def add_to_cart(current_customer):
         if medicine.exp_date <= datetime.now().date():
             return jsonify({'message': 'Medicine has expired'}), 400
         
-        # Check if item already in cart
+        # Check if item already in cart (with any buffered quantity edit applied)
+        cart_store.flush(current_customer.customer_id)
         existing_item = CartItem.query.filter_by(
             customer_id=current_customer.customer_id,
             medicine_id=medicine_id
@@ -124,6 +91,37 @@ def add_to_cart(current_customer):
         db.session.rollback()
         return jsonify({'message': 'Error adding to cart', 'error': str(e)}), 500
 
+@customer_cart_bp.route('/cart/batch', methods=['POST'])
+@customer_token_required
+def batch_update_cart(current_customer):
+    """Apply several add/set/remove operations in one transaction and return the cart"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        applied, errors = cart_ops.apply(current_customer.customer_id, data.get('operations'))
+        db.session.commit()
+        
+        cart = cart_view.serialize(cart_view.load(current_customer.customer_id))
+        
+        return jsonify({
+            'message': f'{len(applied)} of {len(applied) + len(errors)} cart operations applied',
+            'applied': len(applied),
+            'errors': errors,
+            'cart': {
+                'cart_items': cart['items'],
+                'total': cart['total'],
+                'item_count': cart['item_count'],
+                'requires_prescription': cart['requires_prescription']
+            }
+        }), 200
+        
+    except cart_ops.CartBatchError as e:
+        db.session.rollback()
+        return jsonify({'message': e.message}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Error updating cart', 'error': str(e)}), 500
+
 @customer_cart_bp.route('/cart/update/<int:cart_item_id>', methods=['PUT'])
 @customer_token_required
 def update_cart_item(current_customer, cart_item_id):
@@ -139,25 +137,23 @@ def update_cart_item(current_customer, cart_item_id):
         if quantity <= 0:
             return jsonify({'message': 'Quantity must be greater than 0'}), 400
         
-        cart_item = CartItem.query.filter_by(
-            cart_item_id=cart_item_id,
-            customer_id=current_customer.customer_id
-        ).first()
+        available = db.session.query(Medicine.quantity)\
+            .join(CartItem, CartItem.medicine_id == Medicine.medicine_id)\
+            .filter(CartItem.cart_item_id == cart_item_id, CartItem.customer_id == current_customer.customer_id)\
+            .scalar()
         
-        if not cart_item:
+        if available is None:
             return jsonify({'message': 'Cart item not found'}), 404
         
-        medicine = cart_item.medicine
+        if available < quantity:
+            return jsonify({'message': f'Only {available} units available'}), 400
         
-        if medicine.quantity < quantity:
-            return jsonify({'message': f'Only {medicine.quantity} units available'}), 400
-        
-        cart_item.quantity = quantity
-        db.session.commit()
+        # Buffered: written to cart_items by the cart store's next flush
+        cart_store.set_quantity(current_customer.customer_id, cart_item_id, quantity)
         
         return jsonify({
             'message': 'Cart updated successfully',
-            'quantity': cart_item.quantity
+            'quantity': quantity
         }), 200
         
     except Exception as e:
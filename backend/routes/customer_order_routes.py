@@ -2,36 +2,33 @@ from flask import Blueprint, request, jsonify
 from models.customer import Customer, CartItem, db
 from models.medicine import Medicine
 from models.order import Order, OrderItem, OrderStatusHistory
-from routes.customer_auth_routes import customer_token_required
+from routes.customer_auth_routes import customer_token_required, customer_stream_token_required
+from services import cart_store, checkout, checkout_quotes, events, order_workflow, prescription_storage, prescription_previews
+from services.idempotency import idempotent
+from sqlalchemy.orm import selectinload
 from datetime import datetime
-from werkzeug.utils import secure_filename
-import os
 
 customer_order_bp = Blueprint('customer_orders', __name__)
 
-UPLOAD_FOLDER = 'uploads/prescriptions'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+CUSTOMER_CANCELLABLE_STATUSES = ['Pending Review', 'Approved']
 
 @customer_order_bp.route('/checkout/validate', methods=['POST'])
 @customer_token_required
 def validate_checkout(current_customer):
     """Validate cart before checkout"""
     try:
-        cart_items = CartItem.query.filter_by(customer_id=current_customer.customer_id).all()
+        # Cart lines with their medicines in one query, after any buffered quantity edits
+        cart_store.flush(current_customer.customer_id)
+        lines = checkout.read_cart(current_customer.customer_id)
         
-        if not cart_items:
+        if not lines:
             return jsonify({'message': 'Cart is empty'}), 400
         
         issues = []
         total = 0
         has_rx_items = False
         
-        for item in cart_items:
-            medicine = item.medicine
-            
+        for item, medicine in lines:
             # Check availability
             if medicine.quantity < item.quantity:
                 issues.append({
@@ -58,11 +55,16 @@ def validate_checkout(current_customer):
                 'issues': issues
             }), 400
         
+        # Priced once here; placing the order with this quote skips the re-pricing
+        quote = checkout_quotes.issue(current_customer.customer_id, lines)
+        
         return jsonify({
             'valid': True,
             'total': round(total, 2),
             'requires_prescription': has_rx_items,
-            'item_count': len(cart_items)
+            'item_count': len(lines),
+            'quote': quote.token(),
+            'quote_expires_at': quote.expires_at.isoformat()
         }), 200
         
     except Exception as e:
@@ -70,8 +72,10 @@ def validate_checkout(current_customer):
 
 @customer_order_bp.route('/orders/place', methods=['POST'])
 @customer_token_required
+@idempotent('orders.place')
 def place_order(current_customer):
     """Place order with conditional prescription upload"""
+    stored_prescription = None
     try:
         # Handle both FormData and JSON requests
         if request.content_type and 'multipart/form-data' in request.content_type:
@@ -79,124 +83,63 @@ def place_order(current_customer):
         else:
             data = request.get_json() or {}
         
-        # Get cart items
-        cart_items = CartItem.query.filter_by(customer_id=current_customer.customer_id).all()
+        # Get shipping address (use customer's default or provided)
+        shipping = {
+            'address': data.get('shipping_address') or current_customer.address,
+            'city': data.get('shipping_city') or current_customer.city,
+            'state': data.get('shipping_state') or current_customer.state,
+            'pincode': data.get('shipping_pincode') or current_customer.pincode
+        }
+        
+        if not shipping['address']:
+            return jsonify({'message': 'Shipping address required'}), 400
         
-        if not cart_items:
-            return jsonify({'message': 'Cart is empty'}), 400
+        # Store any prescription before locking stock, so no disk I/O happens under the lock
+        file = request.files.get('prescription')
+        if file and file.filename:
+            stored_prescription = prescription_storage.save_upload(file)
         
-        # Calculate total and check for Rx items
-        total = 0
-        has_rx_items = False
-        order_items_data = []
+        # The order is built from cart_items, so buffered quantity edits must land first
+        cart_store.flush(current_customer.customer_id)
         
-        for item in cart_items:
-            medicine = item.medicine
-            
-            # Final availability check
-            if medicine.quantity < item.quantity:
-                return jsonify({'message': f'Insufficient stock for {medicine.name}'}), 400
-            
-            if medicine.exp_date <= datetime.now().date():
-                return jsonify({'message': f'{medicine.name} has expired'}), 400
-            
-            subtotal = float(medicine.price) * item.quantity
-            total += subtotal
-            
-            if medicine.product_type == 'Rx':
-                has_rx_items = True
-            
-            order_items_data.append({
-                'medicine': medicine,
-                'quantity': item.quantity,
-                'unit_price': medicine.price,
-                'subtotal': subtotal,
-                'product_type': medicine.product_type
-            })
+        quote_token = data.get('quote')
+        if quote_token:
+            cart = checkout_quotes.redeem(
+                current_customer.customer_id, quote_token,
+                lambda: checkout.lock_cart(current_customer.customer_id)
+            )
+        else:
+            cart = checkout.lock_cart(current_customer.customer_id)
+        has_rx_items = cart.requires_prescription
         
         # CRITICAL: Check prescription upload if Rx items present
-        prescription_file_path = None
-        if has_rx_items:
-            if 'prescription' not in request.files:
-                return jsonify({
-                    'message': 'Prescription required',
-                    'error': 'Your cart contains prescription medicines. Please upload a valid prescription.'
-                }), 400
-            
-            file = request.files['prescription']
-            
-            if file.filename == '':
-                return jsonify({'message': 'No prescription file selected'}), 400
-            
-            if not allowed_file(file.filename):
-                return jsonify({'message': 'Invalid file type. Allowed: PNG, JPG, JPEG, PDF'}), 400
-            
-            # Save prescription file
-            filename = secure_filename(f"{current_customer.customer_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
-            
-            # Create upload directory if it doesn't exist
-            os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-            
-            file_path = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(file_path)
-            prescription_file_path = file_path
-        
-        # Get shipping address (use customer's default or provided)
-        shipping_address = data.get('shipping_address') or current_customer.address
-        shipping_city = data.get('shipping_city') or current_customer.city
-        shipping_state = data.get('shipping_state') or current_customer.state
-        shipping_pincode = data.get('shipping_pincode') or current_customer.pincode
-        
-        if not shipping_address:
-            return jsonify({'message': 'Shipping address required'}), 400
-        
-        # Create order
-        new_order = Order(
-            customer_id=current_customer.customer_id,
-            total_amount=total,
-            status='Pending Review' if has_rx_items else 'Processing',
-            payment_method='Cash on Delivery',
-            shipping_address=shipping_address,
-            shipping_city=shipping_city,
-            shipping_state=shipping_state,
-            shipping_pincode=shipping_pincode,
-            requires_prescription=has_rx_items,
-            prescription_uploaded=has_rx_items,
-            prescription_file_path=prescription_file_path,
-            prescription_status='Pending' if has_rx_items else None
-        )
-        
-        db.session.add(new_order)
-        db.session.flush()  # Get order_id
-        
-        # Create order items and update stock
-        for item_data in order_items_data:
-            order_item = OrderItem(
-                order_id=new_order.order_id,
-                medicine_id=item_data['medicine'].medicine_id,
-                quantity=item_data['quantity'],
-                unit_price=item_data['unit_price'],
-                subtotal=item_data['subtotal'],
-                product_type=item_data['product_type']
+        if has_rx_items and not stored_prescription:
+            raise checkout.CheckoutError(
+                'Prescription required',
+                error='Your cart contains prescription medicines. Please upload a valid prescription.'
             )
-            db.session.add(order_item)
-            
-            # Reduce stock
-            item_data['medicine'].quantity -= item_data['quantity']
-        
-        # Create status history
-        status_history = OrderStatusHistory(
-            order_id=new_order.order_id,
-            status=new_order.status,
-            notes='Order placed by customer'
+        if not has_rx_items and stored_prescription:
+            # Not needed for this order; the file is shared content, left to the orphan sweep
+            stored_prescription = None
+        
+        new_order = checkout.place_order(
+            current_customer.customer_id,
+            cart,
+            shipping,
+            prescription_file_path=stored_prescription.path if stored_prescription else None
         )
-        db.session.add(status_history)
-        
-        # Clear cart
-        CartItem.query.filter_by(customer_id=current_customer.customer_id).delete()
         
         db.session.commit()
         
+        # The order is committed: failures from here on must not turn it into an error response
+        try:
+            checkout_quotes.consume(cart)
+            if stored_prescription:
+                # Render the review preview now so it is ready when a pharmacist opens the order
+                prescription_previews.schedule(stored_prescription.path)
+        except Exception as e:
+            print(f"Post-order housekeeping failed for order {new_order.order_id}: {e}")
+        
         return jsonify({
             'message': 'Order placed successfully',
             'order_id': new_order.order_id,
@@ -206,6 +149,15 @@ def place_order(current_customer):
             'estimated_delivery': '3-5 business days'
         }), 201
         
+    except prescription_storage.StorageError as e:
+        db.session.rollback()
+        return jsonify({'message': e.message}), e.status
+    except checkout.CheckoutError as e:
+        db.session.rollback()
+        response = {'message': e.message}
+        if e.error:
+            response['error'] = e.error
+        return jsonify(response), e.status
     except Exception as e:
         db.session.rollback()
         import traceback
@@ -238,12 +190,25 @@ def get_orders(current_customer):
     except Exception as e:
         return jsonify({'message': 'Error retrieving orders', 'error': str(e)}), 500
 
+@customer_order_bp.route('/orders/events', methods=['GET'])
+@customer_stream_token_required
+def order_events(current_customer):
+    """Server-Sent Events stream of the customer's order updates (replaces polling /track)"""
+    customer_id = current_customer.customer_id
+    try:
+        return events.stream(lambda evt: evt.get('customer_id') == customer_id)
+    except events.TooManySubscribers:
+        return jsonify({'message': 'Too many open event streams, please retry later'}), 503
+
 @customer_order_bp.route('/orders/<int:order_id>', methods=['GET'])
 @customer_token_required
 def get_order_detail(current_customer, order_id):
     """Get detailed order information"""
     try:
-        order = Order.query.filter_by(
+        order = Order.query.options(
+            selectinload(Order.order_items).joinedload(OrderItem.medicine).joinedload(Medicine.company),
+            selectinload(Order.status_history)
+        ).filter_by(
             order_id=order_id,
             customer_id=current_customer.customer_id
         ).first()
@@ -335,39 +300,29 @@ def track_order(current_customer, order_id):
 def cancel_order(current_customer, order_id):
     """Cancel order (only if not yet processed)"""
     try:
+        # Locked so staff cannot move the order on between the check and the cancel
         order = Order.query.filter_by(
             order_id=order_id,
             customer_id=current_customer.customer_id
-        ).first()
+        ).with_for_update().first()
         
         if not order:
             return jsonify({'message': 'Order not found'}), 404
         
         # Can only cancel if pending or approved
-        if order.status not in ['Pending Review', 'Approved']:
+        if order.status not in CUSTOMER_CANCELLABLE_STATUSES:
             return jsonify({'message': 'Order cannot be cancelled at this stage'}), 400
         
-        # Restore stock
-        for item in order.order_items:
-            medicine = Medicine.query.get(item.medicine_id)
-            if medicine:
-                medicine.quantity += item.quantity
-        
-        # Update order status
-        order.status = 'Cancelled'
-        
-        # Add to history
-        status_history = OrderStatusHistory(
-            order_id=order.order_id,
-            status='Cancelled',
-            notes='Cancelled by customer'
-        )
-        db.session.add(status_history)
+        # Restores stock and records the history entry
+        order_workflow.transition(order.order_id, 'Cancelled', notes='Cancelled by customer')
         
         db.session.commit()
         
         return jsonify({'message': 'Order cancelled successfully'}), 200
         
+    except order_workflow.TransitionError as e:
+        db.session.rollback()
+        return jsonify({'message': e.message}), e.status
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Error cancelling order', 'error': str(e)}), 500
@@ -2,10 +2,13 @@ from flask import Blueprint, request, jsonify
 from models.medicine import Medicine, Company, db
 from models.customer import CartItem
 from routes.customer_auth_routes import customer_token_required
-from datetime import datetime
+from services import demand
+from datetime import datetime, timedelta
 
 customer_product_bp = Blueprint('customer_products', __name__)
 
+FEATURED_DEMAND_DAYS = 30
+
 @customer_product_bp.route('/products', methods=['GET'])
 def get_products():
     """Get all available products for customers (public access)"""
@@ -128,12 +131,21 @@ def get_product_detail(id):
 def get_featured_products():
     """Get featured/popular products"""
     try:
-        # Get top 10 OTC medicines (simplified - in production, track sales)
-        medicines = Medicine.query.join(Company).filter(
+        # Top 10 available OTC medicines by demand over the last 30 days (both channels)
+        available = (
             Medicine.quantity > 0,
             Medicine.exp_date > datetime.now().date(),
             Medicine.product_type == 'OTC'
-        ).order_by(Medicine.name.asc()).limit(10).all()
+        )
+        start = datetime.now().date() - timedelta(days=FEATURED_DEMAND_DAYS)
+        medicines = [med for med, _, _ in demand.top_medicines(10, start=start, criteria=available)]
+        
+        # Top up with the catalogue when there is not enough sales history yet
+        if len(medicines) < 10:
+            medicines += Medicine.query.join(Company).filter(
+                *available,
+                Medicine.medicine_id.notin_([med.medicine_id for med in medicines])
+            ).order_by(Medicine.name.asc()).limit(10 - len(medicines)).all()
         
         result = []
         for med in medicines:
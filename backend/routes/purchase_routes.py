@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from models.purchase import Purchase, db
 from models.medicine import Medicine
 from routes.auth_routes import token_required, role_required
+from services import rollups
 from datetime import datetime
 
 purchase_bp = Blueprint('purchases', __name__)
@@ -87,6 +88,8 @@ def create_purchase(current_user):
         medicine.quantity += data['quantity']
         
         db.session.add(new_purchase)
+        db.session.flush()  # Populate purchase date for the rollup
+        rollups.record_purchase(new_purchase)
         db.session.commit()
         
         return jsonify({
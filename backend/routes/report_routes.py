@@ -1,17 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_file, current_app
 from models.medicine import Medicine, Company, db
 from models.sale import Sale
 from models.purchase import Purchase
 from routes.auth_routes import token_required
+from services import rollups, demand
+from services.report_cache import cached_report
+from services import report_jobs
+from services.sales_cube import sales_cube
+from models.report_job import ReportJob
 from datetime import datetime, timedelta
 from sqlalchemy import func
 import pandas as pd
 import io
+import os
 
 report_bp = Blueprint('reports', __name__)
 
 @report_bp.route('/dashboard', methods=['GET'])
 @token_required
+@cached_report('dashboard', tags=('medicines', 'sales', 'purchases'))
 def dashboard_stats(current_user):
     """Get dashboard statistics"""
     try:
@@ -32,15 +39,9 @@ def dashboard_stats(current_user):
             Medicine.exp_date <= (datetime.now().date() + timedelta(days=30))
         ).count()
         
-        # Total sales in period
-        total_sales = db.session.query(func.sum(Sale.total)).filter(
-            Sale.date.between(start_date, end_date)
-        ).scalar() or 0
-        
-        # Total purchases in period
-        total_purchases = db.session.query(func.sum(Purchase.total)).filter(
-            Purchase.date.between(start_date, end_date)
-        ).scalar() or 0
+        # Sales and purchases in period (from the daily rollups)
+        total_sales = rollups.sales_total_since(start_date.date())
+        total_purchases = rollups.purchases_total_since(start_date.date())
         
         return jsonify({
             'total_medicines': total_medicines,
@@ -54,6 +55,7 @@ def dashboard_stats(current_user):
 
 @report_bp.route('/sales-summary', methods=['GET'])
 @token_required
+@cached_report('sales-summary', tags=('sales',))
 def sales_summary(current_user):
     """Get sales summary"""
     try:
@@ -63,27 +65,20 @@ def sales_summary(current_user):
         
         if period == 'daily':
             date_format = '%Y-%m-%d'
-            group_by = func.date_trunc('day', Sale.date)
         elif period == 'weekly':
             date_format = 'Week %W, %Y'
-            group_by = func.date_trunc('week', Sale.date)
         else:  # monthly
             date_format = '%Y-%m'
-            group_by = func.date_trunc('month', Sale.date)
         
-        # Query sales grouped by period
-        sales_data = db.session.query(
-            group_by.label('period'),
-            func.sum(Sale.total).label('total_sales'),
-            func.count(Sale.sale_id).label('transaction_count')
-        ).group_by(group_by).order_by(group_by.desc()).limit(limit).all()
+        # Weekly/monthly buckets are derived from the daily rollup
+        sales_data = rollups.sales_by_period(period, limit)
         
         result = []
         for row in sales_data:
             result.append({
                 'period': row.period.strftime(date_format) if row.period else None,
                 'total_sales': float(row.total_sales),
-                'transaction_count': row.transaction_count
+                'transaction_count': int(row.transaction_count)
             })
         
         return jsonify(result), 200
@@ -92,30 +87,32 @@ def sales_summary(current_user):
 
 @report_bp.route('/top-medicines', methods=['GET'])
 @token_required
+@cached_report('top-medicines', tags=('sales', 'medicines'))
 def top_medicines(current_user):
-    """Get top selling medicines"""
+    """Get top selling medicines across POS and online orders"""
     try:
         limit = int(request.args.get('limit', 10))
+        channel = request.args.get('channel')  # pos, online (default: both)
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        
+        if channel and channel not in demand.CHANNELS:
+            return jsonify({'message': 'Invalid channel. Must be pos or online'}), 400
+        
+        start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
         
-        # Query top medicines by sales quantity
-        top_meds = db.session.query(
-            Medicine.name,
-            Company.name.label('company'),
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.sum(Sale.total).label('total_revenue')
-        ).join(Sale, Medicine.medicine_id == Sale.medicine_id)\
-         .join(Company, Medicine.company_id == Company.company_id)\
-         .group_by(Medicine.medicine_id, Medicine.name, Company.name)\
-         .order_by(func.sum(Sale.quantity).desc())\
-         .limit(limit).all()
+        # Pre-aggregated per (day, medicine, channel) in the demand view
+        top_meds = demand.top_medicines(limit, channel=channel, start=start, end=end)
         
         result = []
-        for row in top_meds:
+        for medicine, total_quantity, total_revenue in top_meds:
             result.append({
-                'medicine_name': row.name,
-                'company': row.company,
-                'total_quantity': int(row.total_quantity),
-                'total_revenue': float(row.total_revenue)
+                'medicine_id': medicine.medicine_id,
+                'medicine_name': medicine.name,
+                'company': medicine.company.name,
+                'total_quantity': int(total_quantity),
+                'total_revenue': float(total_revenue)
             })
         
         return jsonify(result), 200
@@ -124,6 +121,7 @@ def top_medicines(current_user):
 
 @report_bp.route('/expiry-list', methods=['GET'])
 @token_required
+@cached_report('expiry-list', tags=('medicines',))
 def expiry_list(current_user):
     """Get list of medicines expiring soon"""
     try:
@@ -151,6 +149,48 @@ def expiry_list(current_user):
     except Exception as e:
         return jsonify({'message': 'Error retrieving expiry list', 'error': str(e)}), 500
 
+@report_bp.route('/cube', methods=['GET'])
+@token_required
+def sales_cube_query(current_user):
+    """
+    Ad-hoc revenue slicing over POS and online sales
+    Query params: group_by (comma separated dimensions), medicine/company/product_type/channel
+    filters (comma separated values), start_date, end_date, order_by, limit
+    """
+    try:
+        group_by = [d for d in request.args.get('group_by', '').split(',') if d]
+        filters = {}
+        for dim in ('medicine', 'company', 'product_type', 'channel'):
+            if request.args.get(dim):
+                values = request.args.get(dim).split(',')
+                filters[dim] = [int(v) for v in values] if dim == 'medicine' else values
+
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+
+        sales_cube.refresh()
+        rows = sales_cube.query(
+            group_by,
+            filters,
+            start=start,
+            end=end,
+            order_by=request.args.get('order_by', 'revenue'),
+            limit=int(request.args.get('limit', 100))
+        )
+
+        return jsonify({
+            'group_by': group_by,
+            'rows': rows,
+            'fact_rows': sales_cube.size
+        }), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Error querying sales cube', 'error': str(e)}), 500
+
 @report_bp.route('/export/<table>', methods=['GET'])
 @token_required
 def export_table(current_user, table):
@@ -222,4 +262,125 @@ def export_table(current_user, table):
             'data': csv_data
         }), 200
     except Exception as e:
-        return jsonify({'message': 'Error exporting data', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'Error exporting data', 'error': str(e)}), 500
+
+# Asynchronous report jobs
+
+def _job_response(job):
+    return {
+        'job_id': job.job_id,
+        'job_type': job.job_type,
+        'params': job.params,
+        'status': job.status,
+        'progress': round(job.progress, 3),
+        'cancel_requested': job.cancel_requested,
+        'result_rows': job.result_rows,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+def _get_visible_job(current_user, job_id):
+    """Return the job if it exists and belongs to the user (Admins see all jobs)"""
+    job = ReportJob.query.get(job_id)
+    if not job:
+        return None
+    if job.created_by != current_user.user_id and current_user.role_name != 'Admin':
+        return None
+    return job
+
+@report_bp.route('/jobs', methods=['POST'])
+@token_required
+def create_report_job(current_user):
+    """Queue a long-running report or export"""
+    try:
+        data = request.get_json() or {}
+        
+        if not data.get('job_type'):
+            return jsonify({'message': 'Missing required field: job_type'}), 400
+        
+        try:
+            job = report_jobs.enqueue(data['job_type'], data.get('params') or {}, current_user.user_id)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        report_jobs.ensure_dispatcher(current_app._get_current_object())
+        
+        return jsonify({
+            'message': 'Report job queued',
+            'job_id': job.job_id,
+            'status': job.status
+        }), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Error queuing report job', 'error': str(e)}), 500
+
+@report_bp.route('/jobs', methods=['GET'])
+@token_required
+def list_report_jobs(current_user):
+    """List the current user's most recent report jobs"""
+    try:
+        limit = int(request.args.get('limit', 20))
+        
+        jobs = ReportJob.query.filter_by(created_by=current_user.user_id)\
+            .order_by(ReportJob.created_at.desc())\
+            .limit(limit).all()
+        
+        return jsonify([_job_response(job) for job in jobs]), 200
+    except Exception as e:
+        return jsonify({'message': 'Error retrieving report jobs', 'error': str(e)}), 500
+
+@report_bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_report_job(current_user, job_id):
+    """Poll a report job's status and progress"""
+    try:
+        job = _get_visible_job(current_user, job_id)
+        if not job:
+            return jsonify({'message': 'Job not found'}), 404
+        
+        return jsonify(_job_response(job)), 200
+    except Exception as e:
+        return jsonify({'message': 'Error retrieving report job', 'error': str(e)}), 500
+
+@report_bp.route('/jobs/<job_id>/download', methods=['GET'])
+@token_required
+def download_report_job(current_user, job_id):
+    """Download the CSV produced by a finished job"""
+    try:
+        job = _get_visible_job(current_user, job_id)
+        if not job:
+            return jsonify({'message': 'Job not found'}), 404
+        
+        if job.status != 'succeeded':
+            return jsonify({'message': f'Job is {job.status}, no result available'}), 409
+        
+        if not job.result_path or not os.path.exists(job.result_path):
+            return jsonify({'message': 'Result file not found'}), 404
+        
+        return send_file(
+            job.result_path,
+            mimetype='text/csv',
+            as_attachment=True,
+            download_name=f'{job.job_type}_{job.job_id}.csv'
+        )
+    except Exception as e:
+        return jsonify({'message': 'Error downloading report', 'error': str(e)}), 500
+
+@report_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@token_required
+def cancel_report_job(current_user, job_id):
+    """Cancel a queued or running report job"""
+    try:
+        job = _get_visible_job(current_user, job_id)
+        if not job:
+            return jsonify({'message': 'Job not found'}), 404
+        
+        if not report_jobs.cancel(job):
+            return jsonify({'message': f'Job is already {job.status}'}), 400
+        
+        return jsonify({'message': 'Cancellation requested', 'status': job.status}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Error cancelling report job', 'error': str(e)}), 500
\ No newline at end of file
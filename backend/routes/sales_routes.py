@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from models.sale import Sale, db
 from models.medicine import Medicine
 from routes.auth_routes import token_required, role_required
+from services import rollups
+from services.idempotency import idempotent
 from datetime import datetime
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
@@ -55,6 +57,7 @@ def get_sales(current_user):
 
 @sales_bp.route('/', methods=['POST'])
 @token_required
+@idempotent('sales.create')
 def create_sale(current_user):
     """Create a new sale"""
     try:
@@ -91,6 +94,8 @@ def create_sale(current_user):
         medicine.quantity -= data['quantity']
         
         db.session.add(new_sale)
+        db.session.flush()  # Populate sale date for the rollup
+        rollups.record_sale(new_sale)
         db.session.commit()
         
         return jsonify({
@@ -2,12 +2,22 @@ from flask import Blueprint, request, jsonify, send_file
 from models.order import Order, OrderItem, OrderStatusHistory, db
 from models.customer import Customer
 from models.user import User
-from routes.auth_routes import token_required, role_required
+from models.medicine import Medicine
+from models.review_queue import PrescriptionReview
+from routes.auth_routes import token_required, role_required, stream_token_required
+from services import events, usernames, order_workflow, prescription_storage, prescription_previews, review_queue
+from services.report_cache import cached_report
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime
 import os
 
 staff_order_bp = Blueprint('staff_orders', __name__)
 
+ORDER_STATS_CACHE_TTL = float(os.environ.get('ORDER_STATS_CACHE_TTL', 5))
+PREVIEW_CACHE_SECONDS = int(os.environ.get('PREVIEW_CACHE_SECONDS', 86400))
+MAX_PREVIEW_PREFETCH = 50
+MAX_BULK_ORDERS = 1000
+
 @staff_order_bp.route('/online-orders', methods=['GET'])
 @token_required
 def get_online_orders(current_user):
@@ -19,43 +29,65 @@ def get_online_orders(current_user):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
         
-        # Build query
-        query = Order.query
+        if page < 1:
+            page = 1
+        if per_page < 1:
+            per_page = 20
+        
+        # One query per page: customer columns joined, item count as a correlated subquery,
+        # and the total number of matching orders as a window count over the filtered rows
+        item_count = db.select(db.func.count(OrderItem.order_item_id))\
+            .where(OrderItem.order_id == Order.order_id)\
+            .scalar_subquery()
+        
+        query = db.session.query(
+            Order,
+            Customer.name.label('customer_name'),
+            Customer.email.label('customer_email'),
+            Customer.phone.label('customer_phone'),
+            item_count.label('item_count'),
+            db.func.count().over().label('total')
+        ).outerjoin(Customer, Customer.customer_id == Order.customer_id)
         
         if status:
             query = query.filter(Order.status == status)
         
         if requires_review:
+            # Review list follows the review queue: most urgent SLA first, oldest ahead of newest
             query = query.filter(
                 Order.requires_prescription == True,
                 Order.prescription_status == 'Pending'
-            )
-        
-        # Order by date (newest first)
-        query = query.order_by(Order.order_date.desc())
+            ).outerjoin(PrescriptionReview, PrescriptionReview.order_id == Order.order_id)\
+             .order_by(PrescriptionReview.priority.desc().nullslast(), PrescriptionReview.due_at.nullslast(), Order.order_date)
+        else:
+            # Order by date (newest first)
+            query = query.order_by(Order.order_date.desc())
         
         # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        orders = pagination.items
+        rows = query.limit(per_page).offset((page - 1) * per_page).all()
+        if rows:
+            total = rows[0].total
+        else:
+            # Past the last page (or nothing matches): only then is a separate count needed
+            total = query.with_entities(db.func.count(Order.order_id)).order_by(None).scalar() if page > 1 else 0
         
         result = []
-        for order in orders:
-            customer = Customer.query.get(order.customer_id)
-            
+        for order, customer_name, customer_email, customer_phone, order_item_count, _ in rows:
             result.append({
                 'order_id': order.order_id,
-                'customer_name': customer.name if customer else 'Unknown',
-                'customer_email': customer.email if customer else 'Unknown',
-                'customer_phone': customer.phone if customer else 'Unknown',
+                'customer_name': customer_name or 'Unknown',
+                'customer_email': customer_email or 'Unknown',
+                'customer_phone': customer_phone or 'Unknown',
                 'order_date': order.order_date.isoformat(),
                 'total_amount': float(order.total_amount),
                 'status': order.status,
                 'payment_method': order.payment_method,
-                'item_count': len(order.order_items),
+                'item_count': order_item_count,
                 'requires_prescription': order.requires_prescription,
                 'prescription_uploaded': order.prescription_uploaded,
                 'prescription_status': order.prescription_status,
-                'needs_review': order.requires_prescription and order.prescription_status == 'Pending'
+                'needs_review': order.requires_prescription and order.prescription_status == 'Pending',
+                'preview_url': prescription_previews.signed_url(order.order_id) if order.prescription_file_path else None
             })
         
         return jsonify({
@@ -63,25 +95,39 @@ def get_online_orders(current_user):
             'pagination': {
                 'page': page,
                 'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
             }
         }), 200
         
     except Exception as e:
         return jsonify({'message': 'Error retrieving orders', 'error': str(e)}), 500
 
+@staff_order_bp.route('/online-orders/events', methods=['GET'])
+@stream_token_required
+def online_order_events(current_user):
+    """Server-Sent Events stream of new and changed online orders for the staff queue"""
+    try:
+        return events.stream(lambda evt: True)
+    except events.TooManySubscribers:
+        return jsonify({'message': 'Too many open event streams, please retry later'}), 503
+
 @staff_order_bp.route('/online-orders/<int:order_id>', methods=['GET'])
 @token_required
 def get_online_order_detail(current_user, order_id):
     """Get detailed order information for staff"""
     try:
-        order = Order.query.get(order_id)
+        # Fixed number of queries however many lines/history rows the order has
+        order = Order.query.options(
+            joinedload(Order.customer),
+            selectinload(Order.order_items).joinedload(OrderItem.medicine).joinedload(Medicine.company),
+            selectinload(Order.status_history)
+        ).get(order_id)
         
         if not order:
             return jsonify({'message': 'Order not found'}), 404
         
-        customer = Customer.query.get(order.customer_id)
+        customer = order.customer
         
         # Get order items
         items = []
@@ -100,12 +146,12 @@ def get_online_order_detail(current_user, order_id):
         
         # Get status history
         history = []
+        reviewers = usernames.get_usernames(status.changed_by for status in order.status_history)
         for status in order.status_history:
-            reviewer = User.query.get(status.changed_by) if status.changed_by else None
             history.append({
                 'status': status.status,
                 'changed_at': status.changed_at.isoformat(),
-                'changed_by': reviewer.username if reviewer else 'System',
+                'changed_by': reviewers.get(status.changed_by) or 'System',
                 'notes': status.notes
             })
         
@@ -129,6 +175,8 @@ def get_online_order_detail(current_user, order_id):
             'prescription_uploaded': order.prescription_uploaded,
             'prescription_file_path': order.prescription_file_path,
             'prescription_status': order.prescription_status,
+            'preview_url': prescription_previews.signed_url(order.order_id) if order.prescription_file_path else None,
+            'thumbnail_url': prescription_previews.signed_url(order.order_id, 'thumbnail') if order.prescription_file_path else None,
             'staff_notes': order.staff_notes,
             'items': items,
             'status_history': history
@@ -150,14 +198,149 @@ def view_prescription(current_user, order_id):
         if not order.prescription_file_path:
             return jsonify({'message': 'No prescription uploaded'}), 404
         
-        if not os.path.exists(order.prescription_file_path):
+        path = prescription_storage.resolve_path(order.prescription_file_path)
+        if not os.path.exists(path):
             return jsonify({'message': 'Prescription file not found'}), 404
         
-        return send_file(order.prescription_file_path)
+        # Content-addressed files never change, so conditional requests can be answered with 304
+        return send_file(path, conditional=True)
         
+    except prescription_storage.StorageError as e:
+        return jsonify({'message': e.message}), e.status
     except Exception as e:
         return jsonify({'message': 'Error retrieving prescription', 'error': str(e)}), 500
 
+@staff_order_bp.route('/online-orders/<int:order_id>/prescription/preview', methods=['GET'])
+def view_prescription_preview(order_id):
+    """
+    Compressed preview (?size=preview) or thumbnail (?size=thumbnail) of a prescription
+    Authorized by the signed URL (expires, sig) from the order list, detail or prefetch endpoints.
+    """
+    try:
+        size = request.args.get('size', 'preview')
+        if size not in prescription_previews.VARIANTS:
+            return jsonify({'message': f'Invalid size. Must be one of: {", ".join(prescription_previews.VARIANTS)}'}), 400
+        
+        if not prescription_previews.verify_signature(
+            order_id, size, request.args.get('expires', type=int), request.args.get('sig')
+        ):
+            return jsonify({'message': 'Invalid or expired preview link'}), 403
+        
+        stored_path = db.session.query(Order.prescription_file_path).filter_by(order_id=order_id).scalar()
+        if not stored_path:
+            return jsonify({'message': 'No prescription uploaded'}), 404
+        
+        # Falls back to the original when the rendition cannot be produced
+        path = prescription_previews.get_variant(stored_path, size) or prescription_storage.resolve_path(stored_path)
+        if not os.path.exists(path):
+            return jsonify({'message': 'Prescription file not found'}), 404
+        
+        # Signed per order, so only the browser may cache it; the content never changes
+        response = send_file(path, conditional=True, max_age=PREVIEW_CACHE_SECONDS)
+        response.cache_control.private = True
+        response.cache_control.public = False
+        response.cache_control.immutable = True
+        return response
+        
+    except prescription_storage.StorageError as e:
+        return jsonify({'message': e.message}), e.status
+    except Exception as e:
+        return jsonify({'message': 'Error retrieving prescription preview', 'error': str(e)}), 500
+
+@staff_order_bp.route('/online-orders/prescription-previews/prefetch', methods=['GET'])
+@token_required
+def prefetch_prescription_previews(current_user):
+    """Queue preview rendering for the next orders awaiting prescription review"""
+    try:
+        limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PREVIEW_PREFETCH)
+        exclude = request.args.getlist('exclude', type=int)
+        
+        query = db.session.query(Order.order_id, Order.prescription_file_path)\
+            .join(PrescriptionReview, PrescriptionReview.order_id == Order.order_id)\
+            .filter(Order.prescription_file_path.isnot(None))
+        if exclude:
+            query = query.filter(Order.order_id.notin_(exclude))
+        # Same order the review queue hands items out in
+        pending = query.order_by(PrescriptionReview.priority.desc(), PrescriptionReview.due_at).limit(limit).all()
+        
+        queued = prescription_previews.schedule_many(stored_path for _, stored_path in pending)
+        
+        return jsonify({
+            'orders': [{
+                'order_id': order_id,
+                'preview_url': prescription_previews.signed_url(order_id),
+                'thumbnail_url': prescription_previews.signed_url(order_id, 'thumbnail')
+            } for order_id, _ in pending],
+            'queued': queued
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Error prefetching prescription previews', 'error': str(e)}), 500
+
+@staff_order_bp.route('/online-orders/review-queue/claim', methods=['POST'])
+@token_required
+@role_required('Admin')
+def claim_reviews(current_user):
+    """Claim the next prescriptions to review, most urgent first"""
+    try:
+        data = request.get_json(silent=True) or {}
+        limit = data.get('limit', 1)
+        if not isinstance(limit, int) or limit < 1:
+            return jsonify({'message': 'limit must be a positive integer'}), 400
+        
+        claimed = review_queue.claim(current_user.user_id, limit)
+        
+        orders = {}
+        if claimed:
+            rows = db.session.query(Order, Customer.name).outerjoin(Customer, Customer.customer_id == Order.customer_id)\
+                .filter(Order.order_id.in_([item.order_id for item in claimed])).all()
+            orders = {order.order_id: (order, customer_name) for order, customer_name in rows}
+        
+        now = datetime.utcnow()
+        result = []
+        for item in claimed:
+            order, customer_name = orders[item.order_id]
+            result.append({
+                'order_id': item.order_id,
+                'customer_name': customer_name or 'Unknown',
+                'order_date': order.order_date.isoformat(),
+                'total_amount': float(order.total_amount),
+                'status': order.status,
+                'priority': item.priority,
+                'due_at': item.due_at.isoformat(),
+                'overdue': item.due_at < now,
+                'claim_expires_at': item.claim_expires_at.isoformat()
+            })
+        
+        return jsonify({'claimed': result}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Error claiming reviews', 'error': str(e)}), 500
+
+@staff_order_bp.route('/online-orders/review-queue/release', methods=['POST'])
+@token_required
+def release_reviews(current_user):
+    """Give claimed reviews back to the queue (all of them unless order_ids is given)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        released = review_queue.release(current_user.user_id, data.get('order_ids'))
+        return jsonify({'released': released}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Error releasing reviews', 'error': str(e)}), 500
+
+@staff_order_bp.route('/online-orders/review-queue/stats', methods=['GET'])
+@token_required
+def get_review_queue_stats(current_user):
+    """Review queue depth, SLA breaches and wait-time percentiles"""
+    try:
+        return jsonify(review_queue.stats()), 200
+        
+    except Exception as e:
+        return jsonify({'message': 'Error retrieving review queue stats', 'error': str(e)}), 500
+
 @staff_order_bp.route('/online-orders/<int:order_id>/review-prescription', methods=['POST'])
 @token_required
 @role_required('Admin')
@@ -180,42 +363,48 @@ def review_prescription(current_user, order_id):
         if order.prescription_status != 'Pending':
             return jsonify({'message': 'Prescription already reviewed'}), 400
         
+        if review_queue.claimed_by_other(order.order_id, current_user.user_id):
+            return jsonify({'message': 'Prescription is being reviewed by another pharmacist'}), 409
+        
         action = data['action']
         notes = data.get('notes', '')
         
         if action == 'approve':
-            order.prescription_status = 'Approved'
-            order.status = 'Processing'
+            prescription_status = 'Approved'
+            new_status = 'Processing'
             status_message = 'Prescription approved, order processing'
         else:  # reject
-            order.prescription_status = 'Rejected'
-            order.status = 'Rejected'
+            prescription_status = 'Rejected'
+            new_status = 'Rejected'
             status_message = 'Prescription rejected'
             
             if not notes:
                 return jsonify({'message': 'Rejection reason required in notes'}), 400
         
-        order.reviewed_by = current_user.user_id
-        order.reviewed_at = datetime.utcnow()
-        order.staff_notes = notes
-        
-        # Add to status history
-        status_history = OrderStatusHistory(
-            order_id=order.order_id,
-            status=order.status,
+        order_workflow.transition(
+            order.order_id,
+            new_status,
             changed_by=current_user.user_id,
-            notes=f'{status_message}. {notes}' if notes else status_message
+            notes=f'{status_message}. {notes}' if notes else status_message,
+            values={
+                'prescription_status': prescription_status,
+                'reviewed_by': current_user.user_id,
+                'reviewed_at': datetime.utcnow(),
+                'staff_notes': notes
+            }
         )
-        db.session.add(status_history)
         
         db.session.commit()
         
         return jsonify({
             'message': f'Prescription {action}d successfully',
-            'order_status': order.status,
-            'prescription_status': order.prescription_status
+            'order_status': new_status,
+            'prescription_status': prescription_status
         }), 200
         
+    except order_workflow.TransitionError as e:
+        db.session.rollback()
+        return jsonify({'message': e.message}), e.status
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Error reviewing prescription', 'error': str(e)}), 500
@@ -230,45 +419,69 @@ def update_order_status(current_user, order_id):
         if 'status' not in data:
             return jsonify({'message': 'Status required'}), 400
         
-        valid_statuses = ['Pending Review', 'Approved', 'Processing', 'Out for Delivery', 'Delivered', 'Rejected', 'Cancelled']
+        order_workflow.transition(
+            order_id,
+            data['status'],
+            changed_by=current_user.user_id,
+            notes=data.get('notes')
+        )
         
-        if data['status'] not in valid_statuses:
-            return jsonify({'message': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}), 400
+        db.session.commit()
         
-        order = Order.query.get(order_id)
+        return jsonify({
+            'message': 'Order status updated successfully',
+            'order_id': order_id,
+            'status': data['status']
+        }), 200
         
-        if not order:
-            return jsonify({'message': 'Order not found'}), 404
+    except order_workflow.TransitionError as e:
+        db.session.rollback()
+        return jsonify({'message': e.message}), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': 'Error updating status', 'error': str(e)}), 500
+
+@staff_order_bp.route('/online-orders/bulk-status', methods=['PUT'])
+@token_required
+def bulk_update_order_status(current_user):
+    """Move many orders to one status in a single transaction"""
+    try:
+        data = request.get_json() or {}
+        
+        order_ids = data.get('order_ids')
+        if not data.get('status') or not isinstance(order_ids, list) or not order_ids:
+            return jsonify({'message': 'status and a non-empty order_ids list are required'}), 400
         
-        # Prevent status change if prescription pending
-        if order.requires_prescription and order.prescription_status == 'Pending' and data['status'] not in ['Rejected', 'Cancelled']:
-            return jsonify({'message': 'Cannot update status until prescription is reviewed'}), 400
+        if len(order_ids) > MAX_BULK_ORDERS:
+            return jsonify({'message': f'At most {MAX_BULK_ORDERS} orders per request'}), 400
         
-        old_status = order.status
-        order.status = data['status']
+        if data['status'] not in order_workflow.STATUSES:
+            return jsonify({'message': f'Invalid status. Must be one of: {", ".join(order_workflow.STATUSES)}'}), 400
         
-        notes = data.get('notes', f'Status changed from {old_status} to {data["status"]}')
+        try:
+            order_ids = [int(order_id) for order_id in order_ids]
+        except (TypeError, ValueError):
+            return jsonify({'message': 'order_ids must be integers'}), 400
         
-        # Add to status history
-        status_history = OrderStatusHistory(
-            order_id=order.order_id,
-            status=data['status'],
+        updated, skipped = order_workflow.transition_orders(
+            order_ids,
+            data['status'],
             changed_by=current_user.user_id,
-            notes=notes
+            notes=data.get('notes')
         )
-        db.session.add(status_history)
         
         db.session.commit()
         
         return jsonify({
-            'message': 'Order status updated successfully',
-            'order_id': order.order_id,
-            'status': order.status
+            'message': f'{len(updated)} order(s) updated',
+            'status': data['status'],
+            'updated': updated,
+            'skipped': [{'order_id': order_id, 'reason': reason} for order_id, reason in skipped.items()]
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'message': 'Error updating status', 'error': str(e)}), 500
+        return jsonify({'message': 'Error updating statuses', 'error': str(e)}), 500
 
 @staff_order_bp.route('/online-orders/<int:order_id>/add-note', methods=['POST'])
 @token_required
@@ -304,25 +517,33 @@ def add_staff_note(current_user, order_id):
 
 @staff_order_bp.route('/online-orders/stats', methods=['GET'])
 @token_required
+@cached_report('order-stats', tags=('orders',), ttl=ORDER_STATS_CACHE_TTL)
 def get_order_stats(current_user):
     """Get online order statistics"""
     try:
-        total_orders = Order.query.count()
-        pending_review = Order.query.filter_by(prescription_status='Pending').count()
-        processing = Order.query.filter_by(status='Processing').count()
-        out_for_delivery = Order.query.filter_by(status='Out for Delivery').count()
-        delivered = Order.query.filter_by(status='Delivered').count()
-        
-        # Today's orders
-        today = datetime.utcnow().date()
-        today_orders = Order.query.filter(
-            db.func.date(Order.order_date) == today
-        ).count()
-        
-        # Total revenue
-        total_revenue = db.session.query(
-            db.func.sum(Order.total_amount)
-        ).filter(Order.status.in_(['Processing', 'Out for Delivery', 'Delivered'])).scalar() or 0
+        today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        count = db.func.count(Order.order_id)
+        
+        # Single pass over orders
+        stats = db.session.query(
+            count.label('total_orders'),
+            count.filter(Order.prescription_status == 'Pending').label('pending_review'),
+            count.filter(Order.status == 'Processing').label('processing'),
+            count.filter(Order.status == 'Out for Delivery').label('out_for_delivery'),
+            count.filter(Order.status == 'Delivered').label('delivered'),
+            count.filter(Order.order_date >= today_start).label('today_orders'),
+            db.func.sum(Order.total_amount).filter(
+                Order.status.in_(['Processing', 'Out for Delivery', 'Delivered'])
+            ).label('total_revenue')
+        ).one()
+        
+        total_orders = stats.total_orders
+        pending_review = stats.pending_review
+        processing = stats.processing
+        out_for_delivery = stats.out_for_delivery
+        delivered = stats.delivered
+        today_orders = stats.today_orders
+        total_revenue = stats.total_revenue or 0
         
         return jsonify({
             'total_orders': total_orders,
@@ -0,0 +1,326 @@
+"""
+Auth Tokens - Short-lived access tokens, rotating refresh tokens and revocation
+Login issues an access JWT valid for ACCESS_TOKEN_MINUTES and a refresh JWT. Each
+refresh replaces the refresh token with the next one in its family; presenting a
+refresh token that was already rotated is treated as theft and revokes the whole
+family (every refresh token and access token from that login). The exception is a
+reuse within REFRESH_REUSE_GRACE_SECONDS of the rotation: open tabs share one
+token and all refresh when it expires, so they get the successor already issued
+(with a fresh access token) instead.
+
+Access tokens carry jti (their id) and fam (their login family). Revoked ids live
+in revoked_tokens and, per process, in a Bloom filter checked by the auth
+decorators without touching the database: a miss means not revoked, and only a hit
+(a real revocation or a rare false positive) is confirmed with a primary key
+lookup. Only revocations are stored, so the filter stays small however many tokens
+are issued. Each process picks up other workers' revocations every
+REVOCATION_SYNC_SECONDS and rebuilds the filter from unexpired rows every
+REVOCATION_REBUILD_SECONDS (or when it fills up).
+Expired rows are removed by `python maintenance.py purge-auth-tokens`.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+import jwt
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from models import db
+from models.auth_token import RefreshToken, RevokedToken
+
+ACCESS_TOKEN_MINUTES = int(os.environ.get('ACCESS_TOKEN_MINUTES', 15))
+REVOCATION_FILTER_CAPACITY = int(os.environ.get('REVOCATION_FILTER_CAPACITY', 1000000))
+REVOCATION_FILTER_ERROR_RATE = float(os.environ.get('REVOCATION_FILTER_ERROR_RATE', 0.001))
+REVOCATION_SYNC_SECONDS = float(os.environ.get('REVOCATION_SYNC_SECONDS', 5))
+REVOCATION_REBUILD_SECONDS = float(os.environ.get('REVOCATION_REBUILD_SECONDS', 3600))
+REFRESH_REUSE_GRACE_SECONDS = float(os.environ.get('REFRESH_REUSE_GRACE_SECONDS', 10))
+
+REFRESH = 'refresh'
+
+# Re-read this much before the sync watermark, for rows committed late or stamped by a lagging clock
+SYNC_OVERLAP = timedelta(seconds=60)
+
+class TokenError(Exception):
+    """A refresh token that cannot be used; the client must log in again"""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()  # |= on a bytearray item is not atomic
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        positions = self._positions(item)
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class RevocationFilter:
+    """Process-local view of revoked_tokens"""
+
+    def __init__(self, capacity: int = REVOCATION_FILTER_CAPACITY, error_rate: float = REVOCATION_FILTER_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = None
+        self._watermark = None  # Newest revoked_at loaded
+        self._synced_at = 0.0
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, token_ids: Iterable[str]):
+        bloom = self._filter
+        if bloom is not None:
+            for token_id in token_ids:
+                bloom.add(token_id)
+
+    def _rebuild(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        watermark = None
+        rows = db.session.query(RevokedToken.token_id, RevokedToken.revoked_at)\
+            .filter(RevokedToken.expires_at > datetime.utcnow())\
+            .yield_per(10000)
+        for token_id, revoked_at in rows:
+            bloom.add(token_id)
+            watermark = revoked_at if watermark is None or revoked_at > watermark else watermark
+        self._filter = bloom
+        self._watermark = watermark
+        self._built_at = time.monotonic()
+
+    def _sync(self):
+        if self._watermark is None:
+            return self._rebuild()
+        # Re-adding ids already in the filter is harmless
+        rows = db.session.query(RevokedToken.token_id, RevokedToken.revoked_at)\
+            .filter(RevokedToken.revoked_at >= self._watermark - SYNC_OVERLAP).all()
+        for token_id, revoked_at in rows:
+            self._filter.add(token_id)
+            self._watermark = max(self._watermark, revoked_at)
+
+    def refresh(self, force: bool = False):
+        """Load revocations made since the last sync (one request per process does the work)"""
+        now = time.monotonic()
+        if not force and self._filter is not None and now - self._synced_at < REVOCATION_SYNC_SECONDS:
+            return
+        if not self._lock.acquire(blocking=self._filter is None):
+            return  # Another request is syncing; use the current filter meanwhile
+        try:
+            if (self._filter is None or now - self._built_at >= REVOCATION_REBUILD_SECONDS
+                    or self._filter.count >= self.capacity):
+                self._rebuild()
+            else:
+                self._sync()
+            self._synced_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def might_contain(self, token_id: str) -> bool:
+        return token_id in self._filter
+
+revocations = RevocationFilter()
+
+def is_revoked(claims: Dict) -> bool:
+    """Whether an access token (its jti or its login family) has been revoked"""
+    token_ids = [claims[key] for key in ('jti', 'fam') if claims.get(key)]
+    if not token_ids:
+        return False  # Issued before revocation support; expires on its own
+    revocations.refresh()
+    if not any(revocations.might_contain(token_id) for token_id in token_ids):
+        return False
+    return db.session.query(RevokedToken.token_id)\
+        .filter(RevokedToken.token_id.in_(token_ids)).first() is not None
+
+def _new_id() -> str:
+    return uuid.uuid4().hex
+
+def _access_token(claims: Dict, family_id: str, secret: str) -> str:
+    now = datetime.utcnow()
+    return jwt.encode(dict(
+        claims,
+        jti=_new_id(),
+        fam=family_id,
+        iat=now,
+        exp=now + timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    ), secret, algorithm='HS256')
+
+def _encode_refresh(row: RefreshToken, secret: str) -> str:
+    """The refresh JWT for a stored row (the same string every time)"""
+    return jwt.encode({
+        'typ': REFRESH,
+        'jti': row.token_id,
+        'fam': row.family_id,
+        'sub_type': row.subject_type,
+        'sub_id': row.subject_id,
+        'iat': row.issued_at,
+        'exp': row.expires_at
+    }, secret, algorithm='HS256')
+
+def _refresh_token(subject_type: str, subject_id: int, family_id: str, lifetime: timedelta, secret: str) -> Tuple[str, str]:
+    now = datetime.utcnow()
+    row = RefreshToken(
+        token_id=_new_id(),
+        family_id=family_id,
+        subject_type=subject_type,
+        subject_id=subject_id,
+        issued_at=now,
+        expires_at=now + lifetime
+    )
+    db.session.add(row)
+    return row.token_id, _encode_refresh(row, secret)
+
+def _pair(access_token: str, refresh_token: str) -> Dict:
+    return {'token': access_token, 'refresh_token': refresh_token, 'expires_in': ACCESS_TOKEN_MINUTES * 60}
+
+def issue(subject_type: str, subject_id: int, claims: Dict, lifetime: timedelta, secret: str) -> Dict:
+    """Start a login family: {'token', 'refresh_token', 'expires_in'}; the caller commits"""
+    family_id = _new_id()
+    _, refresh_token = _refresh_token(subject_type, subject_id, family_id, lifetime, secret)
+    return _pair(_access_token(claims, family_id, secret), refresh_token)
+
+def decode_refresh(token: str, subject_type: str, secret: str) -> Dict:
+    try:
+        data = jwt.decode(token or '', secret, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise TokenError('Refresh token has expired')
+    except jwt.InvalidTokenError:
+        raise TokenError('Refresh token is invalid')
+    if data.get('typ') != REFRESH or data.get('sub_type') != subject_type:
+        raise TokenError('Refresh token is invalid')
+    return data
+
+def rotate(token: str, subject_type: str, claims_for, lifetime: timedelta, secret: str) -> Dict:
+    """
+    Exchange a refresh token for a new pair and commit
+    `claims_for(subject_id)` returns the access token claims, or None if the account
+    may no longer sign in. Reusing a rotated token revokes its family, unless the
+    rotation happened within REFRESH_REUSE_GRACE_SECONDS (concurrent tabs).
+    """
+    data = decode_refresh(token, subject_type, secret)
+    row = RefreshToken.query.filter_by(token_id=data['jti']).with_for_update().first()
+    if row is None or row.subject_id != data['sub_id']:
+        raise TokenError('Refresh token is invalid')
+
+    if row.replaced_by is not None:
+        successor = _recent_successor(row)
+        if successor is None:
+            # Rotated a while ago: someone else holds a copy of this token
+            revoke_family(row.family_id, row.subject_type, row.subject_id)
+            db.session.commit()
+            raise TokenError('Refresh token has been revoked')
+        claims = claims_for(row.subject_id)
+        if claims is None:
+            revoke_family(row.family_id, row.subject_type, row.subject_id)
+            db.session.commit()
+            raise TokenError('Account is no longer active')
+        db.session.commit()
+        return _pair(_access_token(claims, row.family_id, secret), _encode_refresh(successor, secret))
+    if row.revoked_at is not None:
+        db.session.rollback()
+        raise TokenError('Refresh token has been revoked')
+
+    claims = claims_for(row.subject_id)
+    if claims is None:
+        revoke_family(row.family_id, row.subject_type, row.subject_id)
+        db.session.commit()
+        raise TokenError('Account is no longer active')
+
+    token_id, refresh_token = _refresh_token(subject_type, row.subject_id, row.family_id, lifetime, secret)
+    row.replaced_by = token_id
+    db.session.commit()
+    return _pair(_access_token(claims, row.family_id, secret), refresh_token)
+
+def _recent_successor(row: RefreshToken) -> Optional[RefreshToken]:
+    """
+    The live head of the family if `row` was rotated within REFRESH_REUSE_GRACE_SECONDS
+    Follows replaced_by, since other tabs may have rotated the successor meanwhile.
+    """
+    successor = RefreshToken.query.get(row.replaced_by)
+    if successor is None or successor.issued_at < datetime.utcnow() - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+        return None
+    while successor.replaced_by is not None:
+        successor = RefreshToken.query.get(successor.replaced_by)
+        if successor is None:
+            return None
+    if successor.revoked_at is not None:
+        return None
+    return successor
+
+def revoke_family(family_id: str, subject_type: str, subject_id: int):
+    """Revoke every refresh and access token from one login; the caller commits"""
+    now = datetime.utcnow()
+    RefreshToken.query.filter(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))\
+        .update({'revoked_at': now}, synchronize_session=False)
+    # Access tokens from this family live at most ACCESS_TOKEN_MINUTES past now
+    db.session.execute(insert(RevokedToken).values(
+        token_id=family_id,
+        subject_type=subject_type,
+        subject_id=subject_id,
+        revoked_at=now,
+        expires_at=now + timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    ).on_conflict_do_nothing(index_elements=['token_id']))
+    revocations.add([family_id])
+
+def revoke_all(subject_type: str, subject_id: int):
+    """Revoke every live login of an account (e.g. after a password reset); the caller commits"""
+    families = db.session.query(RefreshToken.family_id).distinct().filter(
+        RefreshToken.subject_type == subject_type,
+        RefreshToken.subject_id == subject_id,
+        RefreshToken.revoked_at.is_(None),
+        RefreshToken.expires_at > datetime.utcnow()
+    ).all()
+    for (family_id,) in families:
+        revoke_family(family_id, subject_type, subject_id)
+
+def logout(subject_type: str, access_claims: Optional[Dict], refresh_token: Optional[str], secret: str) -> bool:
+    """Revoke the login behind an access and/or refresh token and commit; returns whether anything was revoked"""
+    target = None
+    if refresh_token:
+        try:
+            data = decode_refresh(refresh_token, subject_type, secret)
+            target = (data['fam'], data['sub_id'])
+        except TokenError:
+            pass
+    if target is None and access_claims and access_claims.get('fam'):
+        target = (access_claims['fam'], access_claims.get(f'{subject_type}_id'))
+    if target is None:
+        return False
+    revoke_family(target[0], subject_type, target[1])
+    db.session.commit()
+    return True
+
+def purge_expired(batch_size: int = 10000) -> int:
+    """Delete expired refresh tokens and revocations in batches; returns rows deleted"""
+    total = 0
+    for model, key in ((RefreshToken, RefreshToken.token_id), (RevokedToken, RevokedToken.token_id)):
+        while True:
+            expired = db.session.query(key).filter(model.expires_at < datetime.utcnow()).limit(batch_size).subquery()
+            deleted = model.query.filter(key.in_(select(expired.c[key.name])))\
+                .delete(synchronize_session=False)
+            db.session.commit()
+            total += deleted
+            if deleted < batch_size:
+                break
+    return total
@@ -0,0 +1,140 @@
+"""
+Cart Operations - Apply a batch of cart changes in one transaction
+Operations are applied in order against the customer's current lines:
+
+    {'op': 'add',    'medicine_id': 12, 'quantity': 2}   - add to any existing quantity
+    {'op': 'set',    'medicine_id': 12, 'quantity': 5}   - replace the quantity (0 removes)
+    {'op': 'remove', 'medicine_id': 12}                  - drop the line
+
+All referenced medicines are fetched in one query and the customer's affected lines
+in another. The customer row is locked first, so concurrent batches for one customer
+serialize even when they add lines that do not exist yet. The results
+are written with one INSERT ... ON CONFLICT (customer_id, medicine_id) DO UPDATE
+and one DELETE. An operation that cannot be applied (unknown or expired medicine,
+not enough stock) is skipped and reported; the rest still apply.
+Buffered cart store edits for the customer are flushed first; the caller commits
+the batch itself.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from models import db
+from models.customer import CartItem, Customer
+from models.medicine import Medicine
+from services import cart_store
+
+OPERATIONS = ('add', 'set', 'remove')
+MAX_OPERATIONS = 100
+
+class CartBatchError(Exception):
+    """A malformed batch; nothing was applied"""
+
+    def __init__(self, message: str, index: int = None):
+        super().__init__(message)
+        self.message = message if index is None else f'Operation {index}: {message}'
+
+def _validate(operations) -> List[Dict]:
+    if not isinstance(operations, list) or not operations:
+        raise CartBatchError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise CartBatchError(f'At most {MAX_OPERATIONS} operations per batch')
+
+    cleaned = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            raise CartBatchError(f'op must be one of: {", ".join(OPERATIONS)}', index)
+        try:
+            medicine_id = int(operation['medicine_id'])
+            quantity = int(operation.get('quantity', 1 if operation['op'] == 'add' else 0))
+        except (KeyError, TypeError, ValueError):
+            raise CartBatchError('medicine_id and quantity must be integers', index)
+        if operation['op'] == 'add' and quantity <= 0:
+            raise CartBatchError('quantity must be greater than 0', index)
+        if operation['op'] == 'set' and quantity < 0:
+            raise CartBatchError('quantity cannot be negative', index)
+        cleaned.append({'op': operation['op'], 'medicine_id': medicine_id, 'quantity': quantity})
+    return cleaned
+
+def apply(customer_id: int, operations) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Apply `operations` to the customer's cart
+    Returns (applied, errors): applied operations, and {'index', 'medicine_id', 'message'}
+    for each skipped one. Raises CartBatchError for a malformed batch.
+    """
+    operations = _validate(operations)
+    # Start from the latest quantities, including edits still buffered in the cart store
+    cart_store.flush(customer_id)
+    medicine_ids = sorted({operation['medicine_id'] for operation in operations})
+
+    # Row locks on cart_items only cover existing lines; two batches adding the same new
+    # line would both start from 0. NO KEY UPDATE still lets orders reference the customer.
+    db.session.query(Customer.customer_id).filter_by(customer_id=customer_id)\
+        .with_for_update(key_share=True).first()
+
+    medicines = {
+        medicine.medicine_id: medicine
+        for medicine in Medicine.query.filter(Medicine.medicine_id.in_(medicine_ids))
+    }
+    current = dict(
+        db.session.query(CartItem.medicine_id, CartItem.quantity)
+        .filter(CartItem.customer_id == customer_id, CartItem.medicine_id.in_(medicine_ids))
+        .with_for_update()
+        .all()
+    )
+
+    quantities = dict(current)
+    today = datetime.now().date()
+    applied, errors = [], []
+    for index, operation in enumerate(operations):
+        medicine_id = operation['medicine_id']
+        medicine = medicines.get(medicine_id)
+
+        if operation['op'] == 'remove':
+            new_quantity = 0
+        elif medicine is None:
+            errors.append({'index': index, 'medicine_id': medicine_id, 'message': 'Medicine not found'})
+            continue
+        elif medicine.exp_date <= today:
+            errors.append({'index': index, 'medicine_id': medicine_id, 'message': f'{medicine.name} has expired'})
+            continue
+        elif operation['op'] == 'add':
+            new_quantity = quantities.get(medicine_id, 0) + operation['quantity']
+        else:
+            new_quantity = operation['quantity']
+
+        if medicine is not None and new_quantity > medicine.quantity:
+            errors.append({
+                'index': index,
+                'medicine_id': medicine_id,
+                'message': f'Only {medicine.quantity} units of {medicine.name} available'
+            })
+            continue
+
+        quantities[medicine_id] = new_quantity
+        applied.append(dict(operation, index=index))
+
+    upserts = [
+        {'customer_id': customer_id, 'medicine_id': medicine_id, 'quantity': quantity}
+        for medicine_id, quantity in sorted(quantities.items())
+        if quantity > 0 and quantity != current.get(medicine_id)
+    ]
+    removals = [
+        medicine_id for medicine_id, quantity in quantities.items()
+        if quantity == 0 and medicine_id in current
+    ]
+
+    if upserts:
+        stmt = insert(CartItem).values(upserts)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['customer_id', 'medicine_id'],
+            set_={'quantity': stmt.excluded.quantity}
+        ))
+    if removals:
+        db.session.execute(
+            delete(CartItem)
+            .where(CartItem.customer_id == customer_id, CartItem.medicine_id.in_(removals))
+            .execution_options(synchronize_session=False)
+        )
+    return applied, errors
@@ -0,0 +1,222 @@
+"""
+Cart Store - Write-behind buffer for cart quantity edits
+Quantity changes to existing cart lines are recorded in a fast local store and
+written to cart_items in one UPDATE ... FROM (VALUES ...) per flush, every
+CART_FLUSH_SECONDS and whenever the cart is about to be read for checkout or
+changed through a write-through path (add, remove, batch). Cart reads overlay the
+pending quantities, so customers always see their latest edit.
+
+Flushes are serialized by a PostgreSQL advisory lock held from the snapshot until
+the UPDATE commits, so flushes write in snapshot order and a slow flush can never
+write an older snapshot over a newer edit that another flush has already written.
+Buffering an edit never waits for a flush: the local store is only write-locked for
+the versioned discard afterwards.
+
+Backends (CART_STORE):
+    sqlite   - SQLite file shared by the workers on one host (CART_STORE_PATH, WAL;
+               default). Pending edits survive worker restarts and are flushed by
+               whichever worker runs next; every local worker sees them immediately,
+               so checkout on any worker writes them.
+    memory   - per-process dict, for a single-process server only (e.g. the
+               development server): checkout on another worker would not see this
+               process's pending edits. Edits made in the last CART_FLUSH_SECONDS
+               are lost if the process is killed; a clean shutdown flushes them.
+    postgres - no buffering: every edit commits, as before.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Integer, column, text, update, values
+from models import db
+from models.customer import CartItem
+
+CART_STORE = os.environ.get('CART_STORE', 'sqlite')
+CART_FLUSH_SECONDS = float(os.environ.get('CART_FLUSH_SECONDS', 2))
+CART_STORE_PATH = os.environ.get('CART_STORE_PATH', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads', 'cart_store.sqlite3'
+))
+
+# (customer_id, cart_item_id, quantity, version); version identifies this exact write
+Entry = Tuple[int, int, int, int]
+
+class MemoryBackend:
+    def __init__(self):
+        self._pending = defaultdict(dict)  # customer_id -> {cart_item_id: (quantity, version)}
+        self._lock = threading.Lock()
+        self._version = 0
+
+    def put(self, customer_id: int, cart_item_id: int, quantity: int):
+        with self._lock:
+            self._version += 1
+            self._pending[customer_id][cart_item_id] = (quantity, self._version)
+
+    def pending(self, customer_id: int) -> Dict[int, int]:
+        with self._lock:
+            return {item_id: quantity for item_id, (quantity, _) in self._pending.get(customer_id, {}).items()}
+
+    def snapshot(self, customer_id: Optional[int] = None) -> List[Entry]:
+        with self._lock:
+            customers = [customer_id] if customer_id is not None else list(self._pending)
+            return [
+                (cid, item_id, quantity, version)
+                for cid in customers
+                for item_id, (quantity, version) in self._pending.get(cid, {}).items()
+            ]
+
+    def discard(self, entries: List[Entry]):
+        """Forget flushed entries, unless they were overwritten since the snapshot"""
+        with self._lock:
+            for customer_id, item_id, _, version in entries:
+                lines = self._pending.get(customer_id)
+                if lines and lines.get(item_id, (None, None))[1] == version:
+                    del lines[item_id]
+                    if not lines:
+                        del self._pending[customer_id]
+
+class SQLiteBackend:
+    def __init__(self, path: str = CART_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS pending_cart_quantities (
+                customer_id INTEGER NOT NULL,
+                cart_item_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                PRIMARY KEY (customer_id, cart_item_id)
+            )
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, customer_id: int, cart_item_id: int, quantity: int):
+        self._conn().execute("""
+            INSERT INTO pending_cart_quantities (customer_id, cart_item_id, quantity, version)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (customer_id, cart_item_id)
+            DO UPDATE SET quantity = excluded.quantity, version = excluded.version
+        """, (customer_id, cart_item_id, quantity, time.time_ns()))
+
+    def pending(self, customer_id: int) -> Dict[int, int]:
+        return dict(self._conn().execute(
+            'SELECT cart_item_id, quantity FROM pending_cart_quantities WHERE customer_id = ?', (customer_id,)
+        ).fetchall())
+
+    def snapshot(self, customer_id: Optional[int] = None) -> List[Entry]:
+        sql = 'SELECT customer_id, cart_item_id, quantity, version FROM pending_cart_quantities'
+        if customer_id is not None:
+            return self._conn().execute(sql + ' WHERE customer_id = ?', (customer_id,)).fetchall()
+        return self._conn().execute(sql).fetchall()
+
+    def discard(self, entries: List[Entry]):
+        """Forget flushed entries, unless they were overwritten since the snapshot"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'DELETE FROM pending_cart_quantities WHERE customer_id = ? AND cart_item_id = ? AND version = ?',
+                [(customer_id, item_id, version) for customer_id, item_id, _, version in entries]
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+def _create_backend():
+    if CART_STORE == 'sqlite':
+        return SQLiteBackend()
+    if CART_STORE == 'postgres':
+        return None
+    return MemoryBackend()
+
+backend = _create_backend()
+
+def set_quantity(customer_id: int, cart_item_id: int, quantity: int):
+    """Record a new quantity for an existing cart line"""
+    if backend is None:
+        CartItem.query.filter_by(cart_item_id=cart_item_id, customer_id=customer_id)\
+            .update({'quantity': quantity}, synchronize_session=False)
+        db.session.commit()
+        return
+    backend.put(customer_id, cart_item_id, quantity)
+
+def pending(customer_id: int) -> Dict[int, int]:
+    """Unflushed {cart_item_id: quantity} edits for a customer"""
+    return backend.pending(customer_id) if backend is not None else {}
+
+def flush(customer_id: Optional[int] = None) -> int:
+    """Write pending edits (one customer's, or all) to cart_items and commit; returns lines written"""
+    if backend is None or not backend.snapshot(customer_id):
+        return 0
+    try:
+        # Serializes flushes across threads and workers until the commit; put() never takes it
+        db.session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:key))'), {'key': 'cart_store:flush'})
+        entries = backend.snapshot(customer_id)
+        if not entries:
+            db.session.commit()
+            return 0
+
+        edits = values(
+            column('customer_id', Integer), column('cart_item_id', Integer), column('quantity', Integer),
+            name='edits'
+        ).data([(customer_id, item_id, quantity) for customer_id, item_id, quantity, _ in entries])
+        # Lines deleted in the meantime simply match nothing
+        db.session.execute(
+            update(CartItem)
+            .where(CartItem.cart_item_id == edits.c.cart_item_id, CartItem.customer_id == edits.c.customer_id)
+            .values(quantity=edits.c.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    # Any later flush snapshots after this commit, so discarding outside the lock is safe
+    backend.discard(entries)
+    return len(entries)
+
+# Background flushing
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def _flush_forever(app):
+    while True:
+        time.sleep(CART_FLUSH_SECONDS)
+        try:
+            with app.app_context():
+                flush()
+        except Exception as e:
+            print(f"Cart store flush error: {e}")
+
+def _flush_on_exit(app):
+    try:
+        with app.app_context():
+            flush()
+    except Exception as e:
+        print(f"Cart store flush error at exit: {e}")
+
+def init_app(app):
+    """Start this process's flusher thread (once) and flush on clean shutdown"""
+    global _flusher
+    if backend is None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, args=(app,), name='cart-store-flusher', daemon=True)
+            _flusher.start()
+            atexit.register(_flush_on_exit, app)
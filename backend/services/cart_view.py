@@ -0,0 +1,86 @@
+"""
+Cart View - Read model for a customer's cart
+One joined query returns every line with its medicine and company, plus the cart
+totals and Rx flag as window aggregates, so reading a cart costs one round trip
+whatever its size. Money stays Decimal until serialization. Quantity edits not yet
+flushed from the cart store are applied in the same query.
+Shared by the cart REST route and the chatbot tools.
+"""
+
+from decimal import Decimal
+from typing import Dict, List
+from sqlalchemy import and_, case, func
+from models import db
+from models.customer import CartItem
+from models.medicine import Medicine, Company
+from services import cart_store
+
+PLACEHOLDER_IMAGE = '/static/images/medicine-placeholder.png'
+
+class CartView:
+    def __init__(self, lines: List, total: Decimal, requires_prescription: bool):
+        self.lines = lines
+        self.total = total
+        self.requires_prescription = requires_prescription
+
+    @property
+    def item_count(self) -> int:
+        return len(self.lines)
+
+def load(customer_id: int) -> CartView:
+    # Quantity edits still buffered in the cart store take precedence over the table
+    overrides = cart_store.pending(customer_id)
+    quantity = case(overrides, value=CartItem.cart_item_id, else_=CartItem.quantity) if overrides else CartItem.quantity
+    subtotal = Medicine.price * quantity
+
+    lines = db.session.query(
+        CartItem.cart_item_id,
+        quantity.label('quantity'),
+        CartItem.added_at,
+        Medicine.medicine_id,
+        Medicine.name,
+        Company.name.label('company'),
+        Medicine.price,
+        Medicine.product_type,
+        Medicine.image_url,
+        Medicine.quantity.label('available_quantity'),
+        and_(Medicine.quantity >= quantity, Medicine.exp_date > func.current_date()).label('in_stock'),
+        subtotal.label('subtotal'),
+        func.sum(subtotal).over().label('total'),
+        func.bool_or(Medicine.product_type == 'Rx').over().label('requires_prescription')
+    ).join(Medicine, Medicine.medicine_id == CartItem.medicine_id)\
+     .join(Company, Company.company_id == Medicine.company_id)\
+     .filter(CartItem.customer_id == customer_id)\
+     .order_by(CartItem.cart_item_id)\
+     .all()
+
+    if not lines:
+        return CartView([], Decimal('0'), False)
+    return CartView(lines, lines[0].total, bool(lines[0].requires_prescription))
+
+def serialize_line(line) -> Dict:
+    return {
+        'cart_item_id': line.cart_item_id,
+        'medicine_id': line.medicine_id,
+        'name': line.name,
+        'medicine_name': line.name,  # Key used by the chat widget
+        'company': line.company,
+        'price': float(line.price),
+        'quantity': line.quantity,
+        'subtotal': float(line.subtotal),
+        'product_type': line.product_type,
+        'requires_prescription': line.product_type == 'Rx',
+        'image_url': line.image_url or PLACEHOLDER_IMAGE,
+        'in_stock': bool(line.in_stock),
+        'available_quantity': line.available_quantity,
+        'added_at': line.added_at.isoformat()
+    }
+
+def serialize(view: CartView) -> Dict:
+    """Lines and totals; callers choose the key the lines go under"""
+    return {
+        'items': [serialize_line(line) for line in view.lines],
+        'total': float(round(view.total, 2)),
+        'item_count': view.item_count,
+        'requires_prescription': view.requires_prescription
+    }
@@ -0,0 +1,147 @@
+"""
+Checkout - Concurrency-safe order placement pipeline
+    1. one joined cart + medicine read, locking the medicine rows FOR UPDATE in id order
+       (a fixed lock order means two checkouts sharing SKUs cannot deadlock)
+    2. order row, then all order items in one batched INSERT
+    3. one guarded UPDATE decrementing stock for every line (see services.inventory)
+    4. one DELETE removing the ordered cart lines
+    5. prescription orders join the review queue
+All statements run in the caller's transaction; the caller commits. A quote issued
+by /checkout/validate (services.checkout_quotes) stands in for step 1.
+"""
+
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import delete, insert
+from models import db
+from models.customer import CartItem
+from models.medicine import Medicine
+from models.order import Order, OrderItem, OrderStatusHistory
+from services import inventory, review_queue
+
+class CheckoutError(Exception):
+    """A checkout that cannot proceed; `message` is safe to show the customer"""
+
+    def __init__(self, message: str, status: int = 400, error: Optional[str] = None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.error = error
+
+def cart_hash(rows: Iterable[tuple]) -> str:
+    """Fingerprint of cart contents from (cart_item_id, medicine_id, quantity) rows"""
+    digest = hashlib.sha256()
+    for cart_item_id, medicine_id, quantity in sorted(rows):
+        digest.update(f'{cart_item_id}:{medicine_id}:{quantity};'.encode())
+    return digest.hexdigest()
+
+class LockedCart:
+    """Cart lines with their medicines, read under lock"""
+
+    def __init__(self, lines: List[tuple]):
+        self.lines = lines  # [(CartItem, Medicine)]
+        self.total = sum(float(medicine.price) * item.quantity for item, medicine in lines)
+        self.requires_prescription = any(medicine.product_type == 'Rx' for _, medicine in lines)
+        self.cart_item_ids = [item.cart_item_id for item, _ in lines]
+        self.cart_hash = cart_hash((item.cart_item_id, item.medicine_id, item.quantity) for item, _ in lines)
+
+    @property
+    def quantities(self) -> Dict[int, int]:
+        """Units requested per medicine (a medicine may appear on several cart lines)"""
+        quantities = OrderedDict()
+        for item, medicine in self.lines:
+            quantities[medicine.medicine_id] = quantities.get(medicine.medicine_id, 0) + item.quantity
+        return quantities
+
+    def order_items(self) -> List[Dict]:
+        """Order item values (without order_id) for each cart line"""
+        return [{
+            'medicine_id': medicine.medicine_id,
+            'quantity': item.quantity,
+            'unit_price': medicine.price,
+            'subtotal': float(medicine.price) * item.quantity,
+            'product_type': medicine.product_type
+        } for item, medicine in self.lines]
+
+def read_cart(customer_id: int, lock: bool = False) -> List[tuple]:
+    """The customer's (CartItem, Medicine) lines in one joined query, optionally locking the medicines"""
+    query = db.session.query(CartItem, Medicine)\
+        .join(Medicine, Medicine.medicine_id == CartItem.medicine_id)\
+        .filter(CartItem.customer_id == customer_id)\
+        .order_by(Medicine.medicine_id, CartItem.cart_item_id)
+    if lock:
+        query = query.with_for_update(of=Medicine)
+    return query.all()
+
+def lock_cart(customer_id: int) -> LockedCart:
+    """
+    Read the customer's cart with its medicines and lock those medicine rows
+    Raises CheckoutError if the cart is empty or any line is short or expired.
+    """
+    lines = read_cart(customer_id, lock=True)
+
+    if not lines:
+        raise CheckoutError('Cart is empty')
+
+    cart = LockedCart(lines)
+    medicines = {medicine.medicine_id: medicine for _, medicine in lines}
+    today = datetime.now().date()
+    for medicine_id, quantity in cart.quantities.items():
+        medicine = medicines[medicine_id]
+        if medicine.quantity < quantity:
+            raise CheckoutError(f'Insufficient stock for {medicine.name}')
+        if medicine.exp_date <= today:
+            raise CheckoutError(f'{medicine.name} has expired')
+    return cart
+
+def place_order(customer_id: int, cart, shipping: Dict[str, str],
+                prescription_file_path: Optional[str] = None) -> Order:
+    """
+    Create the order from a LockedCart (or a redeemed checkout Quote), take the
+    stock and remove the ordered cart lines
+    """
+    has_rx_items = cart.requires_prescription
+
+    order = Order(
+        customer_id=customer_id,
+        total_amount=cart.total,
+        status='Pending Review' if has_rx_items else 'Processing',
+        payment_method='Cash on Delivery',
+        shipping_address=shipping['address'],
+        shipping_city=shipping.get('city'),
+        shipping_state=shipping.get('state'),
+        shipping_pincode=shipping.get('pincode'),
+        requires_prescription=has_rx_items,
+        prescription_uploaded=has_rx_items,
+        prescription_file_path=prescription_file_path,
+        prescription_status='Pending' if has_rx_items else None
+    )
+    db.session.add(order)
+    db.session.flush()  # Get order_id
+
+    db.session.execute(insert(OrderItem), [
+        dict(values, order_id=order.order_id) for values in cart.order_items()
+    ])
+
+    try:
+        inventory.decrement_stock(cart.quantities)
+    except inventory.InsufficientStock:
+        raise CheckoutError('Insufficient stock for one or more items', status=409)
+
+    db.session.execute(
+        delete(CartItem)
+        .where(CartItem.customer_id == customer_id, CartItem.cart_item_id.in_(cart.cart_item_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+    db.session.add(OrderStatusHistory(
+        order_id=order.order_id,
+        status=order.status,
+        notes='Order placed by customer'
+    ))
+
+    if has_rx_items:
+        review_queue.enqueue(order.order_id, placed_at=order.order_date)
+    return order
@@ -0,0 +1,132 @@
+"""
+Checkout Quotes - Priced cart snapshots shared by /checkout/validate and /orders/place
+Validation prices the cart once and returns a signed, short-lived quote token
+(HS256 JWT: quote id, customer, cart hash, total). The priced lines are kept in a
+bounded in-process store, so placing the order only has to lock the cart rows,
+check they still hash the same, and take the stock atomically.
+
+A quote is refused once the cart changes or it expires (CHECKOUT_QUOTE_TTL_SECONDS),
+and a quoted medicine that has expired since is refused as at validation. If its
+lines are not in this worker's store (another worker issued it, or it was evicted)
+the order is priced again from the locked cart, provided the cart still matches
+the quote.
+
+Quote tokens are signed with a key derived from SECRET_KEY, so they never verify
+as login (or any other) tokens.
+"""
+
+import hashlib
+import hmac
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Union
+import jwt
+from models import db
+from models.customer import CartItem
+from models.medicine import Medicine
+from services.cache import TTLCache
+from services.checkout import CheckoutError, LockedCart, cart_hash
+
+SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+CHECKOUT_QUOTE_TTL_SECONDS = int(os.environ.get('CHECKOUT_QUOTE_TTL_SECONDS', 900))
+CHECKOUT_QUOTE_STORE_SIZE = int(os.environ.get('CHECKOUT_QUOTE_STORE_SIZE', 10000))
+
+PURPOSE = 'checkout_quote'
+
+_QUOTE_KEY = hmac.new(SECRET_KEY.encode(), b'checkout-quote', hashlib.sha256).hexdigest()
+
+class QuoteError(CheckoutError):
+    """The quote can no longer be used; the customer should review the cart again"""
+
+    def __init__(self, message: str):
+        super().__init__(message, status=409, error='Please review your cart and try again.')
+
+class Quote:
+    """A priced cart; quacks like LockedCart for checkout.place_order"""
+
+    def __init__(self, customer_id: int, cart: LockedCart, ttl: int = CHECKOUT_QUOTE_TTL_SECONDS):
+        self.quote_id = uuid.uuid4().hex
+        self.customer_id = customer_id
+        self.cart_hash = cart.cart_hash
+        self.cart_item_ids = cart.cart_item_ids
+        self.items = cart.order_items()
+        self.total = round(cart.total, 2)
+        self.requires_prescription = cart.requires_prescription
+        self.expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+
+    @property
+    def quantities(self) -> Dict[int, int]:
+        quantities = OrderedDict()
+        for item in self.items:
+            quantities[item['medicine_id']] = quantities.get(item['medicine_id'], 0) + item['quantity']
+        return quantities
+
+    def order_items(self) -> List[Dict]:
+        return [dict(item) for item in self.items]
+
+    def token(self) -> str:
+        return jwt.encode({
+            'quote_id': self.quote_id,
+            'customer_id': self.customer_id,
+            'cart_hash': self.cart_hash,
+            'total': self.total,
+            'purpose': PURPOSE,
+            'exp': self.expires_at
+        }, _QUOTE_KEY, algorithm='HS256')
+
+_store = TTLCache(maxsize=CHECKOUT_QUOTE_STORE_SIZE, ttl=CHECKOUT_QUOTE_TTL_SECONDS)
+
+def issue(customer_id: int, lines: List[tuple]) -> Quote:
+    """Price validated (CartItem, Medicine) lines and remember the quote"""
+    quote = Quote(customer_id, LockedCart(lines))
+    _store.set(quote.quote_id, quote)
+    return quote
+
+def _decode(customer_id: int, token: str) -> Dict:
+    try:
+        claims = jwt.decode(token, _QUOTE_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise QuoteError('Your checkout quote has expired')
+    except jwt.InvalidTokenError:
+        raise QuoteError('Invalid checkout quote')
+    if claims.get('purpose') != PURPOSE or claims.get('customer_id') != customer_id:
+        raise QuoteError('Invalid checkout quote')
+    return claims
+
+def redeem(customer_id: int, token: str, reprice: Callable[[], LockedCart]) -> Union[Quote, LockedCart]:
+    """
+    Check a quote against the customer's cart (locking the cart rows)
+    Returns the stored Quote, or `reprice()` (e.g. checkout.lock_cart) when this
+    worker does not hold it. Raises QuoteError if the cart changed since quoting.
+    """
+    claims = _decode(customer_id, token)
+
+    quote = _store.get(claims['quote_id'])
+    if quote is None:
+        cart = reprice()
+        if cart.cart_hash != claims['cart_hash'] or round(cart.total, 2) != claims['total']:
+            raise QuoteError('Your cart or its prices changed since checkout was reviewed')
+        return cart
+
+    rows = db.session.query(CartItem.cart_item_id, CartItem.medicine_id, CartItem.quantity)\
+        .filter(CartItem.customer_id == customer_id)\
+        .order_by(CartItem.cart_item_id)\
+        .with_for_update()\
+        .all()
+    if cart_hash(rows) != quote.cart_hash:
+        raise QuoteError('Your cart changed since checkout was reviewed')
+
+    # Prices are locked by the quote, expiry is not (the reprice path checks it in lock_cart)
+    expired = db.session.query(Medicine.name)\
+        .filter(Medicine.medicine_id.in_(list(quote.quantities)), Medicine.exp_date <= datetime.now().date())\
+        .first()
+    if expired:
+        raise CheckoutError(f'{expired.name} has expired')
+    return quote
+
+def consume(cart):
+    """Forget a redeemed quote once its order is committed"""
+    if isinstance(cart, Quote):
+        _store.pop(cart.quote_id)
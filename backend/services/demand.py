@@ -0,0 +1,137 @@
+"""
+Demand - Unified per-channel demand across POS sales and online orders
+Backed by the medicine_demand_daily materialized view: one row per
+(day, medicine, channel) built from daily_sales_rollup ('pos') and order items
+of orders that were not cancelled or rejected ('online').
+
+The view is refreshed CONCURRENTLY (readers never block) every
+DEMAND_REFRESH_SECONDS by a background thread started with the app (init_app), or
+on demand with `python maintenance.py refresh-demand`.
+Set DEMAND_REFRESH_EMBEDDED=0 to leave refreshing to the maintenance command.
+"""
+
+import os
+import threading
+from datetime import date
+from typing import List, Optional
+from sqlalchemy import func, text
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql import table, column
+from models import db
+from models.medicine import Medicine
+
+DEMAND_REFRESH_SECONDS = float(os.environ.get('DEMAND_REFRESH_SECONDS', 300))
+DEMAND_REFRESH_EMBEDDED = os.environ.get('DEMAND_REFRESH_EMBEDDED', '1') == '1'
+
+CHANNELS = ('pos', 'online')
+VIEW_NAME = 'medicine_demand_daily'
+
+demand_daily = table(
+    VIEW_NAME,
+    column('day'),
+    column('medicine_id'),
+    column('channel'),
+    column('quantity'),
+    column('revenue')
+)
+
+_CREATE_VIEW = f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS {VIEW_NAME} AS
+SELECT r.day, r.medicine_id, 'pos'::varchar(10) AS channel,
+       r.quantity::bigint AS quantity, r.revenue::numeric(14, 2) AS revenue
+FROM daily_sales_rollup r
+UNION ALL
+SELECT o.order_date::date AS day, oi.medicine_id, 'online'::varchar(10) AS channel,
+       SUM(oi.quantity)::bigint AS quantity, SUM(oi.subtotal)::numeric(14, 2) AS revenue
+FROM order_items oi
+JOIN orders o ON o.order_id = oi.order_id
+WHERE o.status NOT IN ('Cancelled', 'Rejected')
+GROUP BY o.order_date::date, oi.medicine_id
+"""
+
+_CREATE_INDEXES = [
+    # REFRESH ... CONCURRENTLY requires a unique index
+    f'CREATE UNIQUE INDEX IF NOT EXISTS ux_{VIEW_NAME} ON {VIEW_NAME} (day, medicine_id, channel)',
+    f'CREATE INDEX IF NOT EXISTS ix_{VIEW_NAME}_channel_day ON {VIEW_NAME} (channel, day)'
+]
+
+def ensure_view():
+    """Create the materialized view and its indexes if missing (requires daily_sales_rollup)"""
+    db.session.execute(text(_CREATE_VIEW))
+    for statement in _CREATE_INDEXES:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+def refresh(concurrently: bool = True) -> bool:
+    """
+    Refresh the view; returns False if another refresh is already running
+    The advisory lock keeps web workers and the maintenance command from piling up refreshes.
+    """
+    acquired = db.session.execute(
+        text('SELECT pg_try_advisory_xact_lock(hashtext(:key))'), {'key': VIEW_NAME}
+    ).scalar()
+    if not acquired:
+        db.session.rollback()
+        return False
+
+    mode = 'CONCURRENTLY ' if concurrently else ''
+    db.session.execute(text(f'REFRESH MATERIALIZED VIEW {mode}{VIEW_NAME}'))
+    db.session.commit()
+    return True
+
+def top_medicines(limit: int = 10, channel: Optional[str] = None, start: Optional[date] = None,
+                  end: Optional[date] = None, criteria: tuple = ()) -> List[tuple]:
+    """
+    Best selling medicines by quantity over both channels (or one)
+    `criteria` are extra filters on Medicine (stock, product type, ...).
+    Returns rows of (Medicine, quantity, revenue) with the company eager loaded.
+    """
+    totals = db.session.query(
+        demand_daily.c.medicine_id,
+        func.sum(demand_daily.c.quantity).label('quantity'),
+        func.sum(demand_daily.c.revenue).label('revenue')
+    )
+    if channel:
+        totals = totals.filter(demand_daily.c.channel == channel)
+    if start:
+        totals = totals.filter(demand_daily.c.day >= start)
+    if end:
+        totals = totals.filter(demand_daily.c.day <= end)
+    totals = totals.group_by(demand_daily.c.medicine_id).subquery()
+
+    return db.session.query(Medicine, totals.c.quantity, totals.c.revenue)\
+        .join(totals, totals.c.medicine_id == Medicine.medicine_id)\
+        .options(joinedload(Medicine.company))\
+        .filter(*criteria)\
+        .order_by(totals.c.quantity.desc(), Medicine.medicine_id)\
+        .limit(limit).all()
+
+# Background refresher
+
+def _refresh_forever(app, stop: threading.Event):
+    with app.app_context():
+        while not stop.wait(DEMAND_REFRESH_SECONDS):
+            try:
+                refresh()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Demand view refresh error: {e}")
+
+_refresher_stop = None
+_refresher_lock = threading.Lock()
+
+def ensure_refresher(app):
+    """Start the periodic refresh thread once per process (if embedded refreshing is on)"""
+    global _refresher_stop
+    if not DEMAND_REFRESH_EMBEDDED:
+        return
+    with _refresher_lock:
+        if _refresher_stop is None:
+            _refresher_stop = threading.Event()
+            threading.Thread(
+                target=_refresh_forever, args=(app, _refresher_stop), name='demand-refresher', daemon=True
+            ).start()
+
+def init_app(app):
+    """Start the refresher with the app, so every reader of the view (reports, shop, chatbot) sees fresh data"""
+    ensure_refresher(app)
@@ -0,0 +1,256 @@
+"""
+Events - Order event publication for Server-Sent Events streams
+Order changes are collected from the session as they flush and published only
+once the transaction commits (dropped on rollback). Bulk UPDATE paths that bypass
+the unit of work queue their events explicitly with `queue_events`.
+
+Brokers:
+    memory   - in-process pub/sub (default; each worker only sees its own commits)
+    postgres - NOTIFY on commit, one LISTEN connection per worker fans events out
+Configured with EVENT_BROKER, EVENT_QUEUE_SIZE, EVENT_HEARTBEAT_SECONDS and
+EVENT_MAX_SUBSCRIBERS.
+
+Event types: order.created, order.status_changed, order.prescription_reviewed
+"""
+
+import itertools
+import json
+import os
+import queue
+import select
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+from flask import Response
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from models import db
+from models.order import Order
+
+EVENT_BROKER = os.environ.get('EVENT_BROKER', 'memory')
+EVENT_QUEUE_SIZE = int(os.environ.get('EVENT_QUEUE_SIZE', 100))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get('EVENT_HEARTBEAT_SECONDS', 15))
+EVENT_MAX_SUBSCRIBERS = int(os.environ.get('EVENT_MAX_SUBSCRIBERS', 500))
+
+NOTIFY_CHANNEL = 'order_events'
+
+# Sent to a subscriber whose buffer overflowed: it missed events and should refetch
+RESYNC = {'type': 'resync'}
+
+class Subscription:
+    """One stream's bounded event buffer"""
+
+    def __init__(self, predicate: Callable[[Dict], bool], maxsize: int = EVENT_QUEUE_SIZE):
+        self.predicate = predicate
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._overflowed = False
+
+    def offer(self, evt: Dict):
+        if not self.predicate(evt):
+            return
+        try:
+            self._queue.put_nowait(evt)
+        except queue.Full:
+            # Slow consumer: drop its backlog rather than grow without bound
+            self._overflowed = True
+            with self._queue.mutex:
+                self._queue.queue.clear()
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        if self._overflowed:
+            self._overflowed = False
+            return RESYNC
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class TooManySubscribers(Exception):
+    """Raised when a worker already serves EVENT_MAX_SUBSCRIBERS streams"""
+
+class MemoryBroker:
+    """In-process broker: events reach the streams served by this worker"""
+
+    def __init__(self, max_subscribers: int = EVENT_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, predicate: Callable[[Dict], bool]) -> Subscription:
+        subscription = Subscription(predicate)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def dispatch(self, events: Iterable[Dict]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for evt in events:
+            for subscription in subscribers:
+                subscription.offer(evt)
+
+    def publish(self, events: List[Dict]):
+        self.dispatch(events)
+
+class PostgresBroker(MemoryBroker):
+    """
+    Cross-worker broker over PostgreSQL LISTEN/NOTIFY
+    Publishes NOTIFYs on a separate autocommit connection; a listener thread per
+    worker (started with its first subscriber) dispatches to the local streams.
+    """
+
+    def __init__(self, channel: str = NOTIFY_CHANNEL, **kwargs):
+        super().__init__(**kwargs)
+        self.channel = channel
+        self.app = None
+        self._listener = None
+
+    def subscribe(self, predicate: Callable[[Dict], bool]) -> Subscription:
+        subscription = super().subscribe(predicate)
+        with self._lock:
+            if self._listener is None and self.app is not None:
+                self._listener = threading.Thread(target=self._listen, name='order-event-listener', daemon=True)
+                self._listener.start()
+        return subscription
+
+    def publish(self, events: List[Dict]):
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            for evt in events:
+                conn.execute(text('SELECT pg_notify(:channel, :payload)'),
+                             {'channel': self.channel, 'payload': json.dumps(evt)})
+
+    def _listen(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    pooled = db.engine.raw_connection()
+                pooled.detach()  # A LISTENing connection must never go back to the pool
+                conn = getattr(pooled, 'dbapi_connection', None) or pooled.connection
+                conn.autocommit = True
+                try:
+                    conn.cursor().execute(f'LISTEN {self.channel}')
+                    while True:
+                        if select.select([conn], [], [], EVENT_HEARTBEAT_SECONDS) == ([], [], []):
+                            continue
+                        conn.poll()
+                        notifies = list(conn.notifies)
+                        del conn.notifies[:]
+                        self.dispatch([json.loads(n.payload) for n in notifies])
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"Order event listener error: {e}")
+                time.sleep(1)
+
+def _create_broker():
+    if EVENT_BROKER == 'postgres':
+        return PostgresBroker()
+    return MemoryBroker()
+
+broker = _create_broker()
+
+# Collection from the ORM session
+
+_event_ids = itertools.count(1)
+
+def order_event(event_type: str, order_id: int, customer_id: int, status: str,
+                prescription_status: Optional[str] = None) -> Dict:
+    return {
+        'type': event_type,
+        'order_id': order_id,
+        'customer_id': customer_id,
+        'status': status,
+        'prescription_status': prescription_status,
+        'at': datetime.utcnow().isoformat()
+    }
+
+def _pending_events(session) -> list:
+    return session.info.setdefault('order_events', [])
+
+def queue_events(session, events: Iterable[Dict]):
+    """Queue events for publication when `session` commits"""
+    _pending_events(session).extend(events)
+
+def _after_flush(session, flush_context):
+    pending = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            pending.append(order_event('order.created', obj.order_id, obj.customer_id,
+                                       obj.status, obj.prescription_status))
+    for obj in session.dirty:
+        if not isinstance(obj, Order):
+            continue
+        state = inspect(obj)
+        if state.attrs.prescription_status.history.has_changes():
+            event_type = 'order.prescription_reviewed'
+        elif state.attrs.status.history.has_changes():
+            event_type = 'order.status_changed'
+        else:
+            continue
+        pending.append(order_event(event_type, obj.order_id, obj.customer_id,
+                                   obj.status, obj.prescription_status))
+    if pending:
+        queue_events(session, pending)
+
+def _after_commit(session):
+    pending = session.info.pop('order_events', None)
+    if pending:
+        try:
+            broker.publish(pending)
+        except Exception as e:
+            # The commit stands; streams just miss these events
+            print(f"Order event publish error: {e}")
+
+def _after_rollback(session):
+    session.info.pop('order_events', None)
+
+_listeners_registered = False
+
+def init_app(app):
+    """Register the session hooks that publish order events on commit"""
+    global _listeners_registered
+    if isinstance(broker, PostgresBroker) and broker.app is None:
+        broker.app = app
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    _listeners_registered = True
+
+# Server-Sent Events
+
+def _format(evt: Dict) -> str:
+    return f"id: {next(_event_ids)}\nevent: {evt['type']}\ndata: {json.dumps(evt)}\n\n"
+
+def stream(predicate: Callable[[Dict], bool]):
+    """
+    SSE response of the events matching `predicate`, with a heartbeat comment
+    every EVENT_HEARTBEAT_SECONDS so proxies keep the connection open.
+    Raises TooManySubscribers when this worker is at capacity.
+    """
+    subscription = broker.subscribe(predicate)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                evt = subscription.get(timeout=EVENT_HEARTBEAT_SECONDS)
+                if evt is None:
+                    yield ': heartbeat\n\n'
+                else:
+                    yield _format(evt)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
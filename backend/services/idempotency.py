@@ -0,0 +1,165 @@
+"""
+Idempotency - Safe retries for non-idempotent POST endpoints
+A client sends an `Idempotency-Key` header; the first request with a key runs the
+handler and stores its response, later requests with the same key (from the same
+principal) get the stored response back without running the handler again.
+
+    409 - the original request is still being processed
+    422 - the key was reused with a different request body
+
+Keys live for IDEMPOTENCY_KEY_TTL_HOURS (default 24); expired rows are removed in
+bulk by `python maintenance.py purge-idempotency-keys`. A key left 'in_progress' for
+IDEMPOTENCY_IN_PROGRESS_SECONDS (default 600) is taken to belong to a request that
+died, and the next retry runs the handler again. Keep it well above the longest a
+request may run (the worker/request timeout), or a slow request would run twice.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from models import db
+from models.idempotency import IdempotencyKey
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+IDEMPOTENCY_IN_PROGRESS_SECONDS = float(os.environ.get('IDEMPOTENCY_IN_PROGRESS_SECONDS', 600))
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# A key still 'in_progress' after this long belongs to a request that died mid-way
+IN_PROGRESS_TIMEOUT = timedelta(seconds=IDEMPOTENCY_IN_PROGRESS_SECONDS)
+
+def _owner(principal) -> str:
+    """Namespace keys by the authenticated staff user or customer"""
+    if hasattr(principal, 'customer_id'):
+        return f'customer:{principal.customer_id}'
+    return f'user:{principal.user_id}'
+
+def _request_hash() -> str:
+    """Fingerprint of the request, so a reused key with a different body is detected"""
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f'{name}={value}\n'.encode())
+        for name, file in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f'{name}:{file.filename}\n'.encode())
+            for chunk in iter(lambda: file.stream.read(65536), b''):
+                digest.update(chunk)
+            file.stream.seek(0)
+    else:
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+def _claim(scope: str, owner: str, key: str, request_hash: str):
+    """Insert the key as in progress; returns None if we own it, else the existing row"""
+    now = datetime.utcnow()
+    inserted = db.session.execute(
+        insert(IdempotencyKey).values(
+            scope=scope,
+            owner=owner,
+            key=key,
+            request_hash=request_hash,
+            status='in_progress',
+            created_at=now,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+        ).on_conflict_do_nothing(
+            constraint='uq_idempotency_keys_scope_owner_key'
+        ).returning(IdempotencyKey.id)
+    ).scalar()
+    db.session.commit()
+    if inserted:
+        return None
+
+    return db.session.execute(
+        select(IdempotencyKey).filter_by(scope=scope, owner=owner, key=key)
+    ).scalar_one_or_none()
+
+def _release(scope: str, owner: str, key: str, row_id: int = None):
+    """Delete the key; with `row_id`, only if it is still that row (another retry may have re-claimed it)"""
+    query = IdempotencyKey.query.filter_by(scope=scope, owner=owner, key=key)
+    if row_id is not None:
+        query = query.filter_by(id=row_id)
+    query.delete(synchronize_session=False)
+    db.session.commit()
+
+def _is_abandoned(existing: IdempotencyKey) -> bool:
+    now = datetime.utcnow()
+    if existing.expires_at <= now:
+        return True
+    return existing.status == 'in_progress' and existing.created_at <= now - IN_PROGRESS_TIMEOUT
+
+def idempotent(scope: str):
+    """
+    Make a POST handler replay-safe via the Idempotency-Key header
+    Place it under the auth decorator: the authenticated principal (first argument)
+    namespaces the keys. Requests without the header run as before.
+    """
+    def wrapper(f):
+        @wraps(f)
+        def decorated(principal, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return f(principal, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({'message': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+            owner = _owner(principal)
+            request_hash = _request_hash()
+
+            existing = _claim(scope, owner, key, request_hash)
+            if existing is not None and _is_abandoned(existing):
+                _release(scope, owner, key, existing.id)
+                existing = _claim(scope, owner, key, request_hash)
+
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    return jsonify({'message': f'{HEADER} was already used for a different request'}), 422
+                if existing.status == 'in_progress':
+                    response = jsonify({'message': 'A request with this Idempotency-Key is still being processed'})
+                    response.headers['Retry-After'] = '1'
+                    return response, 409
+                response = jsonify(existing.response_body)
+                response.headers[REPLAYED_HEADER] = 'true'
+                return response, existing.response_status
+
+            try:
+                rv = f(principal, *args, **kwargs)
+            except Exception:
+                db.session.rollback()
+                _release(scope, owner, key)
+                raise
+
+            response, status = rv if isinstance(rv, tuple) else (rv, 200)
+            if status >= 500:
+                # Let the client retry server errors for real
+                _release(scope, owner, key)
+            else:
+                IdempotencyKey.query.filter_by(scope=scope, owner=owner, key=key).update({
+                    'status': 'completed',
+                    'response_status': status,
+                    'response_body': response.get_json()
+                }, synchronize_session=False)
+                db.session.commit()
+            return rv
+        return decorated
+    return wrapper
+
+def purge_expired(batch_size: int = 10000) -> int:
+    """Delete expired keys in batches (keeps each transaction short); returns rows deleted"""
+    total = 0
+    while True:
+        expired = db.session.query(IdempotencyKey.id).filter(
+            IdempotencyKey.expires_at < datetime.utcnow()
+        ).limit(batch_size).subquery()
+        deleted = IdempotencyKey.query.filter(
+            IdempotencyKey.id.in_(select(expired.c.id))
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
@@ -0,0 +1,79 @@
+"""
+Inventory - Set-based stock movements
+Each call is a single UPDATE over every affected medicine, so stock changes stay
+atomic under concurrent checkouts and never round-trip per line. Restocks first lock
+their medicine rows in medicine_id order, the order checkout.lock_cart uses, because
+an UPDATE locks rows in whatever order the plan visits them and could deadlock.
+"""
+
+from typing import Dict, List
+from sqlalchemy import case, func, select, update
+from models import db
+from models.medicine import Medicine
+from models.order import OrderItem
+
+class InsufficientStock(Exception):
+    """Raised when a decrement would take any medicine below zero"""
+
+    def __init__(self, medicine_ids: List[int]):
+        super().__init__(f'Insufficient stock for medicine(s): {", ".join(map(str, medicine_ids))}')
+        self.medicine_ids = medicine_ids
+
+def _lock_medicines(medicine_ids):
+    """Row-lock medicines in id order; `medicine_ids` is a list or a subquery of ids"""
+    db.session.execute(
+        select(Medicine.medicine_id)
+        .where(Medicine.medicine_id.in_(medicine_ids))
+        .order_by(Medicine.medicine_id)
+        .with_for_update()
+    )
+
+def decrement_stock(quantities: Dict[int, int]):
+    """
+    Take `quantities` (medicine_id -> units) off stock in one statement
+    The `quantity >= requested` guard makes oversell impossible even without row locks;
+    if any row fails it InsufficientStock is raised and the transaction must be rolled back.
+    """
+    if not quantities:
+        return
+    requested = case(quantities, value=Medicine.medicine_id)
+    result = db.session.execute(
+        update(Medicine)
+        .where(Medicine.medicine_id.in_(list(quantities)), Medicine.quantity >= requested)
+        .values(quantity=Medicine.quantity - requested)
+        .returning(Medicine.medicine_id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row.medicine_id for row in result}
+    if len(updated) != len(quantities):
+        # The rows that did pass are already decremented; the caller must roll back
+        raise InsufficientStock(sorted(set(quantities) - updated))
+
+def restock(quantities: Dict[int, int]):
+    """Put `quantities` (medicine_id -> units) back on stock in one statement"""
+    if not quantities:
+        return
+    returned = case(quantities, value=Medicine.medicine_id)
+    _lock_medicines(list(quantities))
+    db.session.execute(
+        update(Medicine)
+        .where(Medicine.medicine_id.in_(list(quantities)))
+        .values(quantity=Medicine.quantity + returned)
+        .execution_options(synchronize_session=False)
+    )
+
+def restock_orders(order_ids: List[int]):
+    """Return every item of the given orders to stock in one UPDATE ... FROM"""
+    if not order_ids:
+        return
+    returned = select(
+        OrderItem.medicine_id,
+        func.sum(OrderItem.quantity).label('quantity')
+    ).where(OrderItem.order_id.in_(order_ids)).group_by(OrderItem.medicine_id).subquery()
+    _lock_medicines(select(returned.c.medicine_id))
+    db.session.execute(
+        update(Medicine)
+        .where(Medicine.medicine_id == returned.c.medicine_id)
+        .values(quantity=Medicine.quantity + returned.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,124 @@
+"""
+Order Workflow - Online order state machine
+Declares which status changes are allowed and what they imply, and applies them
+set-based: one locking read, one UPDATE, one restock statement and one batched
+history INSERT, whether for one order or hundreds. The caller commits.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, update
+from models import db
+from models.order import Order, OrderStatusHistory
+from services import events, inventory, review_queue
+
+STATUSES = ('Pending Review', 'Approved', 'Processing', 'Out for Delivery', 'Delivered', 'Rejected', 'Cancelled')
+
+TRANSITIONS = {
+    'Pending Review': {'Approved', 'Processing', 'Rejected', 'Cancelled'},
+    'Approved': {'Processing', 'Rejected', 'Cancelled'},
+    'Processing': {'Out for Delivery', 'Cancelled'},
+    'Out for Delivery': {'Delivered', 'Processing'},  # Back to Processing after a failed delivery
+    'Delivered': set(),
+    'Rejected': set(),
+    'Cancelled': set()
+}
+
+# Entering these statuses returns the order's items to stock
+RESTOCK_STATUSES = {'Rejected', 'Cancelled'}
+
+# Allowed while a prescription is still awaiting review
+PRESCRIPTION_PENDING_STATUSES = {'Rejected', 'Cancelled'}
+
+class TransitionError(Exception):
+    """A single-order transition that was not allowed"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def check_transition(current: str, new: str, requires_prescription: bool,
+                     prescription_status: Optional[str]) -> Optional[str]:
+    """Return why `current -> new` is not allowed, or None if it is"""
+    if new not in TRANSITIONS:
+        return f'Invalid status. Must be one of: {", ".join(STATUSES)}'
+    if new == current:
+        return f'Order is already {current}'
+    if new not in TRANSITIONS.get(current, set()):
+        return f'Cannot change status from {current} to {new}'
+    if requires_prescription and prescription_status == 'Pending' and new not in PRESCRIPTION_PENDING_STATUSES:
+        return 'Cannot update status until prescription is reviewed'
+    return None
+
+def transition_orders(order_ids: Iterable[int], new_status: str, changed_by: Optional[int] = None,
+                      notes: Optional[str] = None, values: Optional[Dict] = None) -> Tuple[List[int], Dict[int, str]]:
+    """
+    Move orders to `new_status`, skipping those the state machine rejects
+    `values` are extra Order columns set in the same UPDATE (e.g. prescription review
+    fields); a 'prescription_status' in it is taken into account by the prescription guard.
+    Returns (applied order ids, {skipped order id: reason}).
+    """
+    order_ids = sorted(set(order_ids))
+    values = values or {}
+
+    # Lock in id order so concurrent bulk updates cannot deadlock
+    rows = db.session.query(
+        Order.order_id, Order.customer_id, Order.status, Order.requires_prescription, Order.prescription_status
+    ).filter(Order.order_id.in_(order_ids)).order_by(Order.order_id).with_for_update().all()
+
+    found = {row.order_id: row for row in rows}
+    applied, skipped, history, order_events = [], {}, [], []
+    now = datetime.utcnow()
+
+    for order_id in order_ids:
+        row = found.get(order_id)
+        if row is None:
+            skipped[order_id] = 'Order not found'
+            continue
+        reason = check_transition(
+            row.status, new_status, row.requires_prescription,
+            values.get('prescription_status', row.prescription_status)
+        )
+        if reason:
+            skipped[order_id] = reason
+            continue
+        applied.append(order_id)
+        history.append({
+            'order_id': order_id,
+            'status': new_status,
+            'changed_by': changed_by,
+            'changed_at': now,
+            'notes': notes or f'Status changed from {row.status} to {new_status}'
+        })
+        order_events.append(events.order_event(
+            'order.prescription_reviewed' if 'prescription_status' in values else 'order.status_changed',
+            order_id, row.customer_id, new_status,
+            values.get('prescription_status', row.prescription_status)
+        ))
+
+    if applied:
+        db.session.execute(
+            update(Order)
+            .where(Order.order_id.in_(applied))
+            .values(status=new_status, updated_at=now, **values)
+            .execution_options(synchronize_session=False)
+        )
+        if new_status in RESTOCK_STATUSES:
+            inventory.restock_orders(applied)
+        if 'prescription_status' in values or new_status in RESTOCK_STATUSES:
+            # Reviewed, or closed before review
+            review_queue.dequeue(applied)
+        db.session.execute(insert(OrderStatusHistory), history)
+        # The bulk UPDATE bypasses the session's change tracking
+        events.queue_events(db.session, order_events)
+
+    return applied, skipped
+
+def transition(order_id: int, new_status: str, changed_by: Optional[int] = None,
+               notes: Optional[str] = None, values: Optional[Dict] = None):
+    """Move one order to `new_status`; raises TransitionError if not found or not allowed"""
+    applied, skipped = transition_orders([order_id], new_status, changed_by, notes, values)
+    if not applied:
+        reason = skipped[order_id]
+        raise TransitionError(reason, status=404 if reason == 'Order not found' else 400)
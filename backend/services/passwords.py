@@ -0,0 +1,104 @@
+"""
+Passwords - Hashing and verification off the request thread
+Hashes and checks run on a small bounded thread pool (bcrypt and hashlib release
+the GIL while they work), so a burst of logins uses at most PASSWORD_HASH_WORKERS
+cores and the worker's other requests keep being served. At most PASSWORD_MAX_PENDING
+operations may be running or queued; beyond that PasswordServiceBusy is raised and
+the login endpoints answer 503 with Retry-After instead of piling up.
+
+New hashes are bcrypt with PASSWORD_BCRYPT_ROUNDS. Existing werkzeug hashes
+(pbkdf2:/scrypt:, the old customer format) still verify, and `verify_and_upgrade`
+rehashes on a successful login when the scheme or cost differs from the current
+settings, so accounts migrate as people sign in.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from werkzeug.security import check_password_hash
+
+PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_MAX_PENDING = int(os.environ.get('PASSWORD_MAX_PENDING', 32))
+
+RETRY_AFTER_SECONDS = 1
+
+class PasswordServiceBusy(Exception):
+    """Too many hashing operations in flight; the caller should retry shortly"""
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_MAX_PENDING)
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password')
+        return _executor
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise PasswordServiceBusy('Password service is busy')
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+def _is_bcrypt(stored: str) -> bool:
+    return stored.startswith(('$2a$', '$2b$', '$2y$'))
+
+def _bcrypt_rounds(stored: str) -> int:
+    try:
+        return int(stored.split('$')[2])
+    except (IndexError, ValueError):
+        return 0
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(PASSWORD_BCRYPT_ROUNDS)).decode('utf-8')
+
+def _verify(password: str, stored: str) -> bool:
+    if _is_bcrypt(stored):
+        return bcrypt.checkpw(password.encode('utf-8'), stored.encode('utf-8'))
+    return check_password_hash(stored, password)
+
+# Checked when the account does not exist, so unknown emails cost the same as wrong passwords
+_dummy_hash = None
+
+def _get_dummy_hash() -> str:
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = _hash('not-a-real-password')
+    return _dummy_hash
+
+def hash_password(password: str) -> str:
+    """bcrypt hash of `password` at the configured cost"""
+    return _run(_hash, password)
+
+def verify(password: str, stored: str = None) -> bool:
+    """Check `password` against a bcrypt or werkzeug hash; `stored=None` always fails"""
+    if stored is None:
+        _run(_verify, password, _get_dummy_hash())
+        return False
+    try:
+        return _run(_verify, password, stored)
+    except ValueError:
+        # Malformed or unsupported hash
+        return False
+
+def needs_rehash(stored: str) -> bool:
+    return not _is_bcrypt(stored) or _bcrypt_rounds(stored) != PASSWORD_BCRYPT_ROUNDS
+
+def verify_and_upgrade(account, password: str) -> bool:
+    """
+    Verify `password` for a User or Customer (None for an unknown account)
+    On success, replaces an outdated hash on the row; the caller commits.
+    """
+    if account is None:
+        return verify(password, None)
+    if not verify(password, account.password_hash):
+        return False
+    if needs_rehash(account.password_hash):
+        account.password_hash = hash_password(password)
+    return True
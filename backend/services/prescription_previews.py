@@ -0,0 +1,201 @@
+"""
+Prescription Previews - Compressed previews and thumbnails for prescription review
+Each stored prescription gets two JPEG renditions next to the original:
+
+    <sha256>.preview.jpg    - up to PREVIEW_MAX_EDGE px, for the review screen
+    <sha256>.thumbnail.jpg  - up to THUMBNAIL_MAX_EDGE px, for queues and lists
+
+PDFs are rendered from their first page. Rendering runs in a pool of worker
+processes (PREVIEW_WORKERS) so decoding large phone photos never blocks a request;
+uploads are scheduled after checkout and anything missing is rendered on first view.
+Since originals are content-addressed, renditions never go stale.
+
+Images are loaded by <img> tags, which cannot send an Authorization header, so the
+API hands out signed preview URLs instead of putting the access token in the query
+string. A URL grants one rendition of one order until its expiry. Expiries are
+rounded to PREVIEW_URL_SECONDS windows, so the URL (and the browser's cached copy)
+stays the same across access-token refreshes.
+
+Needs Pillow (and PyMuPDF for PDFs); without them previews fall back to the original.
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional
+from services import prescription_storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: previews are skipped without Pillow
+    Image = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # Optional: PDF previews are skipped without PyMuPDF
+    fitz = None
+
+PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', 2))
+PREVIEW_MAX_EDGE = int(os.environ.get('PREVIEW_MAX_EDGE', 1600))
+THUMBNAIL_MAX_EDGE = int(os.environ.get('THUMBNAIL_MAX_EDGE', 320))
+PREVIEW_JPEG_QUALITY = int(os.environ.get('PREVIEW_JPEG_QUALITY', 80))
+PREVIEW_RENDER_TIMEOUT = float(os.environ.get('PREVIEW_RENDER_TIMEOUT', 10))
+PREVIEW_URL_SECONDS = int(os.environ.get('PREVIEW_URL_SECONDS', 3600))
+SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+
+# Separate key from the JWT signing key, so a preview signature is useless as anything else
+_URL_KEY = hmac.new(SECRET_KEY.encode(), b'prescription-preview-url', hashlib.sha256).digest()
+
+# Rendition name -> longest edge in pixels
+VARIANTS = {
+    'preview': PREVIEW_MAX_EDGE,
+    'thumbnail': THUMBNAIL_MAX_EDGE
+}
+
+# Large enough for a legible A4 page at PREVIEW_MAX_EDGE
+PDF_RENDER_DPI = 150
+
+def can_render(stored_path: str) -> bool:
+    extension = prescription_storage.extension_of(stored_path)
+    if extension == 'pdf':
+        return Image is not None and fitz is not None
+    return Image is not None
+
+def variant_path(stored_path: str, variant: str) -> str:
+    """Relative path of a rendition, next to its original"""
+    base = stored_path.rsplit('.', 1)[0]
+    return f'{base}.{variant}.jpg'
+
+def _missing_variants(stored_path: str) -> List[str]:
+    return [
+        variant for variant in VARIANTS
+        if not os.path.exists(prescription_storage.resolve_path(variant_path(stored_path, variant)))
+    ]
+
+# Signed URLs
+
+def _signature(order_id: int, variant: str, expires: int) -> str:
+    message = f'{order_id}:{variant}:{expires}'.encode()
+    return hmac.new(_URL_KEY, message, hashlib.sha256).hexdigest()
+
+def signed_url(order_id: int, variant: str = 'preview') -> str:
+    """API path of a rendition, valid for between one and two PREVIEW_URL_SECONDS windows"""
+    expires = (int(time.time()) // PREVIEW_URL_SECONDS + 2) * PREVIEW_URL_SECONDS
+    signature = _signature(order_id, variant, expires)
+    return f'/api/staff/online-orders/{order_id}/prescription/preview?size={variant}&expires={expires}&sig={signature}'
+
+def verify_signature(order_id: int, variant: str, expires: Optional[int], signature: Optional[str]) -> bool:
+    if not expires or not signature or expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(order_id, variant, expires), signature)
+
+# Worker process side
+
+def _open_first_page(source: str):
+    if source.lower().endswith('.pdf'):
+        with fitz.open(source) as document:
+            pixmap = document[0].get_pixmap(dpi=PDF_RENDER_DPI)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+    image = Image.open(source)
+    # Phone photos are usually stored sideways with an EXIF rotation
+    return ImageOps.exif_transpose(image)
+
+def render(source: str, targets: Dict[str, str]) -> List[str]:
+    """Write each {variant: absolute path} rendition of `source`; returns the paths written"""
+    image = _open_first_page(source).convert('RGB')
+    written = []
+    # Largest first, so each smaller rendition is resampled from an already reduced image
+    for variant in sorted(targets, key=lambda v: VARIANTS[v], reverse=True):
+        image.thumbnail((VARIANTS[variant], VARIANTS[variant]))
+        final_path = targets[variant]
+        tmp_path = f'{final_path}.{os.getpid()}.part'
+        try:
+            image.save(tmp_path, 'JPEG', quality=PREVIEW_JPEG_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp_path, final_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        written.append(final_path)
+    return written
+
+# Web process side
+
+_pool = None
+_pending = {}
+_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PREVIEW_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _pool
+
+def _submit(fn, *args) -> Future:
+    """Submit to the pool, replacing it once if a dead worker (e.g. OOM-killed) has broken it"""
+    global _pool
+    try:
+        return _get_pool().submit(fn, *args)
+    except BrokenProcessPool:
+        _pool.shutdown(wait=False)
+        _pool = None
+        return _get_pool().submit(fn, *args)
+
+def schedule(stored_path: Optional[str]):
+    """
+    Queue rendering of a prescription's missing renditions
+    Returns the Future (shared by concurrent callers), or None if there is nothing to do.
+    """
+    if not stored_path or not can_render(stored_path):
+        return None
+    with _lock:
+        future = _pending.get(stored_path)
+        if future is not None:
+            return future
+        missing = _missing_variants(stored_path)
+        if not missing:
+            return None
+        targets = {
+            variant: prescription_storage.resolve_path(variant_path(stored_path, variant))
+            for variant in missing
+        }
+        future = _submit(render, prescription_storage.resolve_path(stored_path), targets)
+        _pending[stored_path] = future
+
+    def _done(f):
+        with _lock:
+            _pending.pop(stored_path, None)
+        if f.exception() is not None:
+            print(f"Prescription preview error for {stored_path}: {f.exception()}")
+
+    future.add_done_callback(_done)
+    return future
+
+def schedule_many(stored_paths: Iterable[Optional[str]]) -> int:
+    """Queue rendering for several prescriptions; returns how many were queued"""
+    return sum(1 for stored_path in set(stored_paths) if schedule(stored_path) is not None)
+
+def get_variant(stored_path: str, variant: str, timeout: float = PREVIEW_RENDER_TIMEOUT) -> Optional[str]:
+    """
+    Absolute path of a rendition, rendering it first if needed
+    Returns None when it cannot be produced in time (or at all); callers should
+    then serve the original.
+    """
+    path = prescription_storage.resolve_path(variant_path(stored_path, variant))
+    if os.path.exists(path):
+        return path
+    future = schedule(stored_path)
+    if future is None:
+        return path if os.path.exists(path) else None
+    try:
+        future.result(timeout=timeout)
+    except Exception:  # Timed out or failed to render (logged by the done callback)
+        return None
+    return path if os.path.exists(path) else None
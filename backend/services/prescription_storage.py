@@ -0,0 +1,211 @@
+"""
+Prescription Storage - Content-addressed, sharded file store for prescription uploads
+Uploads are streamed to a temp file in chunks while being hashed (SHA-256), then
+moved to uploads/prescriptions/<aa>/<bb>/<sha256>.<ext>. Identical files are
+stored once. Files larger than PRESCRIPTION_MAX_BYTES (default 5 MB) are rejected
+without ever being held in memory; MAX_REQUEST_BYTES caps the whole request body
+(app.config['MAX_CONTENT_LENGTH']) so oversized uploads are refused before werkzeug
+spools them.
+
+Stored files are shared by every order with the same content, so the request path
+never deletes them: a file left behind by an order that was not placed is removed
+by `python maintenance.py purge-orphan-prescriptions` once no order references it
+and nothing has stored it for PRESCRIPTION_ORPHAN_GRACE_HOURS.
+
+Stored paths stay relative to the backend directory ('uploads/prescriptions/...'),
+so they are served by the existing /uploads/prescriptions/<path> route; flat
+legacy paths keep working through `resolve_path`.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from typing import NamedTuple, Tuple
+from models import db
+from models.order import Order
+
+PRESCRIPTION_MAX_BYTES = int(os.environ.get('PRESCRIPTION_MAX_BYTES', 5 * 1024 * 1024))
+PRESCRIPTION_ORPHAN_GRACE_HOURS = float(os.environ.get('PRESCRIPTION_ORPHAN_GRACE_HOURS', 24))
+
+# Request body limit: one prescription plus the order's form fields
+MAX_REQUEST_BYTES = PRESCRIPTION_MAX_BYTES + 1024 * 1024
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
+CHUNK_SIZE = 64 * 1024
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RELATIVE_ROOT = 'uploads/prescriptions'
+STORAGE_ROOT = os.path.join(BACKEND_DIR, 'uploads', 'prescriptions')
+TMP_DIR = os.path.join(STORAGE_ROOT, '.tmp')
+
+class StorageError(Exception):
+    """An upload that cannot be stored; `message` is safe to show the customer"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+class StoredFile(NamedTuple):
+    path: str  # Relative path saved on the order
+    sha256: str
+    size: int
+    created: bool  # False when identical content was already stored
+
+def extension_of(filename: str) -> str:
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+def relative_path_for(digest: str, extension: str) -> str:
+    return f'{RELATIVE_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}.{extension}'
+
+def resolve_path(stored_path: str) -> str:
+    """Absolute filesystem path for a stored (sharded or legacy flat) relative path"""
+    path = os.path.normpath(os.path.join(BACKEND_DIR, stored_path))
+    if not path.startswith(STORAGE_ROOT + os.sep):
+        raise StorageError('Invalid prescription path')
+    return path
+
+def store_stream(stream, extension: str) -> StoredFile:
+    """Hash and store a binary stream under its content address"""
+    os.makedirs(TMP_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > PRESCRIPTION_MAX_BYTES:
+                    raise StorageError(
+                        f'Prescription file too large (max {PRESCRIPTION_MAX_BYTES // (1024 * 1024)} MB)', status=413
+                    )
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        if size == 0:
+            raise StorageError('Prescription file is empty')
+
+        sha256 = digest.hexdigest()
+        relative_path = relative_path_for(sha256, extension)
+        final_path = resolve_path(relative_path)
+        if os.path.exists(final_path):
+            # Fresh mtime: an order may be about to reference it, so the orphan sweep must wait
+            os.utime(final_path)
+            return StoredFile(relative_path, sha256, size, created=False)
+
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+        return StoredFile(relative_path, sha256, size, created=True)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def save_upload(file) -> StoredFile:
+    """Validate and store a werkzeug FileStorage"""
+    extension = extension_of(file.filename or '')
+    if extension not in ALLOWED_EXTENSIONS:
+        raise StorageError('Invalid file type. Allowed: PNG, JPG, JPEG, PDF')
+    # Normalise so the same content always lands on the same address
+    if extension == 'jpeg':
+        extension = 'jpg'
+    return store_stream(file.stream, extension)
+
+def purge_orphans(grace_hours: float = PRESCRIPTION_ORPHAN_GRACE_HOURS, dry_run: bool = False) -> int:
+    """
+    Remove stored files (and their renditions) that no order references
+    Files stored or deduplicated within `grace_hours` are kept: their order may not
+    have committed yet. Returns the number of files removed (or that would be).
+    """
+    cutoff = time.time() - grace_hours * 3600
+    removed = 0
+    for directory, subdirectories, filenames in os.walk(STORAGE_ROOT):
+        if directory == STORAGE_ROOT:
+            subdirectories[:] = [name for name in subdirectories if name != os.path.basename(TMP_DIR)]
+            continue  # Flat legacy uploads are handled by migrate_legacy
+        relative_dir = f'{RELATIVE_ROOT}/{os.path.relpath(directory, STORAGE_ROOT).replace(os.sep, "/")}'
+        originals = {}  # Relative path -> digest
+        for filename in filenames:
+            digest, _, extension = filename.partition('.')
+            if extension in ALLOWED_EXTENSIONS:
+                originals[f'{relative_dir}/{filename}'] = digest
+        stale = [path for path in originals if os.path.getmtime(resolve_path(path)) < cutoff]
+        if not stale:
+            continue
+        referenced = {path for path, in db.session.query(Order.prescription_file_path)
+                      .filter(Order.prescription_file_path.in_(stale)).distinct()}
+        for path in stale:
+            absolute = resolve_path(path)
+            # Re-check: a concurrent upload of the same content refreshes the mtime
+            if path in referenced or not os.path.exists(absolute) or os.path.getmtime(absolute) >= cutoff:
+                continue
+            removed += 1
+            if dry_run:
+                continue
+            os.remove(absolute)
+            # Renditions are <digest>.<variant>.jpg next to the original
+            for filename in filenames:
+                if filename.startswith(originals[path] + '.') and filename.count('.') == 2 and filename.endswith('.jpg'):
+                    rendition = os.path.join(directory, filename)
+                    if os.path.exists(rendition):
+                        os.remove(rendition)
+    return removed
+
+def is_legacy_path(stored_path: str) -> bool:
+    """True for flat pre-sharding paths like 'uploads/prescriptions/12_20240101_rx.pdf'"""
+    return stored_path.count('/') == RELATIVE_ROOT.count('/') + 1
+
+def migrate_legacy(batch_size: int = 500, dry_run: bool = False) -> Tuple[int, int]:
+    """
+    Move flat legacy uploads into the content-addressed layout
+    Orders are repointed and committed in batches; an old file is removed once no
+    order references it. Returns (orders migrated, orders skipped because their file is missing or invalid).
+    """
+    migrated = skipped = 0
+    last_id = 0
+    while True:
+        batch = db.session.query(Order.order_id, Order.prescription_file_path).filter(
+            Order.order_id > last_id,
+            Order.prescription_file_path.isnot(None)
+        ).order_by(Order.order_id).limit(batch_size).all()
+        if not batch:
+            return migrated, skipped
+        last_id = batch[-1].order_id
+
+        moved = {}
+        for order_id, stored_path in batch:
+            if not is_legacy_path(stored_path):
+                continue
+            try:
+                old_path = resolve_path(stored_path)
+            except StorageError:
+                skipped += 1
+                continue
+            if stored_path not in moved:
+                if not os.path.exists(old_path):
+                    skipped += 1
+                    continue
+                if dry_run:
+                    moved[stored_path] = None
+                else:
+                    try:
+                        with open(old_path, 'rb') as f:
+                            moved[stored_path] = store_stream(f, extension_of(stored_path).replace('jpeg', 'jpg')).path
+                    except StorageError:
+                        # Empty or oversized legacy upload: leave it where it is
+                        skipped += 1
+                        continue
+            if not dry_run:
+                db.session.query(Order).filter_by(order_id=order_id).update(
+                    {'prescription_file_path': moved[stored_path]}, synchronize_session=False
+                )
+            migrated += 1
+
+        if dry_run:
+            continue
+        db.session.commit()
+        for stored_path in moved:
+            still_referenced = db.session.query(Order.order_id).filter_by(prescription_file_path=stored_path).first()
+            if not still_referenced:
+                os.remove(resolve_path(stored_path))
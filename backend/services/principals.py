@@ -0,0 +1,178 @@
+"""
+Principals - Cached identity for authenticated requests
+A verified token resolves to a lightweight principal (id, username/email, role name,
+active flag) cached per (subject, token iat) for PRINCIPAL_CACHE_TTL seconds, so the
+auth decorators and role checks cost no queries on a warm cache. Any other attribute
+(name, address, created_at, set_password, ...) loads the full row on first use, once
+per request, and writes go to that row as before.
+
+Entries are dropped when a users, customers or roles row commits, through the same
+session hooks the report cache uses. The cache is per process: another worker picks
+a change up within PRINCIPAL_CACHE_TTL. With PRINCIPAL_TRUST_TOKEN_CLAIMS=1 a staff
+token's embedded role claim is used on a cache miss instead of querying.
+"""
+
+import os
+import threading
+from typing import Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models.user import User, Role
+from models.customer import Customer
+from services.cache import TTLCache
+
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', 30))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+PRINCIPAL_TRUST_TOKEN_CLAIMS = os.environ.get('PRINCIPAL_TRUST_TOKEN_CLAIMS', '0') == '1'
+
+class _Principal:
+    """Identity fields up front; everything else is read from (or written to) the model row"""
+    model = None
+    __slots__ = ('_id', '_identity', 'role_name', 'is_active', '_row')
+
+    def __init__(self, subject_id: int, identity: str, role_name: Optional[str], is_active: bool):
+        object.__setattr__(self, '_id', subject_id)
+        object.__setattr__(self, '_identity', identity)
+        object.__setattr__(self, 'role_name', role_name)
+        object.__setattr__(self, 'is_active', is_active)
+        object.__setattr__(self, '_row', None)
+
+    @property
+    def row(self):
+        """The model row, loaded on first use"""
+        if self._row is None:
+            object.__setattr__(self, '_row', self.model.query.get(self._id))
+        return self._row
+
+    def __getattr__(self, name):
+        # Only delegate names the model defines, so hasattr() probes stay query-free
+        if name.startswith('_') or not hasattr(self.model, name):
+            raise AttributeError(name)
+        return getattr(self.row, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.row, name, value)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self._id}>'
+
+class UserPrincipal(_Principal):
+    model = User
+    __slots__ = ()
+
+    @property
+    def user_id(self) -> int:
+        return self._id
+
+    @property
+    def username(self) -> str:
+        return self._identity
+
+class CustomerPrincipal(_Principal):
+    model = Customer
+    __slots__ = ()
+
+    @property
+    def customer_id(self) -> int:
+        return self._id
+
+    @property
+    def email(self) -> str:
+        return self._identity
+
+# (kind, subject id, iat) -> (generation, (identity, role_name, is_active))
+_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+# Bumped on invalidation; (kind, id) for one subject, (kind, None) for all of a kind
+_generations = {}
+_generations_lock = threading.Lock()
+
+def _generation(kind: str, subject_id: int) -> Tuple[int, int]:
+    with _generations_lock:
+        return _generations.get((kind, subject_id), 0), _generations.get((kind, None), 0)
+
+def invalidate(kind: str, subject_id: Optional[int] = None):
+    """Forget cached principals for one subject, or every subject of `kind` ('user'/'customer')"""
+    with _generations_lock:
+        _generations[(kind, subject_id)] = _generations.get((kind, subject_id), 0) + 1
+
+def _cached(kind: str, subject_id: int, iat: int, load):
+    key = (kind, subject_id, iat)
+    generation = _generation(kind, subject_id)
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    fields = load()
+    if fields is not None:
+        _cache.set(key, (generation, fields))
+    return fields
+
+def user(claims: dict) -> Optional[UserPrincipal]:
+    """Principal for a decoded staff token, or None if the user no longer exists"""
+    user_id = claims['user_id']
+
+    def load():
+        if PRINCIPAL_TRUST_TOKEN_CLAIMS and claims.get('role') and claims.get('username'):
+            return claims['username'], claims['role'], True
+        row = User.query.with_entities(User.username, Role.role_name)\
+            .join(Role, Role.role_id == User.role_id)\
+            .filter(User.user_id == user_id).first()
+        return (row.username, row.role_name, True) if row else None
+
+    fields = _cached('user', user_id, claims.get('iat', 0), load)
+    return UserPrincipal(user_id, *fields) if fields else None
+
+def customer(claims: dict) -> Optional[CustomerPrincipal]:
+    """Principal for a decoded customer token, or None if the customer no longer exists"""
+    customer_id = claims['customer_id']
+
+    def load():
+        row = Customer.query.with_entities(Customer.email, Customer.is_active)\
+            .filter(Customer.customer_id == customer_id).first()
+        return (row.email, None, bool(row.is_active)) if row else None
+
+    fields = _cached('customer', customer_id, claims.get('iat', 0), load)
+    return CustomerPrincipal(customer_id, *fields) if fields else None
+
+# Invalidation hooks
+
+def _pending(session) -> set:
+    return session.info.setdefault('principal_invalidations', set())
+
+def _after_flush(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            _pending(session).add(('user', obj.user_id))
+        elif isinstance(obj, Customer):
+            _pending(session).add(('customer', obj.customer_id))
+        elif isinstance(obj, Role):
+            _pending(session).add(('user', None))
+
+_BULK_KINDS = {'users': 'user', 'customers': 'customer', 'roles': 'user'}
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk UPDATE/DELETE bypass the unit of work; drop every principal of that kind
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.bind_mapper, 'local_table', None)
+        kind = _BULK_KINDS.get(getattr(table, 'name', None))
+        if kind:
+            _pending(orm_execute_state.session).add((kind, None))
+
+def _after_commit(session):
+    for kind, subject_id in session.info.pop('principal_invalidations', ()):
+        invalidate(kind, subject_id)
+
+def _after_rollback(session):
+    session.info.pop('principal_invalidations', None)
+
+_listeners_registered = False
+
+def init_app(app):
+    """Register the commit hooks that invalidate cached principals"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'do_orm_execute', _do_orm_execute)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    _listeners_registered = True
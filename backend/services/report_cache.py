@@ -0,0 +1,293 @@
+"""
+Report Cache - Short-TTL result cache for report endpoints
+Entries are keyed by (endpoint, query params), served stale while one caller
+recomputes, and invalidated by tags when Sale/Purchase/Medicine/Order rows commit.
+
+Backends:
+    memory - in-process LRU (default, one cache per worker)
+    shared - SQLite file shared by all workers on the host
+Configured with REPORT_CACHE_BACKEND, REPORT_CACHE_PATH, REPORT_CACHE_TTL,
+REPORT_CACHE_STALE_TTL and REPORT_CACHE_MAXSIZE.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional
+from urllib.parse import urlencode
+from flask import request, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from services.cache import TTLCache
+
+REPORT_CACHE_BACKEND = os.environ.get('REPORT_CACHE_BACKEND', 'memory')
+REPORT_CACHE_PATH = os.environ.get('REPORT_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'medi_flow_report_cache.db'))
+REPORT_CACHE_TTL = float(os.environ.get('REPORT_CACHE_TTL', 30))
+REPORT_CACHE_STALE_TTL = float(os.environ.get('REPORT_CACHE_STALE_TTL', 300))
+REPORT_CACHE_MAXSIZE = int(os.environ.get('REPORT_CACHE_MAXSIZE', 512))
+
+# How long a recompute may hold the refresh lock before another caller takes over
+REFRESH_LOCK_TTL = 30.0
+
+class MemoryBackend:
+    """In-process LRU backend"""
+
+    def __init__(self, maxsize: int = REPORT_CACHE_MAXSIZE):
+        self._entries = TTLCache(maxsize=maxsize)
+        self._locks = TTLCache(maxsize=maxsize)
+        self._tags = {}
+        self._tags_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._entries.get(key)
+
+    def set(self, key: str, entry: Dict, ttl: float):
+        self._entries.set(key, entry, ttl)
+
+    def try_lock(self, key: str, ttl: float) -> bool:
+        return self._locks.add(key, True, ttl)
+
+    def unlock(self, key: str):
+        self._locks.pop(key)
+
+    def tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        with self._tags_lock:
+            return {tag: self._tags.get(tag, 0) for tag in tags}
+
+    def bump(self, tags: Iterable[str]):
+        with self._tags_lock:
+            for tag in tags:
+                self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def clear(self):
+        self._entries.clear()
+        with self._tags_lock:
+            self._tags.clear()
+
+class SharedBackend:
+    """
+    SQLite-file backend shared by every worker process on the host
+    Tag versions and refresh locks live in the same file, so invalidations
+    and stale-while-revalidate coordination work across workers.
+    """
+
+    def __init__(self, path: str = REPORT_CACHE_PATH, maxsize: int = REPORT_CACHE_MAXSIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS tags (tag TEXT PRIMARY KEY, version INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, expires_at REAL NOT NULL);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            'SELECT payload FROM entries WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, entry: Dict, ttl: float):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO entries (key, payload, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(entry), now + ttl)
+        )
+        # Keep the file bounded: drop expired rows, then the soonest-expiring overflow
+        conn.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+        conn.execute(
+            'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+            (self.maxsize,)
+        )
+
+    def try_lock(self, key: str, ttl: float) -> bool:
+        conn = self._connect()
+        now = time.time()
+        conn.execute('DELETE FROM locks WHERE key = ? AND expires_at <= ?', (key, now))
+        cursor = conn.execute('INSERT OR IGNORE INTO locks (key, expires_at) VALUES (?, ?)', (key, now + ttl))
+        return cursor.rowcount == 1
+
+    def unlock(self, key: str):
+        self._connect().execute('DELETE FROM locks WHERE key = ?', (key,))
+
+    def tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = list(tags)
+        versions = {tag: 0 for tag in tags}
+        if tags:
+            placeholders = ','.join('?' * len(tags))
+            for tag, version in self._connect().execute(
+                f'SELECT tag, version FROM tags WHERE tag IN ({placeholders})', tags
+            ):
+                versions[tag] = version
+        return versions
+
+    def bump(self, tags: Iterable[str]):
+        conn = self._connect()
+        for tag in tags:
+            conn.execute(
+                'INSERT INTO tags (tag, version) VALUES (?, 1) '
+                'ON CONFLICT(tag) DO UPDATE SET version = version + 1', (tag,)
+            )
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM entries')
+        conn.execute('DELETE FROM tags')
+
+class ReportCache:
+    """TTL cache with stale-while-revalidate and tag-based invalidation"""
+
+    def __init__(self, backend, ttl: float = REPORT_CACHE_TTL, stale_ttl: float = REPORT_CACHE_STALE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], tags: Iterable[str] = (),
+                       ttl: Optional[float] = None) -> Any:
+        """
+        Return the cached value for `key`, computing it if needed
+        - fresh entry: returned as is
+        - stale entry: the caller that wins the refresh lock recomputes, everyone else gets the stale value
+        - missing or invalidated entry: computed by the caller
+        """
+        ttl = self.ttl if ttl is None else ttl
+        tags = sorted(set(tags))
+        versions = self.backend.tag_versions(tags)
+        entry = self.backend.get(key)
+        now = time.time()
+
+        if entry and entry['tags'] == versions:
+            if now < entry['fresh_until']:
+                return entry['value']
+            if not self.backend.try_lock(key, REFRESH_LOCK_TTL):
+                return entry['value']
+            try:
+                return self._compute_and_store(key, compute, versions, ttl)
+            finally:
+                self.backend.unlock(key)
+
+        return self._compute_and_store(key, compute, versions, ttl)
+
+    def _compute_and_store(self, key: str, compute: Callable[[], Any], versions: Dict[str, int], ttl: float) -> Any:
+        # Versions are captured before computing, so an invalidation that lands
+        # mid-computation leaves the stored entry already out of date
+        value = compute()
+        self.backend.set(key, {
+            'value': value,
+            'tags': versions,
+            'fresh_until': time.time() + ttl
+        }, ttl + self.stale_ttl)
+        return value
+
+    def invalidate(self, *tags: str):
+        """Invalidate every entry computed from any of `tags`"""
+        if tags:
+            self.backend.bump(tags)
+
+    def clear(self):
+        self.backend.clear()
+
+def _create_backend():
+    if REPORT_CACHE_BACKEND == 'shared':
+        return SharedBackend()
+    return MemoryBackend()
+
+report_cache = ReportCache(_create_backend())
+
+class _Uncacheable(Exception):
+    """Raised inside a computation to hand a non-200 response straight back"""
+    def __init__(self, response):
+        self.response = response
+
+def cached_report(name: str, tags: Iterable[str], ttl: Optional[float] = None):
+    """
+    Cache a report view's JSON payload keyed by (name, query params)
+    Place it under the auth decorators so authentication still runs on every request.
+    Only 200 responses are cached.
+    """
+    tags = tuple(tags)
+
+    def wrapper(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = f"{name}?{urlencode(sorted(request.args.items(multi=True)))}"
+
+            def compute():
+                rv = f(*args, **kwargs)
+                response, status = rv if isinstance(rv, tuple) else (rv, 200)
+                if status != 200:
+                    raise _Uncacheable(rv)
+                return response.get_json()
+
+            try:
+                payload = report_cache.get_or_compute(key, compute, tags, ttl)
+            except _Uncacheable as e:
+                return e.response
+            return jsonify(payload), 200
+        return decorated
+    return wrapper
+
+# Invalidation: models whose commits invalidate report entries, by tag
+_TAGGED_TABLES = {
+    'sales': 'sales',
+    'purchases': 'purchases',
+    'medicines': 'medicines',
+    'companies': 'medicines',
+    'orders': 'orders'
+}
+
+def _tag_for_mapper(mapper) -> Optional[str]:
+    table = getattr(mapper, 'local_table', None)
+    return _TAGGED_TABLES.get(getattr(table, 'name', None))
+
+def _pending_tags(session) -> set:
+    return session.info.setdefault('report_cache_tags', set())
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tag = _TAGGED_TABLES.get(getattr(obj, '__tablename__', None))
+        if tag:
+            _pending_tags(session).add(tag)
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk UPDATE/DELETE/INSERT statements bypass the unit of work
+    if orm_execute_state.is_update or orm_execute_state.is_delete or getattr(orm_execute_state, 'is_insert', False):
+        tag = _tag_for_mapper(orm_execute_state.bind_mapper)
+        if tag:
+            _pending_tags(orm_execute_state.session).add(tag)
+
+def _after_commit(session):
+    tags = session.info.pop('report_cache_tags', None)
+    if tags:
+        report_cache.invalidate(*tags)
+
+def _after_rollback(session):
+    session.info.pop('report_cache_tags', None)
+
+_listeners_registered = False
+
+def init_app(app):
+    """Register the commit hooks that invalidate report entries"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'do_orm_execute', _do_orm_execute)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    _listeners_registered = True
@@ -0,0 +1,347 @@
+"""
+Report Jobs - Asynchronous report runner backed by the report_jobs table
+Jobs are queued in PostgreSQL, claimed by a dispatcher thread and executed in a
+pool of worker processes; results are written as CSV files under uploads/reports.
+No external broker is needed: the table is the queue.
+
+The dispatcher starts inside the web process on the first enqueue, unless
+REPORT_JOBS_EMBEDDED=0, in which case run `python report_worker.py` instead.
+Configured with REPORT_JOB_WORKERS, REPORT_JOB_POLL_SECONDS and REPORT_JOB_TIMEOUT.
+"""
+
+import csv
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Callable, Dict
+from sqlalchemy import func, select, text
+from models import db
+from models.report_job import ReportJob
+
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+REPORT_JOB_POLL_SECONDS = float(os.environ.get('REPORT_JOB_POLL_SECONDS', 2))
+REPORT_JOB_TIMEOUT = int(os.environ.get('REPORT_JOB_TIMEOUT', 3600))
+REPORT_JOBS_EMBEDDED = os.environ.get('REPORT_JOBS_EMBEDDED', '1') == '1'
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads', 'reports')
+
+# Progress is written back (and cancellation checked) at most this often
+PROGRESS_INTERVAL = 1.0
+CHUNK_SIZE = 5000
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+class JobContext:
+    """Handed to job handlers for progress reporting and cancellation checks"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._last_report = 0.0
+
+    def progress(self, fraction: float):
+        now = time.monotonic()
+        if now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+
+        # Own connection: the handler's session is still streaming a server-side
+        # cursor (yield_per), which ending its transaction would close
+        table = ReportJob.__table__
+        with db.engine.begin() as connection:
+            connection.execute(
+                table.update().where(table.c.job_id == self.job_id)
+                .values(progress=min(max(fraction, 0.0), 1.0))
+            )
+            cancel_requested = connection.execute(
+                select(table.c.cancel_requested).where(table.c.job_id == self.job_id)
+            ).scalar()
+        if cancel_requested:
+            raise JobCancelled()
+
+# Job handlers: (params, csv writer, context) -> number of rows written
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+def _export_table(params: Dict, writer, ctx: JobContext) -> int:
+    """Export a whole table (optionally date-filtered) as CSV"""
+    from models.medicine import Medicine
+    from models.sale import Sale
+    from models.purchase import Purchase
+
+    table = params['table']
+    start = _parse_date(params.get('start_date'))
+    end = _parse_date(params.get('end_date'))
+
+    if table == 'medicines':
+        columns = ['medicine_id', 'name', 'company_id', 'batch_no', 'mfg_date', 'exp_date', 'quantity', 'min_stock', 'price']
+        query = db.session.query(*[getattr(Medicine, c) for c in columns]).order_by(Medicine.medicine_id)
+    elif table == 'sales':
+        columns = ['sale_id', 'medicine_id', 'quantity', 'price', 'total', 'customer_name', 'date']
+        query = db.session.query(*[getattr(Sale, c) for c in columns]).order_by(Sale.sale_id)
+        if start:
+            query = query.filter(Sale.date >= start)
+        if end:
+            query = query.filter(Sale.date <= end)
+    else:  # purchases
+        columns = ['purchase_id', 'supplier_id', 'medicine_id', 'quantity', 'cost_price', 'total', 'invoice_no', 'date']
+        query = db.session.query(*[getattr(Purchase, c) for c in columns]).order_by(Purchase.purchase_id)
+        if start:
+            query = query.filter(Purchase.date >= start)
+        if end:
+            query = query.filter(Purchase.date <= end)
+
+    total = query.order_by(None).count() or 1
+    writer.writerow(columns)
+
+    rows = 0
+    for row in query.yield_per(CHUNK_SIZE):
+        writer.writerow([value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+        rows += 1
+        if rows % CHUNK_SIZE == 0:
+            ctx.progress(rows / total)
+    return rows
+
+def _sales_report(params: Dict, writer, ctx: JobContext) -> int:
+    """Daily sales per medicine over a date range, read from the daily rollup"""
+    from models.medicine import Medicine, Company
+    from models.rollup import DailySalesRollup
+
+    start = _parse_date(params['start_date']).date()
+    end = _parse_date(params['end_date']).date()
+
+    query = db.session.query(
+        DailySalesRollup.day,
+        Medicine.name,
+        Company.name,
+        DailySalesRollup.quantity,
+        DailySalesRollup.revenue,
+        DailySalesRollup.transaction_count
+    ).join(Medicine, Medicine.medicine_id == DailySalesRollup.medicine_id)\
+     .join(Company, Company.company_id == Medicine.company_id)\
+     .filter(DailySalesRollup.day.between(start, end))\
+     .order_by(DailySalesRollup.day, Medicine.name)
+
+    total_days = max((end - start).days + 1, 1)
+    writer.writerow(['day', 'medicine', 'company', 'quantity', 'revenue', 'transaction_count'])
+
+    rows = 0
+    for day, medicine, company, quantity, revenue, count in query.yield_per(CHUNK_SIZE):
+        writer.writerow([day.isoformat(), medicine, company, quantity, float(revenue), count])
+        rows += 1
+        if rows % CHUNK_SIZE == 0:
+            ctx.progress(((day - start).days + 1) / total_days)
+    return rows
+
+def _validate_export(params: Dict):
+    if params.get('table') not in ('medicines', 'sales', 'purchases'):
+        raise ValueError('params.table must be one of: medicines, sales, purchases')
+    _parse_date(params.get('start_date'))
+    _parse_date(params.get('end_date'))
+
+def _validate_sales_report(params: Dict):
+    if not params.get('start_date') or not params.get('end_date'):
+        raise ValueError('params.start_date and params.end_date are required')
+    if _parse_date(params['start_date']) > _parse_date(params['end_date']):
+        raise ValueError('start_date must be before end_date')
+
+class JobType:
+    def __init__(self, handler: Callable, validator: Callable, max_concurrency: int):
+        self.handler = handler
+        self.validator = validator
+        self.max_concurrency = max_concurrency
+
+JOB_TYPES = {
+    'export': JobType(_export_table, _validate_export, max_concurrency=1),
+    'sales_report': JobType(_sales_report, _validate_sales_report, max_concurrency=2),
+}
+
+def enqueue(job_type: str, params: Dict, user_id: int) -> ReportJob:
+    """Validate and queue a job; raises ValueError for an unknown type or bad params"""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f'Unknown job type. Must be one of: {", ".join(JOB_TYPES)}')
+    JOB_TYPES[job_type].validator(params)
+
+    job = ReportJob(
+        job_id=uuid.uuid4().hex,
+        job_type=job_type,
+        params=params,
+        status='queued',
+        created_by=user_id
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def cancel(job: ReportJob) -> bool:
+    """Cancel a queued job immediately, or flag a running one; False if already finished"""
+    if job.status == 'queued':
+        updated = ReportJob.query.filter_by(job_id=job.job_id, status='queued').update(
+            {'status': 'cancelled', 'finished_at': datetime.utcnow()}, synchronize_session=False
+        )
+        if updated:
+            db.session.commit()
+            return True
+        db.session.refresh(job)
+
+    if job.status == 'running':
+        job.cancel_requested = True
+        db.session.commit()
+        return True
+
+    return False
+
+# Worker process side
+
+_worker_app = None
+
+def _init_worker():
+    global _worker_app
+    from app import create_worker_app
+    _worker_app = create_worker_app()
+
+def run_job(job_id: str):
+    """Execute a claimed job inside a worker process"""
+    with _worker_app.app_context():
+        job = ReportJob.query.get(job_id)
+        job_type = JOB_TYPES[job.job_type]
+
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        final_path = os.path.join(RESULTS_FOLDER, f'{job_id}.csv')
+        tmp_path = final_path + '.part'
+
+        try:
+            with open(tmp_path, 'w', newline='') as f:
+                rows = job_type.handler(job.params, csv.writer(f), JobContext(job_id))
+            os.replace(tmp_path, final_path)
+            values = {'status': 'succeeded', 'progress': 1.0, 'result_path': final_path, 'result_rows': rows}
+        except JobCancelled:
+            values = {'status': 'cancelled'}
+        except Exception as e:
+            db.session.rollback()
+            values = {'status': 'failed', 'error': str(e)}
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        values['finished_at'] = datetime.utcnow()
+        # Only a job still marked running is ours to finish; fail_stale_jobs may have timed it out
+        updated = ReportJob.query.filter_by(job_id=job_id, status='running').update(values, synchronize_session=False)
+        db.session.commit()
+        if not updated and values['status'] == 'succeeded' and os.path.exists(final_path):
+            os.remove(final_path)
+
+# Dispatcher (web or dedicated worker process)
+
+def claim_jobs(job_type_name: str) -> list:
+    """
+    Claim as many queued jobs of one type as its concurrency limit allows
+    The advisory lock serialises claims for the type across every dispatcher.
+    """
+    job_type = JOB_TYPES[job_type_name]
+    db.session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:key))'), {'key': f'report_jobs:{job_type_name}'})
+
+    running = db.session.query(func.count(ReportJob.job_id)).filter_by(
+        job_type=job_type_name, status='running'
+    ).scalar()
+    capacity = job_type.max_concurrency - running
+    if capacity <= 0:
+        db.session.commit()
+        return []
+
+    jobs = ReportJob.query.filter_by(job_type=job_type_name, status='queued')\
+        .order_by(ReportJob.created_at)\
+        .limit(capacity)\
+        .with_for_update(skip_locked=True)\
+        .all()
+
+    now = datetime.utcnow()
+    for job in jobs:
+        job.status = 'running'
+        job.started_at = now
+    job_ids = [job.job_id for job in jobs]
+    db.session.commit()
+    return job_ids
+
+def fail_stale_jobs():
+    """
+    Mark jobs whose worker died mid-run (or overran REPORT_JOB_TIMEOUT) as failed
+    A worker that is still running keeps going, but its final update no longer applies.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=REPORT_JOB_TIMEOUT)
+    ReportJob.query.filter(
+        ReportJob.status == 'running',
+        ReportJob.started_at < cutoff
+    ).update({
+        'status': 'failed',
+        'error': 'Job timed out',
+        'finished_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+
+class Dispatcher:
+    """Polls the queue and hands claimed jobs to the process pool"""
+
+    def __init__(self, app, workers: int = REPORT_JOB_WORKERS):
+        self.app = app
+        self.workers = workers
+        self.pool = self._new_pool()
+        self._stop = threading.Event()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+
+    def _submit(self, job_id: str):
+        """Hand a claimed job to the pool; if the pool is broken, requeue the job and replace the pool"""
+        try:
+            self.pool.submit(run_job, job_id)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed on a huge export); the pool refuses all further work
+            ReportJob.query.filter_by(job_id=job_id, status='running').update(
+                {'status': 'queued', 'started_at': None}, synchronize_session=False
+            )
+            db.session.commit()
+            self.pool.shutdown(wait=False)
+            self.pool = self._new_pool()
+            print(f"Report job pool was broken; requeued job {job_id} and restarted the pool")
+
+    def run_forever(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    fail_stale_jobs()
+                    for job_type_name in JOB_TYPES:
+                        for job_id in claim_jobs(job_type_name):
+                            self._submit(job_id)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Report job dispatcher error: {e}")
+                self._stop.wait(REPORT_JOB_POLL_SECONDS)
+
+    def stop(self):
+        self._stop.set()
+        self.pool.shutdown(wait=True)
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def ensure_dispatcher(app):
+    """Start the in-process dispatcher thread once per process (if embedded dispatching is on)"""
+    global _dispatcher
+    if not REPORT_JOBS_EMBEDDED:
+        return None
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher(app)
+            threading.Thread(target=_dispatcher.run_forever, name='report-job-dispatcher', daemon=True).start()
+    return _dispatcher
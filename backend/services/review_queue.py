@@ -0,0 +1,166 @@
+"""
+Review Queue - Prescription reviews ordered by priority and SLA deadline
+Every order awaiting prescription review has a row in prescription_review_queue.
+Pharmacists claim the next items with FOR UPDATE SKIP LOCKED, so concurrent
+reviewers never receive the same order and never wait on each other. A claim
+lasts REVIEW_CLAIM_MINUTES; after that the order is handed out again.
+
+Rows are added at checkout and removed when the prescription is reviewed or the
+order is cancelled/rejected (see order_workflow). Orders placed before the queue
+existed are added by `python maintenance.py backfill-review-queue`.
+Configured with REVIEW_SLA_MINUTES and REVIEW_CLAIM_MINUTES.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from models import db
+from models.order import Order
+from models.review_queue import PrescriptionReview
+
+REVIEW_SLA_MINUTES = float(os.environ.get('REVIEW_SLA_MINUTES', 60))
+REVIEW_CLAIM_MINUTES = float(os.environ.get('REVIEW_CLAIM_MINUTES', 10))
+
+MAX_CLAIM = 50
+
+def _claimable(now: datetime):
+    return or_(PrescriptionReview.claimed_by.is_(None), PrescriptionReview.claim_expires_at < now)
+
+def enqueue(order_id: int, priority: int = 0, placed_at: Optional[datetime] = None):
+    """Add an order to the queue (no-op if already queued); the caller commits"""
+    placed_at = placed_at or datetime.utcnow()
+    db.session.execute(
+        insert(PrescriptionReview).values(
+            order_id=order_id,
+            priority=priority,
+            enqueued_at=placed_at,
+            due_at=placed_at + timedelta(minutes=REVIEW_SLA_MINUTES)
+        ).on_conflict_do_nothing(index_elements=['order_id'])
+    )
+
+def dequeue(order_ids: Iterable[int]):
+    """Remove reviewed or closed orders from the queue; the caller commits"""
+    order_ids = list(order_ids)
+    if order_ids:
+        db.session.execute(
+            delete(PrescriptionReview)
+            .where(PrescriptionReview.order_id.in_(order_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+def claim(user_id: int, limit: int = 1) -> List:
+    """
+    Atomically claim up to `limit` unclaimed (or expired) items, most urgent first
+    Rows another reviewer is claiming at this instant are skipped, not waited on.
+    Commits, so the claim is visible to other reviewers immediately. Returns rows of
+    (order_id, priority, due_at, claim_expires_at).
+    """
+    now = datetime.utcnow()
+    next_items = select(PrescriptionReview.order_id)\
+        .where(_claimable(now))\
+        .order_by(PrescriptionReview.priority.desc(), PrescriptionReview.due_at)\
+        .limit(min(max(limit, 1), MAX_CLAIM))\
+        .with_for_update(skip_locked=True)\
+        .scalar_subquery()
+
+    claimed = db.session.execute(
+        update(PrescriptionReview)
+        .where(PrescriptionReview.order_id.in_(next_items))
+        .values(
+            claimed_by=user_id,
+            claimed_at=now,
+            claim_expires_at=now + timedelta(minutes=REVIEW_CLAIM_MINUTES)
+        )
+        .returning(
+            PrescriptionReview.order_id,
+            PrescriptionReview.priority,
+            PrescriptionReview.due_at,
+            PrescriptionReview.claim_expires_at
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return sorted(claimed, key=lambda item: (-item.priority, item.due_at))
+
+def claimed_by_other(order_id: int, user_id: int) -> bool:
+    """True while another reviewer holds an unexpired claim on the order"""
+    return db.session.query(PrescriptionReview.order_id).filter(
+        PrescriptionReview.order_id == order_id,
+        PrescriptionReview.claimed_by != user_id,
+        PrescriptionReview.claim_expires_at >= datetime.utcnow()
+    ).first() is not None
+
+def release(user_id: int, order_ids: Optional[Iterable[int]] = None) -> int:
+    """Give back a reviewer's claims (all of them, or just `order_ids`); returns how many"""
+    stmt = update(PrescriptionReview).where(PrescriptionReview.claimed_by == user_id)
+    if order_ids is not None:
+        stmt = stmt.where(PrescriptionReview.order_id.in_(list(order_ids)))
+    released = db.session.execute(
+        stmt.values(claimed_by=None, claimed_at=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return released
+
+def release_expired() -> int:
+    """Clear claims that timed out (claim() already ignores them; this tidies the stats)"""
+    released = db.session.execute(
+        update(PrescriptionReview)
+        .where(PrescriptionReview.claim_expires_at < datetime.utcnow())
+        .values(claimed_by=None, claimed_at=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return released
+
+def stats() -> Dict:
+    """Queue depth, claims, SLA breaches and wait-time percentiles, in one query"""
+    now = datetime.utcnow()
+    age = func.extract('epoch', now - PrescriptionReview.enqueued_at)
+    count = func.count(PrescriptionReview.order_id)
+
+    row = db.session.query(
+        count.label('depth'),
+        count.filter(and_(PrescriptionReview.claimed_by.isnot(None),
+                          PrescriptionReview.claim_expires_at >= now)).label('claimed'),
+        count.filter(PrescriptionReview.due_at < now).label('overdue'),
+        func.percentile_cont(0.5).within_group(age).label('p50'),
+        func.percentile_cont(0.9).within_group(age).label('p90'),
+        func.percentile_cont(0.99).within_group(age).label('p99'),
+        func.max(age).label('oldest')
+    ).one()
+
+    return {
+        'depth': row.depth,
+        'claimed': row.claimed,
+        'unclaimed': row.depth - row.claimed,
+        'overdue': row.overdue,
+        'age_seconds': {
+            'p50': round(float(row.p50 or 0), 1),
+            'p90': round(float(row.p90 or 0), 1),
+            'p99': round(float(row.p99 or 0), 1),
+            'max': round(float(row.oldest or 0), 1)
+        },
+        'sla_minutes': REVIEW_SLA_MINUTES
+    }
+
+def backfill() -> int:
+    """Queue every open order still awaiting prescription review; returns rows added"""
+    pending = select(
+        Order.order_id,
+        Order.order_date,
+        Order.order_date + timedelta(minutes=REVIEW_SLA_MINUTES)
+    ).where(
+        Order.requires_prescription == True,
+        Order.prescription_status == 'Pending',
+        Order.status.notin_(('Rejected', 'Cancelled'))
+    )
+    added = db.session.execute(
+        insert(PrescriptionReview)
+        .from_select(['order_id', 'enqueued_at', 'due_at'], pending)
+        .on_conflict_do_nothing(index_elements=['order_id'])
+    ).rowcount
+    db.session.commit()
+    return added
@@ -0,0 +1,120 @@
+"""
+Daily Rollups - Pre-aggregated sales and purchase totals per (day, medicine)
+Maintained incrementally on insert and rebuilt from the raw tables by the backfill
+"""
+
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from models import db
+from models.sale import Sale
+from models.purchase import Purchase
+from models.rollup import DailySalesRollup, DailyPurchaseRollup
+
+def _upsert_increment(model, values: dict, measures: tuple):
+    """Add the given measures onto the (day, medicine_id) row, creating it if missing"""
+    stmt = insert(model).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['day', 'medicine_id'],
+        set_={
+            **{col: getattr(model, col) + getattr(stmt.excluded, col) for col in measures},
+            'updated_at': func.now()
+        }
+    )
+    db.session.execute(stmt)
+
+def record_sale(sale: Sale):
+    """
+    Fold a newly inserted sale into the daily rollup
+    Runs in the caller's transaction so the rollup commits (or rolls back) with the sale
+    """
+    _upsert_increment(DailySalesRollup, {
+        'day': (sale.date or datetime.utcnow()).date(),
+        'medicine_id': sale.medicine_id,
+        'quantity': sale.quantity,
+        'revenue': sale.total,
+        'transaction_count': 1
+    }, ('quantity', 'revenue', 'transaction_count'))
+
+def record_purchase(purchase: Purchase):
+    """Fold a newly inserted purchase into the daily rollup"""
+    _upsert_increment(DailyPurchaseRollup, {
+        'day': (purchase.date or datetime.utcnow()).date(),
+        'medicine_id': purchase.medicine_id,
+        'quantity': purchase.quantity,
+        'cost': purchase.total,
+        'purchase_count': 1
+    }, ('quantity', 'cost', 'purchase_count'))
+
+def _backfill(model, source, measures: dict, since: Optional[date]):
+    """Recompute rollup rows from the raw table, replacing whatever is stored"""
+    # Block concurrent inserts into the source table until the rebuild commits,
+    # otherwise their incremental upserts could be lost or double counted
+    db.session.execute(db.text(f'LOCK TABLE {source.__tablename__} IN SHARE MODE'))
+    
+    day = func.date(source.date)
+    select_stmt = db.session.query(
+        day.label('day'),
+        source.medicine_id.label('medicine_id'),
+        *[expr.label(col) for col, expr in measures.items()],
+        func.now().label('updated_at')
+    ).group_by(day, source.medicine_id)
+
+    if since:
+        select_stmt = select_stmt.filter(source.date >= since)
+        db.session.query(model).filter(model.day >= since).delete(synchronize_session=False)
+    else:
+        db.session.query(model).delete(synchronize_session=False)
+
+    columns = ['day', 'medicine_id', *measures.keys(), 'updated_at']
+    stmt = insert(model).from_select(columns, select_stmt.statement)
+    result = db.session.execute(stmt)
+    return result.rowcount
+
+def backfill_sales(since: Optional[date] = None) -> int:
+    """Rebuild daily_sales_rollup from sales (all history, or from `since` onwards)"""
+    return _backfill(DailySalesRollup, Sale, {
+        'quantity': func.sum(Sale.quantity),
+        'revenue': func.sum(Sale.total),
+        'transaction_count': func.count(Sale.sale_id)
+    }, since)
+
+def backfill_purchases(since: Optional[date] = None) -> int:
+    """Rebuild daily_purchase_rollup from purchases (all history, or from `since` onwards)"""
+    return _backfill(DailyPurchaseRollup, Purchase, {
+        'quantity': func.sum(Purchase.quantity),
+        'cost': func.sum(Purchase.total),
+        'purchase_count': func.count(Purchase.purchase_id)
+    }, since)
+
+def sales_by_period(period: str, limit: int):
+    """
+    Sales totals per day/week/month, read from the daily rollup
+    Returns rows of (period, total_sales, transaction_count), newest first
+    """
+    if period == 'daily':
+        bucket = DailySalesRollup.day
+    else:
+        unit = 'week' if period == 'weekly' else 'month'
+        bucket = func.date_trunc(unit, DailySalesRollup.day)
+
+    return db.session.query(
+        bucket.label('period'),
+        func.sum(DailySalesRollup.revenue).label('total_sales'),
+        func.sum(DailySalesRollup.transaction_count).label('transaction_count')
+    ).group_by(bucket).order_by(bucket.desc()).limit(limit).all()
+
+def sales_total_since(start: date) -> float:
+    """Total sales revenue from `start` (inclusive) to today"""
+    total = db.session.query(func.sum(DailySalesRollup.revenue)).filter(
+        DailySalesRollup.day >= start
+    ).scalar()
+    return float(total or 0)
+
+def purchases_total_since(start: date) -> float:
+    """Total purchase cost from `start` (inclusive) to today"""
+    total = db.session.query(func.sum(DailyPurchaseRollup.cost)).filter(
+        DailyPurchaseRollup.day >= start
+    ).scalar()
+    return float(total or 0)
@@ -0,0 +1,285 @@
+"""
+Sales Cube - In-process columnar store for ad-hoc revenue slicing
+POS sales and online order lines are loaded into NumPy arrays with
+dictionary-encoded dimensions and aggregated with vectorised bincount.
+
+Dimensions: medicine, company, product_type, day, channel ('pos' / 'online')
+Measures:   revenue, quantity, lines
+
+Refreshes incrementally from sale_id / order_item_id watermarks; a full rebuild
+every CUBE_MAX_AGE seconds picks up orders cancelled after they were loaded.
+"""
+
+import os
+import threading
+import time
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from models import db
+from models.medicine import Medicine, Company
+from models.sale import Sale
+from models.order import Order, OrderItem
+
+CUBE_REFRESH_SECONDS = float(os.environ.get('CUBE_REFRESH_SECONDS', 60))
+CUBE_MAX_AGE = float(os.environ.get('CUBE_MAX_AGE', 3600))
+
+DIMENSIONS = ('medicine', 'company', 'product_type', 'day', 'channel')
+MEASURES = ('revenue', 'quantity', 'lines')
+CHANNELS = ('pos', 'online')
+EXCLUDED_ORDER_STATUSES = ('Cancelled', 'Rejected')
+
+_CHUNK_SIZE = 50000
+_EPOCH = date(1970, 1, 1).toordinal()
+
+class _Dictionary:
+    """Maps dimension values to dense integer codes"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, values: Iterable) -> List[int]:
+        return [self.codes[v] for v in values if v in self.codes]
+
+    def __len__(self):
+        return len(self.values)
+
+class SalesCube:
+    """Column store of sales facts with group-by/filter queries"""
+
+    _DTYPES = {
+        'medicine': np.int32,
+        'company': np.int32,
+        'product_type': np.int8,
+        'day': np.int32,  # days since 1970-01-01
+        'channel': np.int8,
+        'quantity': np.int32,
+        'revenue': np.float64
+    }
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.dictionaries = {
+            'medicine': _Dictionary(),  # medicine_id
+            'company': _Dictionary(),
+            'product_type': _Dictionary(),
+            'channel': _Dictionary()
+        }
+        for channel in CHANNELS:
+            self.dictionaries['channel'].encode(channel)
+        self.medicine_names = {}
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in self._DTYPES.items()}
+        self.size = 0
+        self.last_sale_id = 0
+        self.last_order_item_id = 0
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+
+    # Loading
+
+    def append_rows(self, rows: List[tuple]):
+        """
+        Append facts given as (medicine_id, medicine_name, company, product_type, day, channel, quantity, revenue)
+        """
+        if not rows:
+            return
+        d = self.dictionaries
+        encoded = {name: np.empty(len(rows), dtype=dtype) for name, dtype in self._DTYPES.items()}
+        for i, (medicine_id, medicine_name, company, product_type, day, channel, quantity, revenue) in enumerate(rows):
+            encoded['medicine'][i] = d['medicine'].encode(medicine_id)
+            encoded['company'][i] = d['company'].encode(company)
+            encoded['product_type'][i] = d['product_type'].encode(product_type or 'OTC')
+            encoded['day'][i] = day.toordinal() - _EPOCH
+            encoded['channel'][i] = d['channel'].encode(channel)
+            encoded['quantity'][i] = quantity
+            encoded['revenue'][i] = revenue
+            self.medicine_names[medicine_id] = medicine_name
+        self.append_columns(encoded)
+
+    def append_columns(self, encoded: Dict[str, np.ndarray]):
+        """Append already-encoded column arrays, growing storage geometrically"""
+        n = len(encoded['revenue'])
+        needed = self.size + n
+        capacity = len(self.columns['revenue'])
+        if needed > capacity:
+            new_capacity = max(needed, capacity * 2, 1024)
+            for name, column in self.columns.items():
+                grown = np.empty(new_capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+        for name, column in self.columns.items():
+            column[self.size:needed] = encoded[name]
+        self.size = needed
+
+    def _load_sales(self):
+        query = db.session.query(
+            Sale.sale_id, Sale.medicine_id, Medicine.name, Company.name,
+            Medicine.product_type, db.func.date(Sale.date), Sale.quantity, Sale.total
+        ).join(Medicine, Medicine.medicine_id == Sale.medicine_id)\
+         .join(Company, Company.company_id == Medicine.company_id)\
+         .filter(Sale.sale_id > self.last_sale_id)\
+         .order_by(Sale.sale_id)
+
+        rows = []
+        for sale_id, medicine_id, name, company, product_type, day, quantity, total in query.yield_per(_CHUNK_SIZE):
+            rows.append((medicine_id, name, company, product_type, day, 'pos', quantity, float(total)))
+            self.last_sale_id = sale_id
+            if len(rows) >= _CHUNK_SIZE:
+                self.append_rows(rows)
+                rows = []
+        self.append_rows(rows)
+
+    def _load_order_items(self):
+        query = db.session.query(
+            OrderItem.order_item_id, OrderItem.medicine_id, Medicine.name, Company.name,
+            db.func.coalesce(OrderItem.product_type, Medicine.product_type), db.func.date(Order.order_date),
+            OrderItem.quantity, OrderItem.subtotal
+        ).join(Order, Order.order_id == OrderItem.order_id)\
+         .join(Medicine, Medicine.medicine_id == OrderItem.medicine_id)\
+         .join(Company, Company.company_id == Medicine.company_id)\
+         .filter(
+            OrderItem.order_item_id > self.last_order_item_id,
+            Order.status.notin_(EXCLUDED_ORDER_STATUSES)
+         ).order_by(OrderItem.order_item_id)
+
+        rows = []
+        for item_id, medicine_id, name, company, product_type, day, quantity, subtotal in query.yield_per(_CHUNK_SIZE):
+            rows.append((medicine_id, name, company, product_type, day, 'online', quantity, float(subtotal)))
+            self.last_order_item_id = item_id
+            if len(rows) >= _CHUNK_SIZE:
+                self.append_rows(rows)
+                rows = []
+        self.append_rows(rows)
+
+    def refresh(self, force: bool = False):
+        """Pull new facts past the watermarks (throttled), rebuilding fully when too old"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self.refreshed_at < CUBE_REFRESH_SECONDS:
+                return
+            if force or now - self.loaded_at > CUBE_MAX_AGE:
+                self._reset()
+                self.loaded_at = now
+            self._load_sales()
+            self._load_order_items()
+            self.refreshed_at = now
+
+    # Querying
+
+    def nbytes(self) -> int:
+        """Memory held by the fact columns (excluding spare capacity)"""
+        return sum(column[:self.size].nbytes for column in self.columns.values())
+
+    def _filter_mask(self, filters: Dict[str, list], start: Optional[date], end: Optional[date]):
+        n = self.size
+        mask = np.ones(n, dtype=bool)
+        for dim, values in filters.items():
+            column = self.columns[dim][:n]
+            if dim == 'day':
+                codes = [v.toordinal() - _EPOCH for v in values]
+            else:
+                codes = self.dictionaries[dim].lookup(values)
+            mask &= np.isin(column, codes)
+        if start:
+            mask &= self.columns['day'][:n] >= start.toordinal() - _EPOCH
+        if end:
+            mask &= self.columns['day'][:n] <= end.toordinal() - _EPOCH
+        return mask
+
+    def _decode(self, dim: str, code: int):
+        if dim == 'day':
+            return date.fromordinal(int(code) + _EPOCH).isoformat()
+        return self.dictionaries[dim].values[code]
+
+    def query(self, group_by: List[str], filters: Dict[str, list] = None,
+              start: Optional[date] = None, end: Optional[date] = None,
+              order_by: str = 'revenue', limit: Optional[int] = 100) -> List[Dict]:
+        """
+        Aggregate revenue/quantity/lines grouped by `group_by` dimensions
+        `filters` maps a dimension to allowed values (medicine ids, company names,
+        product types, dates or channels).
+        """
+        unknown = [d for d in list(group_by) + list((filters or {}).keys()) if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f'Unknown dimension(s): {", ".join(unknown)}')
+        if order_by not in MEASURES:
+            raise ValueError(f'order_by must be one of: {", ".join(MEASURES)}')
+
+        with self._lock:
+            n = self.size
+            idx = np.flatnonzero(self._filter_mask(filters or {}, start, end))
+            revenue = self.columns['revenue'][idx]
+            quantity = self.columns['quantity'][idx]
+
+            if not group_by:
+                return [{
+                    'revenue': round(float(revenue.sum()), 2),
+                    'quantity': int(quantity.sum()),
+                    'lines': int(len(idx))
+                }]
+
+            # Build one combined group key per fact row
+            keys, sizes, offsets = [], [], []
+            for dim in group_by:
+                column = self.columns[dim][:n][idx].astype(np.int64)
+                if dim == 'day':
+                    offset = int(column.min()) if len(column) else 0
+                    column -= offset
+                    size = int(column.max()) + 1 if len(column) else 1
+                else:
+                    offset = 0
+                    size = max(len(self.dictionaries[dim]), 1)
+                keys.append(column)
+                sizes.append(size)
+                offsets.append(offset)
+            combined = np.ravel_multi_index(tuple(keys), tuple(sizes))
+
+            total_groups = int(np.prod(sizes, dtype=np.int64))
+            if total_groups <= max(4 * len(idx), 1 << 20):
+                lines = np.bincount(combined, minlength=total_groups)
+                group_keys = np.flatnonzero(lines)
+                revenue_sums = np.bincount(combined, weights=revenue, minlength=total_groups)[group_keys]
+                quantity_sums = np.bincount(combined, weights=quantity, minlength=total_groups)[group_keys]
+                lines = lines[group_keys]
+            else:
+                # Sparse key space: compact the keys first
+                group_keys, inverse = np.unique(combined, return_inverse=True)
+                lines = np.bincount(inverse)
+                revenue_sums = np.bincount(inverse, weights=revenue)
+                quantity_sums = np.bincount(inverse, weights=quantity)
+
+            measure = {'revenue': revenue_sums, 'quantity': quantity_sums, 'lines': lines}[order_by]
+            order = np.argsort(-measure, kind='stable')
+            if limit:
+                order = order[:limit]
+
+            codes = np.unravel_index(group_keys[order], tuple(sizes))
+            result = []
+            for row, position in enumerate(order):
+                entry = {}
+                for dim, dim_codes, offset in zip(group_by, codes, offsets):
+                    value = self._decode(dim, int(dim_codes[row]) + offset)
+                    if dim == 'medicine':
+                        entry['medicine_id'] = value
+                        entry['medicine'] = self.medicine_names.get(value)
+                    else:
+                        entry[dim] = value
+                entry['revenue'] = round(float(revenue_sums[position]), 2)
+                entry['quantity'] = int(quantity_sums[position])
+                entry['lines'] = int(lines[position])
+                result.append(entry)
+            return result
+
+sales_cube = SalesCube()
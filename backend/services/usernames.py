@@ -0,0 +1,39 @@
+"""
+Usernames - Cached user_id -> username lookups for history and audit views
+Misses are fetched in one IN query; admin user updates/deletes invalidate entries.
+"""
+
+import os
+from typing import Dict, Iterable, Optional
+from models import db
+from models.user import User
+from services.cache import TTLCache
+
+USERNAME_CACHE_SIZE = int(os.environ.get('USERNAME_CACHE_SIZE', 1024))
+USERNAME_CACHE_TTL = float(os.environ.get('USERNAME_CACHE_TTL', 300))
+
+_MISSING = object()
+_cache = TTLCache(maxsize=USERNAME_CACHE_SIZE, ttl=USERNAME_CACHE_TTL)
+
+def get_usernames(user_ids: Iterable[Optional[int]]) -> Dict[int, Optional[str]]:
+    """Map each user id to its username (None for users that no longer exist)"""
+    result = {}
+    missing = set()
+    for user_id in user_ids:
+        if user_id is None or user_id in result:
+            continue
+        username = _cache.get(user_id, _MISSING)
+        if username is _MISSING:
+            missing.add(user_id)
+        else:
+            result[user_id] = username
+
+    if missing:
+        found = dict(db.session.query(User.user_id, User.username).filter(User.user_id.in_(missing)).all())
+        for user_id in missing:
+            result[user_id] = found.get(user_id)
+            _cache.set(user_id, result[user_id])
+    return result
+
+def invalidate(user_id: int):
+    _cache.pop(user_id)
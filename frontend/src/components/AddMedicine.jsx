@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api from '../services/api';
+import { authService } from '../services/auth';
 
 const AddMedicine = () => {
   const [formData, setFormData] = useState({
@@ -75,8 +76,7 @@ const AddMedicine = () => {
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    authService.logout();
     navigate('/');
   };
 
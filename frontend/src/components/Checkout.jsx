@@ -17,6 +17,7 @@ const Checkout = () => {
   });
   
   const [prescriptionFile, setPrescriptionFile] = useState(null);
+  const [quote, setQuote] = useState(null);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -35,6 +36,7 @@ const Checkout = () => {
       }
       
       setCartData(cartResponse.data);
+      await refreshQuote();
     } catch (error) {
       setError('Failed to load cart');
     } finally {
@@ -42,6 +44,20 @@ const Checkout = () => {
     }
   };
 
+  // Price the cart once; placing the order with the quote skips re-pricing it
+  const refreshQuote = async () => {
+    try {
+      const response = await orders.validateCheckout();
+      setQuote(response.data.quote);
+    } catch (err) {
+      setQuote(null);
+      const issues = err.response?.data?.issues;
+      if (issues) {
+        setError(issues.map((issue) => `${issue.medicine}: ${issue.issue}`).join('\n'));
+      }
+    }
+  };
+
   const loadCustomerAddress = () => {
     const customer = JSON.parse(localStorage.getItem('customer') || '{}');
     if (customer.address) {
@@ -103,6 +119,9 @@ const Checkout = () => {
       if (prescriptionFile) {
         formData.append('prescription', prescriptionFile);
       }
+      if (quote) {
+        formData.append('quote', quote);
+      }
 
       const response = await orders.place(formData);
       
@@ -115,6 +134,10 @@ const Checkout = () => {
         } 
       });
     } catch (err) {
+      if (err.response?.status === 409) {
+        // Cart, prices or stock changed since the quote: show the current cart again
+        await fetchCartAndValidate();
+      }
       setError(err.response?.data?.message || 'Failed to place order');
     } finally {
       setSubmitting(false);
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
-import { orders } from '../services/customerApi';
+import { orders, customerAuth } from '../services/customerApi';
 
 const CustomerDashboard = () => {
   const [orderList, setOrderList] = useState([]);
@@ -25,8 +25,7 @@ const CustomerDashboard = () => {
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('customerToken');
-    localStorage.removeItem('customer');
+    customerAuth.logout();
     navigate('/customer/login');
   };
 
@@ -28,6 +28,7 @@ const CustomerLogin = () => {
       
       // Store token and customer data
       localStorage.setItem('customerToken', response.data.token);
+      localStorage.setItem('customerRefreshToken', response.data.refresh_token);
       localStorage.setItem('customer', JSON.stringify(response.data.customer));
       
       // Redirect to shop
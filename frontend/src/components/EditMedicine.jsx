@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, useParams, useLocation } from 'react-router-dom';
 import api from '../services/api';
+import { authService } from '../services/auth';
 
 const EditMedicine = () => {
   const { id } = useParams();
@@ -86,8 +87,7 @@ const EditMedicine = () => {
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    authService.logout();
     navigate('/');
   };
 
@@ -19,7 +19,7 @@ const LoginForm = () => {
     
     try {
       const data = await authService.login(username, password);
-      login(data.user, data.token);
+      login(data.user, data.token, data.refresh_token);
       navigate('/dashboard');
     } catch (err) {
       setError(err.message || 'Login failed');
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api from '../services/api';
+import { authService } from '../services/auth';
 
 const MedicineTable = () => {
   const [medicines, setMedicines] = useState([]);
@@ -28,8 +29,7 @@ const MedicineTable = () => {
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    authService.logout();
     navigate('/');
   };
 
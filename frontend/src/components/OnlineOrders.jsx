@@ -10,10 +10,40 @@ const OnlineOrders = () => {
 
   const API_URL = 'http://localhost:5000/api';
 
+  const PREFETCH_COUNT = 5;
+
   useEffect(() => {
     fetchOrders();
   }, [filter]);
 
+  // Preview links are signed by the API (no access token in the URL), so they stay cacheable across token refreshes
+  const API_ORIGIN = API_URL.replace(/\/api$/, '');
+  const previewUrl = (signedPath) => `${API_ORIGIN}${signedPath}`;
+
+  // Warm the browser cache with the previews of the next orders awaiting review
+  const prefetchPreviews = async (excludeOrderId) => {
+    try {
+      const token = localStorage.getItem('token');
+      const params = new URLSearchParams({ limit: PREFETCH_COUNT });
+      if (excludeOrderId) params.append('exclude', excludeOrderId);
+      const response = await axios.get(
+        `${API_URL}/staff/online-orders/prescription-previews/prefetch?${params}`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      response.data.orders.forEach(({ preview_url }) => {
+        new Image().src = previewUrl(preview_url);
+      });
+    } catch (error) {
+      console.error('Error prefetching prescription previews:', error);
+    }
+  };
+
+  useEffect(() => {
+    if (selectedOrder && selectedOrder.needs_review) {
+      prefetchPreviews(selectedOrder.order_id);
+    }
+  }, [selectedOrder]);
+
   const fetchOrders = async () => {
     try {
       setLoading(true);
@@ -246,12 +276,12 @@ const OnlineOrders = () => {
                 </div>
               </div>
               
-              {selectedOrder.prescription_uploaded && selectedOrder.prescription_file_path && (
+              {selectedOrder.prescription_uploaded && selectedOrder.preview_url && (
                 <div className="border-2 border-gray-300 rounded-lg p-4">
                   <p className="text-sm font-semibold text-gray-700 mb-3">Prescription Image:</p>
                   <div className="bg-gray-50 rounded-lg p-2">
                     <img 
-                      src={`http://localhost:5000/${selectedOrder.prescription_file_path}`}
+                      src={previewUrl(selectedOrder.preview_url)}
                       alt="Prescription"
                       className="w-full h-auto max-h-96 object-contain rounded"
                       onError={(e) => {
@@ -264,14 +294,6 @@ const OnlineOrders = () => {
                 </div>
               )}
               
-              {selectedOrder.prescription_uploaded && !selectedOrder.prescription_file_path && (
-                <div className="border-2 border-dashed border-gray-300 rounded-lg p-4 text-center">
-                  <svg className="mx-auto h-12 w-12 text-gray-400" fill="none" viewBox="0 0 24 24" stroke="currentColor">
-                    <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M9 12h6m-6 4h6m2 5H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z" />
-                  </svg>
-                  <p className="text-sm text-gray-600 mt-2">Prescription file path not available</p>
-                </div>
-              )}
             </div>
 
             <div className="flex space-x-4">
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
-import { products, cart } from '../services/customerApi';
+import { products, cart, customerAuth } from '../services/customerApi';
 
 const ProductCatalog = () => {
   const [productList, setProductList] = useState([]);
@@ -82,8 +82,7 @@ const ProductCatalog = () => {
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('customerToken');
-    localStorage.removeItem('customer');
+    customerAuth.logout();
     navigate('/customer/login');
   };
 
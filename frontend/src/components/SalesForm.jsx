@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api from '../services/api';
+import { authService } from '../services/auth';
 
 const SalesForm = () => {
   const [medicines, setMedicines] = useState([]);
@@ -30,8 +31,7 @@ const SalesForm = () => {
   };
 
   const handleLogout = () => {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    authService.logout();
     navigate('/');
   };
 
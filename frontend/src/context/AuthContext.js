@@ -1,4 +1,5 @@
 import React, { createContext, useState, useEffect } from 'react';
+import { authService } from '../services/auth';
 
 const AuthContext = createContext();
 
@@ -20,18 +21,18 @@ export const AuthProvider = ({ children }) => {
     setLoading(false);
   }, []);
 
-  const login = (userData, authToken) => {
+  const login = (userData, authToken, refreshToken) => {
     setUser(userData);
     setToken(authToken);
     localStorage.setItem('token', authToken);
+    localStorage.setItem('refreshToken', refreshToken);
     localStorage.setItem('user', JSON.stringify(userData));
   };
 
   const logout = () => {
     setUser(null);
     setToken(null);
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    authService.logout();
   };
 
   const value = {
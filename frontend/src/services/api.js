@@ -22,15 +22,50 @@ api.interceptors.request.use(
   }
 );
 
+// Access tokens are short-lived: on a 401, swap the refresh token for a new pair once
+// (shared by every request that failed meanwhile) and retry. Tabs share localStorage,
+// so if another tab already refreshed, retry with its token instead of refreshing again
+let refreshing = null;
+
+const refreshTokens = () => {
+  if (!refreshing) {
+    refreshing = axios.post(`${api.defaults.baseURL}/auth/refresh`, {
+      refresh_token: localStorage.getItem('refreshToken')
+    }).then((response) => {
+      localStorage.setItem('token', response.data.token);
+      localStorage.setItem('refreshToken', response.data.refresh_token);
+      return response.data.token;
+    }).finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
 // Add a response interceptor to handle auth errors
 api.interceptors.response.use(
   (response) => {
     return response;
   },
-  (error) => {
+  async (error) => {
+    const original = error.config;
     if (error.response && error.response.status === 401) {
+      if (original && !original._retried && localStorage.getItem('refreshToken')) {
+        original._retried = true;
+        try {
+          const stored = localStorage.getItem('token');
+          const token = stored && original.headers.Authorization !== `Bearer ${stored}`
+            ? stored
+            : await refreshTokens();
+          original.headers.Authorization = `Bearer ${token}`;
+          return api(original);
+        } catch (refreshError) {
+          // Fall through to logout
+        }
+      }
       // Token expired or invalid, logout user
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
       localStorage.removeItem('user');
       window.location.href = '/';
     }
@@ -19,6 +19,19 @@ export const authService = {
     }
   },
 
+  async logout() {
+    const refreshToken = localStorage.getItem('refreshToken');
+    localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
+    localStorage.removeItem('user');
+    try {
+      // Revokes the refresh token and every access token from this login
+      await api.post('/auth/logout', { refresh_token: refreshToken });
+    } catch (error) {
+      // Already signed out locally
+    }
+  },
+
   async getProfile() {
     try {
       const response = await api.get('/auth/profile');
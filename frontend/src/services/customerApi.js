@@ -24,10 +24,65 @@ customerApi.interceptors.request.use(
   }
 );
 
+// Access tokens are short-lived: on a 401, swap the refresh token for a new pair once
+// (shared by every request that failed meanwhile) and retry. Tabs share localStorage,
+// so if another tab already refreshed, retry with its token instead of refreshing again
+let refreshing = null;
+
+const refreshTokens = () => {
+  if (!refreshing) {
+    refreshing = axios.post(`${API_URL}/customer/refresh`, {
+      refresh_token: localStorage.getItem('customerRefreshToken')
+    }).then((response) => {
+      localStorage.setItem('customerToken', response.data.token);
+      localStorage.setItem('customerRefreshToken', response.data.refresh_token);
+      return response.data.token;
+    }).finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
+customerApi.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    if (error.response && error.response.status === 401 && original && !original._retried
+        && localStorage.getItem('customerRefreshToken')) {
+      original._retried = true;
+      try {
+        const stored = localStorage.getItem('customerToken');
+        const token = stored && original.headers.Authorization !== `Bearer ${stored}`
+          ? stored
+          : await refreshTokens();
+        original.headers.Authorization = `Bearer ${token}`;
+        return customerApi(original);
+      } catch (refreshError) {
+        localStorage.removeItem('customerToken');
+        localStorage.removeItem('customerRefreshToken');
+      }
+    }
+    return Promise.reject(error);
+  }
+);
+
 // Customer Authentication
 export const customerAuth = {
   register: (data) => customerApi.post('/customer/register', data),
   login: (data) => customerApi.post('/customer/login', data),
+  logout: async () => {
+    const refreshToken = localStorage.getItem('customerRefreshToken');
+    localStorage.removeItem('customerToken');
+    localStorage.removeItem('customerRefreshToken');
+    localStorage.removeItem('customer');
+    try {
+      // Revokes the refresh token and every access token from this login
+      await customerApi.post('/customer/logout', { refresh_token: refreshToken });
+    } catch (error) {
+      // Already signed out locally
+    }
+  },
   getProfile: () => customerApi.get('/customer/profile'),
   updateProfile: (data) => customerApi.put('/customer/profile', data),
   changePassword: (data) => customerApi.post('/customer/change-password', data),
@@ -52,7 +107,8 @@ export const cart = {
   update: (id, data) => customerApi.put(`/customer/cart/update/${id}`, data),
   remove: (id) => customerApi.delete(`/customer/cart/remove/${id}`),
   clear: () => customerApi.delete('/customer/cart/clear'),
-  getCount: () => customerApi.get('/customer/cart/count')
+  getCount: () => customerApi.get('/customer/cart/count'),
+  batch: (operations) => customerApi.post('/customer/cart/batch', { operations })
 };
 
 // Orders